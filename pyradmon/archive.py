@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# PyRadmon - Python Radiance Monitoring Tool
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# Plot Archive Library -
+#   library for writing rendered plots into a single archive container
+# 
+
+from core import *
+from plot import check_output_path
+
+import os
+import io
+import json
+import time
+import tarfile
+import zipfile
+
+# Archive index format version - increment this if the index format
+# changes in an incompatible way!
+ARCHIVE_INDEX_VERSION = 1
+
+# Name of the index member, written at the end of the archive
+ARCHIVE_INDEX_NAME = "index.json"
+
+# Valid archive formats, indexed by file extension
+ARCHIVE_FORMATS = {
+                    ".zip"      : "zip",
+                    ".tar"      : "tar",
+                    ".tar.gz"   : "tar.gz",
+                    ".tgz"      : "tar.gz",
+                  }
+
+def get_archive_format(archive_output):
+    """Determine the archive format from the archive file path.
+    
+    Given the archive output file path, determine the archive format
+    from its file extension. Valid extensions are ".zip", ".tar",
+    ".tar.gz", and ".tgz".
+    
+    Args:
+        archive_output (str): The output file path of the archive.
+    
+    Returns:
+        str: The archive format - either "zip", "tar", or "tar.gz". If
+        the extension is not recognized, None is returned.
+    """
+    for archive_ext in ARCHIVE_FORMATS:
+        if archive_output.lower().endswith(archive_ext):
+            return ARCHIVE_FORMATS[archive_ext]
+    
+    return None
+
+def get_output_root(plot_dict):
+    """Determine the output root directory of the plots.
+    
+    The output root is the fixed directory part of the plots' output
+    path templates - everything before the first %VAR% variable, up to
+    the last directory separator. (For instance, the root of
+    "/data/radmon_data/%EXPERIMENT_ID%/%INSTRUMENT_SAT%_ch%CHANNEL%.png"
+    is "/data/radmon_data".) If the plots have different roots, their
+    common parent directory is used.
+    
+    Args:
+        plot_dict (dict): The plot dictionary. See :py:func:`.plot()`
+            help for more information on its format.
+    
+    Returns:
+        str: The absolute path of the output root directory.
+    """
+    output_roots = []
+    
+    for plot_id in plot_dict:
+        plot_output = plot_dict[plot_id].get("output", "")
+        output_roots.append(os.path.abspath(os.path.dirname(plot_output.split("%")[0])))
+    
+    if len(output_roots) == 0:
+        return os.path.abspath(os.curdir)
+    
+    # commonprefix() works character by character, so make sure that
+    # we end up with a whole directory!
+    output_root = os.path.commonprefix([ output_root + os.sep for output_root in output_roots ])
+    
+    return os.path.abspath(output_root[:output_root.rindex(os.sep) + 1])
+
+def get_member_name(output_root, plot_output):
+    """Get the archive member name for a plot.
+    
+    Args:
+        output_root (str): The output root directory, from
+            :py:func:`get_output_root()`.
+        plot_output (str): The plot's output file path.
+    
+    Returns:
+        str: The member name - the plot's output path relative to the
+        output root, with forward slashes.
+    """
+    member_name = os.path.relpath(os.path.abspath(plot_output), output_root).replace(os.sep, "/")
+    
+    # Plots outside of the output root (e.g. via a variable with ".."
+    # in it) would be extracted outside of the extraction directory!
+    if (member_name == "..") or member_name.startswith("../") or ("/../" in member_name):
+        edie("ERROR: Plot output %s is outside of the archive's output root %s!" % (plot_output, output_root))
+    
+    return member_name
+
+def open_archive(archive_output, make_dirs = False, output_root = None):
+    """Open a plot archive for writing.
+    
+    Open the archive at the specified output path for writing. The
+    archive is opened once, and rendered plots are appended to it with
+    :py:func:`add_to_archive()`. Once all plots have been added,
+    :py:func:`close_archive()` must be called to write the index and
+    finish the archive.
+    
+    Args:
+        archive_output (str): The output file path of the archive. The
+            archive format is determined by its extension - see
+            :py:func:`get_archive_format()` for valid extensions.
+        make_dirs (bool): Boolean indicating whether to automatically
+            create output path directories or not. This defaults to
+            False to ensure that the path specified is correct.
+        output_root (str): The output root directory - plots are 
+            stored relative to it, so that extracting the archive into
+            the output root gives the same layout as writing the plots
+            directly. See :py:func:`get_output_root()`. By default, 
+            this is set to None, which uses the current directory.
+    
+    Returns:
+        dict: A dictionary containing the archive state, to be passed
+        to :py:func:`add_to_archive()` and :py:func:`close_archive()`.
+    """
+    archive_format = get_archive_format(archive_output)
+    
+    if not archive_format:
+        die("ERROR: Unknown archive format for %s! Valid extensions: %s" % (archive_output, ", ".join(sorted(ARCHIVE_FORMATS.keys()))))
+    
+    # Check to see if the path exists!
+    check_output_path(archive_output, make_dirs)
+    
+    if archive_format == "zip":
+        # Images are already compressed, so just store them!
+        archive_fh = zipfile.ZipFile(archive_output, "w", zipfile.ZIP_STORED, True)
+    elif archive_format == "tar.gz":
+        archive_fh = tarfile.open(archive_output, "w:gz")
+    else:
+        archive_fh = tarfile.open(archive_output, "w")
+    
+    archive = {
+                "output"    : archive_output,
+                "format"    : archive_format,
+                "handle"    : archive_fh,
+                "root"      : os.path.abspath(output_root or os.curdir),
+                "members"   : [],
+              }
+    
+    return archive
+
+def add_to_archive(archive, member_name, member_data):
+    """Add a rendered plot to a plot archive.
+    
+    Add the rendered plot data to the archive as a member with the
+    specified name, and record it in the archive index.
+    
+    Args:
+        archive (dict): The archive state, from
+            :py:func:`open_archive()`.
+        member_name (str): The plot's output file path. The member is
+            named by its path relative to the archive's output root.
+        member_data (str): The rendered plot data (as a str of bytes).
+    """
+    member_mtime = time.time()
+    
+    # Archives use forward slash separated paths, relative to the
+    # output root.
+    member_name = get_member_name(archive["root"], member_name)
+    
+    member_index = {
+                        "name"      : member_name,
+                        "size"      : len(member_data),
+                        "mtime"     : int(member_mtime),
+                   }
+    
+    if archive["format"] == "zip":
+        member_info = zipfile.ZipInfo(member_name, time.localtime(member_mtime)[:6])
+        member_info.external_attr = 0644 << 16
+        archive["handle"].writestr(member_info, member_data)
+    else:
+        member_info = tarfile.TarInfo(member_name)
+        member_info.size = len(member_data)
+        member_info.mtime = member_mtime
+        member_info.mode = 0644
+        archive["handle"].addfile(member_info, io.BytesIO(member_data))
+        
+        # For uncompressed tar files, record the data offset so that
+        # members can be served directly without extracting. The data
+        # ends (padded to the block size) at the current offset.
+        if archive["format"] == "tar":
+            member_blocks = (len(member_data) + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE
+            member_index["offset"] = archive["handle"].offset - (member_blocks * tarfile.BLOCKSIZE)
+    
+    archive["members"].append(member_index)
+
+def close_archive(archive):
+    """Finish and close a plot archive.
+    
+    Write the archive index as the last member of the archive (named
+    by ARCHIVE_INDEX_NAME), and close the archive. The index is JSON
+    in the following format::
+    
+        {
+            "version": ARCHIVE_INDEX_VERSION,
+            "format": "zip",
+            "members": [
+                {
+                    "name": "x0014/20140201-20140210/amsua_n18/amsua_n18_anl_ch1.png",
+                    "size": 12345,
+                    "mtime": EPOCH_SECS,
+                    "offset": 512
+                },
+                ...
+            ]
+        }
+    
+    The "offset" entry is only included for uncompressed tar files.
+    
+    Args:
+        archive (dict): The archive state, from
+            :py:func:`open_archive()`.
+    
+    Returns:
+        int: The number of plots written to the archive.
+    """
+    archive_index = {
+                        "version"   : ARCHIVE_INDEX_VERSION,
+                        "format"    : archive["format"],
+                        "members"   : archive["members"],
+                    }
+    
+    archive_index_data = json.dumps(archive_index, sort_keys = True, indent = 1)
+    
+    # Write the index directly, so that it isn't listed in itself!
+    if archive["format"] == "zip":
+        archive["handle"].writestr(ARCHIVE_INDEX_NAME, archive_index_data)
+    else:
+        index_info = tarfile.TarInfo(ARCHIVE_INDEX_NAME)
+        index_info.size = len(archive_index_data)
+        index_info.mtime = time.time()
+        index_info.mode = 0644
+        archive["handle"].addfile(index_info, io.BytesIO(archive_index_data))
+    
+    archive["handle"].close()
+    
+    return len(archive["members"])
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    
+    # Write a test archive with absolute plot output paths, and make
+    # sure the members are named relative to the output root.
+    test_dir = tempfile.mkdtemp()
+    
+    try:
+        test_plot_dict = {
+                            "plot1" : { "output" : os.path.join(test_dir, "out", "%EXPERIMENT_ID%", "%INSTRUMENT_SAT%_anl_ch%CHANNEL%.png") },
+                            "plot2" : { "output" : os.path.join(test_dir, "out", "%EXPERIMENT_ID%", "%INSTRUMENT_SAT%_bkg_ch%CHANNEL%.png") },
+                         }
+        
+        test_archive = open_archive(os.path.join(test_dir, "test.zip"), False, get_output_root(test_plot_dict))
+        add_to_archive(test_archive, os.path.join(test_dir, "out", "x0014", "amsua_n18_anl_ch1.png"), "PNG1")
+        add_to_archive(test_archive, os.path.join(test_dir, "out", "x0014", "amsua_n18_bkg_ch1.png"), "PNG2")
+        close_archive(test_archive)
+        
+        member_names = zipfile.ZipFile(os.path.join(test_dir, "test.zip")).namelist()
+        print member_names
+        
+        if member_names != [ "x0014/amsua_n18_anl_ch1.png", "x0014/amsua_n18_bkg_ch1.png", ARCHIVE_INDEX_NAME ]:
+            print "ERROR: Archive members are not relative to the output root!"
+            sys.exit(1)
+        
+        # Plots outside of the output root must be rejected!
+        test_archive = open_archive(os.path.join(test_dir, "test2.zip"), False, get_output_root(test_plot_dict))
+        try:
+            add_to_archive(test_archive, os.path.join(test_dir, "out", "..", "evil.png"), "PNG3")
+            print "ERROR: Plot outside of the output root was not rejected!"
+            sys.exit(1)
+        except Exception:
+            print "Plot outside of the output root rejected."
+        close_archive(test_archive)
+    finally:
+        shutil.rmtree(test_dir)
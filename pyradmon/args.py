@@ -28,7 +28,7 @@ from _version import __version__
 from core import *
 import config
 import config_printer
-from config import SPECIAL_FIELDS
+from config import SPECIAL_FIELDS, DOWNSAMPLE_METHODS
 import log
 
 import logging
@@ -214,6 +214,73 @@ def add_plot_args(parser, inherit = False):
             'dest'      : 'plot_make_dirs',
             'help'      : 'Make directories if the specified output path does not exist.',
         }
+    opts['--plot-incremental'] = \
+        {
+            'action'    : 'store_true',
+            'dest'      : 'plot_incremental',
+            'help'      : 'Only regenerate plots whose inputs (data files, plot definition, or channel) have changed since the last run.',
+        }
+    opts['--plot-incremental-state'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'FILE',
+            'dest'      : 'plot_incremental_state',
+            'help'      : 'Set the file used to track plot inputs for --plot-incremental. Defaults to pyradmon_incremental.json.',
+        }
+    opts['--plot-journal'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'FILE',
+            'dest'      : 'plot_journal',
+            'help'      : 'Record each completed plot task (plot ID, channel, and output path) in the specified journal file, so that the run can be resumed with --plot-resume if it fails. Defaults to pyradmon_journal.json when --plot-resume is used.',
+        }
+    opts['--plot-resume'] = \
+        {
+            'action'    : 'store_true',
+            'dest'      : 'plot_resume',
+            'help'      : 'Resume a failed run, skipping plot tasks recorded in the journal (see --plot-journal) whose output files exist.',
+        }
+    opts['--plot-bundle'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'BUNDLE_FILE',
+            'dest'      : 'plot_bundle',
+            'help'      : 'Write a compressed data bundle for the web viewer (web/viewer.html) to the specified file. Uses the same %%VAR%% variables as output files, except for channel variables.',
+        }
+    opts['--plot-bundle-only'] = \
+        {
+            'action'    : 'store_true',
+            'dest'      : 'plot_bundle_only',
+            'help'      : 'Only write the data bundle specified with --plot-bundle, skipping plot image generation.',
+        }
+    opts['--plot-archive'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'ARCHIVE_FILE',
+            'dest'      : 'plot_archive',
+            'help'      : 'Write all plots into a single zip or tar archive (with an index) instead of individual files. Uses the same %%VAR%% variables as output files, except for channel variables.',
+        }
+    opts['--plot-layout'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'LAYOUT',
+            'dest'      : 'plot_layout',
+            'help'      : 'Set the plot output layout - single (one image per channel), pdf (one multi-page PDF per plot, one page per channel), or sheet (tiled images with multiple channels per image). Defaults to single.',
+        }
+    opts['--plot-sheet-channels'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'NUM_CHANNELS',
+            'dest'      : 'plot_sheet_channels',
+            'help'      : 'Set the number of channels to tile per image for --plot-layout sheet. Defaults to 4.',
+        }
+    opts['--plot-pipeline'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'NUM_GROUPS',
+            'dest'      : 'plot_pipeline',
+            'help'      : 'Read the data in the specified number of channel groups, in parallel, and start plotting each group as soon as it has been read. Requires multiprocessing (mp).',
+        }
     
     add_args(parser, inherit, opts)
 
@@ -242,6 +309,58 @@ def add_config_args(parser, inherit = False):
     
     add_args(parser, inherit, opts)
 
+def add_batch_args(parser, inherit = False):
+    opts = OrderedDict()
+    opts['--batch-manifest'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'FILE',
+            'dest'      : 'batch_manifest',
+            'required'  : True,
+            'help'      : 'Batch manifest (YAML) listing the jobs to run. Each job specifies an experiment, instrument (or list of instruments), start and end date, and config template.',
+        }
+    opts['--batch-fail-fast'] = \
+        {
+            'action'    : 'store_true',
+            'dest'      : 'batch_fail_fast',
+            'help'      : 'Stop at the first failed job, instead of continuing with the remaining jobs.',
+        }
+    
+    add_args(parser, inherit, opts)
+
+def add_serve_args(parser, inherit = False):
+    opts = OrderedDict()
+    opts['--serve-socket'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'PATH',
+            'dest'      : 'serve_socket',
+            'help'      : 'Serve requests on a UNIX socket at the specified path. Only the user running the server may connect to it. Default is pyradmon.sock, unless --serve-address is specified.',
+        }
+    opts['--serve-address'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'HOST:PORT',
+            'dest'      : 'serve_address',
+            'help'      : 'Serve requests on the specified TCP address (e.g. 127.0.0.1:8150), instead of a UNIX socket. There is no access control - anyone who can connect can make plots as the user running the server, so only listen on trusted addresses!',
+        }
+    opts['--serve-config-dir'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'DIR',
+            'dest'      : 'serve_config_dir',
+            'help'      : 'Allow requests to use the configuration files in the specified directory (and its subdirectories). By default, requests may not specify configuration files.',
+        }
+    opts['--serve-cache-ttl'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'SECONDS',
+            'dest'      : 'serve_cache_ttl',
+            'help'      : 'Number of seconds to keep data file enumeration and header results for, before checking the data files again. Default is 60 seconds.',
+        }
+    
+    add_args(parser, inherit, opts)
+
 def make_argparser():
     parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, \
                 epilog = textwrap.dedent("""\
@@ -292,6 +411,10 @@ def make_argparser():
                       %(prog)s --config-file=config.yaml plot
                     Print configuration:
                       %(prog)s --config-file=config.yaml config
+                    Make plots for all jobs in a batch manifest:
+                      %(prog)s batch --batch-manifest=jobs.yaml
+                    Serve plot and dump requests from a warm process:
+                      %(prog)s --config-file=config.yaml serve
                     Make plots and log output:
                       %(prog)s --config-file=config.yaml --logging-output="stdout,file" \\
                                --logging-file="mylog.txt" plot
@@ -349,6 +472,13 @@ def make_argparser():
             'dest'      : 'mp_priority_mode',
             'help'      : 'Set the priority mode for the multiprocessing (mp) optimizations in PyRadmon. Options are GENEROUS, NORMAL, AGGRESSIVE, EXTREME, and NUCLEAR. GENEROUS yields to other CPU hungry processes, while NUCLEAR spawns as many processes as it can regardless of CPU usage.',
         }
+    main_opts['--mp-cpu-source'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'CPU_SOURCE',
+            'dest'      : 'mp_cpu_source',
+            'help'      : 'Set the CPU availability source for the multiprocessing (mp) optimizations in PyRadmon. Options are PROCESS and SYSTEM. PROCESS polls every process on the system for CPU usage, while SYSTEM reads the CPU affinity, cgroup CPU quota, load average, and CPU pressure, respecting container and batch scheduler (e.g. Slurm) limits.',
+        }
     main_opts['--mp-cpu-limit'] = \
         {
             'action'    : 'store',
@@ -356,6 +486,46 @@ def make_argparser():
             'dest'      : 'mp_cpu_limit',
             'help'      : 'Limit the number of CPUs that the multiprocessing (mp) optimizations in PyRadmon can use.',
         }
+    main_opts['--mp-memory-limit'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'SIZE',
+            'dest'      : 'mp_memory_limit',
+            'help'      : 'Limit the memory that the multiprocessing (mp) optimizations in PyRadmon can use, in bytes, or with a K, M, G, or T suffix (e.g. 8G). New processes are held off if they would likely exceed the limit, or the memory available on the system.',
+        }
+    main_opts['--mp-shared-memory'] = \
+        {
+            'action'    : 'store_true',
+            'dest'      : 'mp_shared_memory',
+            'help'      : 'Pass plot data to multiprocessing (mp) workers through shared memory, instead of copying it for every task. Requires NumPy.',
+        }
+    main_opts['--mp-pool'] = \
+        {
+            'action'    : 'store_true',
+            'dest'      : 'mp_pool',
+            'help'      : 'Run multiprocessing (mp) tasks in a pool of long-lived worker processes, instead of starting a new process for every task.',
+        }
+    main_opts['--mp-batch-max'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'NUM_TASKS',
+            'dest'      : 'mp_batch_max',
+            'help'      : 'Run up to the specified number of small multiprocessing (mp) tasks in a single process, one after another, to save on process startup time. The number of tasks per process adapts to how long each task takes. Does not apply to the worker pool (--mp-pool) or remote agents.',
+        }
+    main_opts['--mp-node-slots'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'NUM_SLOTS',
+            'dest'      : 'mp_node_slots',
+            'help'      : 'Share the specified number of node-wide slots with every other PyRadmon (or DummyMP) instance on this node using node slots, so that their total number of multiprocessing (mp) processes stays within the number of slots. CPU usage is not polled when node slots are used. (Node slots can also be set for every instance with the DUMMYMP_NODE_SLOTS environment variable.)',
+        }
+    main_opts['--mp-agents'] = \
+        {
+            'action'    : 'store',
+            'metavar'   : 'HOST:PORT,...',
+            'dest'      : 'mp_agents',
+            'help'      : 'Run multiprocessing (mp) tasks on remote agents on other hosts, specified as a comma separated list of HOST:PORT addresses. Agents are started on each host with "python -m pyradmon.dummymp.remote" from the PyRadmon directory, and must share the authentication key in the DUMMYMP_AUTHKEY environment variable. Plots are written by the agents, so the output path must be on a shared filesystem.',
+        }
 
     add_args(parser, False, main_opts)
 
@@ -561,6 +731,13 @@ def make_argparser():
                 Define the output plot target size.
               dpi=#
                 Define the output plot DPI.
+              downsample=none|lttb|minmax
+                Define the downsampling method for lines with more
+                points than the plot width can show. "lttb" uses
+                Largest-Triangle-Three-Buckets, while "minmax" keeps
+                the minimum and maximum value for each pixel column.
+                Statistics are always computed from the full data.
+                Defaults to none (no downsampling).
             
             Example (using above info):
               "plot1:target_size=595x700,dpi=50"
@@ -585,6 +762,89 @@ def make_argparser():
           --plot-make-dirs
             If specified, automatically make non-existent directories,
             as needed. No additional arguments or options needed.
+          --plot-incremental
+            If specified, only regenerate plots whose inputs have
+            changed since the last run. A fingerprint of the input data
+            files (paths, modification times, and sizes), the plot
+            definition, and the channel is recorded for each output
+            file. Plots with a matching fingerprint (and an existing
+            output file) are skipped. No additional arguments or options
+            needed.
+          --plot-incremental-state
+            Set the file used to record plot fingerprints for
+            --plot-incremental. Defaults to pyradmon_incremental.json.
+          --plot-journal
+            Record each completed plot task in the specified journal
+            file. Each task is recorded (with its plot IDs, channels,
+            and output file paths) as soon as it completes, so the
+            journal survives the run being killed (e.g. by a batch job
+            walltime limit). Without --plot-resume, the journal is
+            started over. Not supported with --plot-archive.
+              Example:
+                --plot-journal "%%EXPERIMENT_ID%%_journal.json"
+          --plot-resume
+            If specified, resume a failed run by skipping the plot tasks
+            recorded in the journal, as long as their output files
+            exist. Newly completed tasks are added to the journal. Use
+            the same options as the failed run! If --plot-journal isn't
+            specified, pyradmon_journal.json is used. No additional
+            arguments or options needed.
+          --plot-bundle
+            Write a compact, gzip compressed JSON data bundle with the
+            time axis, data series, iuse status, and plot labels for
+            all channels to the specified file. The bundle can be
+            viewed with the static web viewer (web/viewer.html), which
+            renders plots on demand in the browser. Variables are
+            replaced like with --plot-define-output, except for
+            channel variables.
+              Example:
+                --plot-bundle "%%EXPERIMENT_ID%%/%%INSTRUMENT_SAT%%.json.gz"
+          --plot-bundle-only
+            If specified, only write the data bundle, and skip plot
+            image generation. No additional arguments or options needed.
+          --plot-layout
+            Set the plot output layout. Valid layouts are:
+              single - one image per channel (the default).
+              pdf    - one multi-page PDF per plot, with one page per
+                       channel. The output file extension is replaced
+                       with .pdf.
+              sheet  - tiled images (contact sheets), with multiple
+                       channels per image. Use --plot-sheet-channels to
+                       set the number of channels per image.
+            For the pdf and sheet layouts, %%CHANNEL%% and %%RELCHANNEL%%
+            in output file names are replaced with the channel range
+            (e.g. "1-4"). If neither is used, the channel range is added
+            to the end of the file name.
+              Example:
+                --plot-layout pdf
+          --plot-sheet-channels
+            Set the number of channels to tile per image when using
+            --plot-layout sheet. Defaults to 4.
+              Example:
+                --plot-sheet-channels 9
+          --plot-pipeline
+            Split the channels into the specified number of channel
+            groups, read the data for each group in parallel, and start
+            making the plots for each group as soon as its data has
+            been read - while the other groups are still being read.
+            This keeps CPUs busy plotting during the (long) data read
+            phase, especially when plotting all channels. Each group
+            reads every data file, so more groups means more reading.
+            Requires multiprocessing (mp), and is not supported with
+            --plot-bundle or --plot-layout pdf.
+              Example:
+                --plot-pipeline 4
+          --plot-archive
+            Write all plots into a single archive file, instead of
+            writing each plot to its own file. Plots are rendered in
+            memory, and written into the archive as they complete,
+            using their output file paths as member names. The archive
+            format is determined by the extension - .zip, .tar, .tar.gz,
+            or .tgz. An index of all members (index.json) is written at
+            the end of the archive. Variables are replaced like with
+            --plot-define-output, except for channel variables.
+              Example:
+                --plot-archive "%%EXPERIMENT_ID%%_%%INSTRUMENT_SAT%%.zip"
             
         NOTE: These options are advanced - although you could (potentially)
               plot using these options, it would probably be very painful!
@@ -614,6 +874,89 @@ def make_argparser():
     add_plot_args(config_parser, True)
     add_config_args(config_parser, False)
     
+    # [batch]
+    batch_parser = subparsers.add_parser('batch', help='Creates plots for all jobs in a batch manifest.', \
+        description = textwrap.dedent("""\
+        Creates plots for all jobs in a batch manifest, in a single process.
+        
+        Each job's configuration is built from its config template, with
+        the >>>EXPID<<<, >>>INSTRUMENT_SAT<<<, >>>STARTDATE<<<, and
+        >>>ENDDATE<<< markers (and any other markers in the job's vars)
+        filled in, just like with pyradmon_driver.csh. All jobs share one
+        multiprocessing (mp) setup and worker pool, and data file
+        enumeration is reused across jobs.
+        """), \
+        epilog = textwrap.dedent("""\
+        Batch manifest format:
+          # Defaults for every job (all optional)
+          template: radiance_plots.yaml.tmpl
+          vars:
+            DATA_DIRBASE: /path/to/data
+            OUTPUT_DIR: /path/to/output
+          config:
+            mp_pool: true
+          
+          jobs:
+            - experiment: e5130_fp
+              instrument: [amsua_n15, amsua_n18]
+              start: 20140601
+              end: 20140814
+            - experiment: e5130_fp
+              instrument: ssmis_f16
+              start: 2014-06-01 00z
+              end: 2014-08-14 18z
+              template: radiance_plots.ssmis_f16.yaml.tmpl
+        
+        Dates may be in "YYYY-MM-DD HHz" or YYYYMMDD format. Relative
+        template paths are relative to the manifest's directory.
+        Multiprocessing (mp) settings are shared by all jobs, so they may
+        only be set in the manifest's config or on the command line.
+        """), \
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_batch_args(batch_parser, False)
+    
+    # [serve]
+    serve_parser = subparsers.add_parser('serve', help='Serves plot and dump requests from a warm process.', \
+        description = textwrap.dedent("""\
+        Serves plot and dump requests from a warm process.
+        
+        The server keeps everything imported, a worker pool forked, and
+        configurations, data file enumeration, and data file headers
+        cached, so that small requests don't pay the startup cost each
+        time. Requests are served over HTTP, on a UNIX socket or a TCP
+        address, one at a time. The configuration file (--config-file)
+        and multiprocessing (mp) options set the defaults for requests.
+        """), \
+        epilog = textwrap.dedent("""\
+        Requests:
+          POST /plot   Make plots. Returns {"outputs": [PATH, ...]}, or with
+                       "return": "bytes", {"outputs": [{"name": PATH,
+                       "data": BASE64}, ...]} without writing any files.
+          POST /dump   Dump data. Returns {"data": {CHANNEL: {VAR: [...]}}}.
+          GET /status  Server status.
+        
+        Request bodies are JSON objects, with any of:
+          "config_file": Configuration file to use instead of the
+                         server's, relative to --serve-config-dir. (Loaded
+                         once, and reloaded when modified.)
+          "config":      Data settings to override, e.g.
+                         {"data_channels": "5", "data_all_channels": false}
+                         Only the experiment_id, data_instrument_sat, and
+                         data_* settings may be overridden, without paths.
+          "plots":       List of plot IDs from the configuration to make,
+                         e.g. ["plot1", "plot2"]. (Default: all plots)
+          "return":      "paths" (default) or "bytes", for /plot.
+        
+        Example:
+          curl --unix-socket pyradmon.sock -d '{"config": {"data_channels":
+            "5", "data_all_channels": false}}' http://localhost/plot
+        
+        Multiprocessing (mp) settings are shared by all requests, so they
+        may only be set when starting the server.
+        """), \
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_serve_args(serve_parser, False)
+    
     return parser
 
 def parse_to_config(parse):
@@ -716,6 +1059,18 @@ def parse_to_config(parse):
     else:
         pyradmon_config['mp_priority_mode'] = "NORMAL"
     
+    if isset_obj("mp_cpu_source", parse):
+        mp_cpu_source = parse.mp_cpu_source
+        mp_cpu_source = mp_cpu_source.strip()
+        if mp_cpu_source == "PROCESS":
+            pyradmon_config['mp_cpu_source'] = "PROCESS"
+        elif mp_cpu_source == "SYSTEM":
+            pyradmon_config['mp_cpu_source'] = "SYSTEM"
+        else:
+            print "ERROR: Invalid multiprocessing (mp) CPU source specified!"
+            print "Valid sources: PROCESS, SYSTEM"
+            return (None, None, None)
+    
     if isset_obj("mp_cpu_limit", parse):
         if (parse.mp_cpu_limit).isdigit():
             pyradmon_config['mp_cpu_limit'] = int(parse.mp_cpu_limit)
@@ -724,12 +1079,77 @@ def parse_to_config(parse):
             print "must specify an integer number of CPUs to limit use to."
             return (None, None, None)
     
+    if isset_obj("mp_memory_limit", parse):
+        mp_memory_limit = parse_size(parse.mp_memory_limit)
+        if mp_memory_limit:
+            pyradmon_config['mp_memory_limit'] = mp_memory_limit
+        else:
+            print "ERROR: Invalid multiprocessing (mp) memory limit! The memory limit"
+            print "must specify a size in bytes, optionally with a K, M, G, or T"
+            print "suffix (e.g. 8G)."
+            return (None, None, None)
+    
+    if isset_obj("mp_shared_memory", parse) and parse.mp_shared_memory:
+        pyradmon_config['mp_shared_memory'] = parse.mp_shared_memory
+    
+    if isset_obj("mp_pool", parse) and parse.mp_pool:
+        pyradmon_config['mp_pool'] = parse.mp_pool
+    
+    if isset_obj("mp_batch_max", parse):
+        if (parse.mp_batch_max).isdigit() and (int(parse.mp_batch_max) > 0):
+            pyradmon_config['mp_batch_max'] = int(parse.mp_batch_max)
+        else:
+            print "ERROR: Invalid multiprocessing (mp) batch size! The batch size must"
+            print "be a positive integer."
+            return (None, None, None)
+    
+    if isset_obj("mp_node_slots", parse):
+        if (parse.mp_node_slots).isdigit() and (int(parse.mp_node_slots) > 0):
+            pyradmon_config['mp_node_slots'] = int(parse.mp_node_slots)
+        else:
+            print "ERROR: Invalid number of multiprocessing (mp) node slots! The number"
+            print "of node slots must be a positive integer."
+            return (None, None, None)
+    
+    if isset_obj("mp_agents", parse):
+        mp_agents = [ agent.strip() for agent in (parse.mp_agents).split(",") if agent.strip() != "" ]
+        
+        for mp_agent in mp_agents:
+            if (":" in mp_agent) and (not mp_agent.rsplit(":", 1)[1].isdigit()):
+                print "ERROR: Invalid multiprocessing (mp) remote agent address '%s'!" % mp_agent
+                print "Agent addresses must be in HOST:PORT format."
+                return (None, None, None)
+        
+        if len(mp_agents) == 0:
+            print "ERROR: No multiprocessing (mp) remote agents specified!"
+            return (None, None, None)
+        
+        pyradmon_config['mp_agents'] = mp_agents
+    
     # We're ready - let's set up logging!
     logger = log.init(logging_level, logging_output, logging_file)
     
     # From now on, we'll stick to using the log module to print stuff
     # out.
     
+    ## Serve args
+    if parse.verb == "serve":
+        # --serve-address
+        if isset_obj("serve_address", parse):
+            if isset_obj("serve_socket", parse):
+                die("ERROR: You can not specify --serve-address and --serve-socket at the same time!")
+            
+            if (not ":" in parse.serve_address) or (not parse.serve_address.rsplit(":", 1)[1].isdigit()):
+                die("ERROR: Invalid server address '%s' specified in --serve-address! Must be in HOST:PORT format." % parse.serve_address)
+        
+        # --serve-config-dir
+        if isset_obj("serve_config_dir", parse) and (not os.path.isdir(parse.serve_config_dir)):
+            die("ERROR: Configuration directory '%s' specified in --serve-config-dir does not exist!" % parse.serve_config_dir)
+        
+        # --serve-cache-ttl
+        if isset_obj("serve_cache_ttl", parse) and (not parse.serve_cache_ttl.isdigit()):
+            die("ERROR: Invalid cache time '%s' specified in --serve-cache-ttl! Must be a number of seconds." % parse.serve_cache_ttl)
+    
     ## Config args, part 1
     if parse.verb == "config":
         # We will only read --config-load here. All others will be
@@ -1213,6 +1633,12 @@ def parse_to_config(parse):
                             warn("Skipping key-value pair.")
                             continue
                         plot_dict[settings_def_plot]["settings"][kvpair[0]] = int(kvpair[1])
+                    elif kvpair[0] == 'downsample':
+                        if not kvpair[1].lower() in DOWNSAMPLE_METHODS:
+                            warn("Key-value pair for downsample is invalid - value must be one of: %s!" % ", ".join(DOWNSAMPLE_METHODS))
+                            warn("Skipping key-value pair.")
+                            continue
+                        plot_dict[settings_def_plot]["settings"][kvpair[0]] = kvpair[1].lower()
                     else:
                         # Strange stuff
                         warn("Key '%s' in not defined - setting anyway." % str(kvpair[0]))
@@ -1253,6 +1679,51 @@ def parse_to_config(parse):
                 # Done!
         if isset_obj("plot_make_dirs", parse) and parse.plot_make_dirs:
             pyradmon_config["make_dirs"] = parse.plot_make_dirs
+        
+        if isset_obj("plot_incremental", parse) and parse.plot_incremental:
+            pyradmon_config["plot_incremental"] = parse.plot_incremental
+        
+        if isset_obj("plot_incremental_state", parse):
+            pyradmon_config["plot_incremental_state"] = parse.plot_incremental_state
+        
+        if isset_obj("plot_journal", parse):
+            pyradmon_config["plot_journal"] = parse.plot_journal
+        
+        if isset_obj("plot_resume", parse) and parse.plot_resume:
+            pyradmon_config["plot_resume"] = parse.plot_resume
+        
+        if isset_obj("plot_bundle", parse):
+            pyradmon_config["plot_bundle"] = parse.plot_bundle
+        
+        if isset_obj("plot_bundle_only", parse) and parse.plot_bundle_only:
+            pyradmon_config["plot_bundle_only"] = parse.plot_bundle_only
+        
+        if isset_obj("plot_archive", parse):
+            pyradmon_config["plot_archive"] = parse.plot_archive
+        
+        if isset_obj("plot_layout", parse):
+            if (parse.plot_layout).lower() in [ "single", "pdf", "sheet" ]:
+                pyradmon_config["plot_layout"] = (parse.plot_layout).lower()
+            else:
+                print "ERROR: Invalid plot layout specified!"
+                print "Valid layouts: single, pdf, sheet"
+                return (None, None, None)
+        
+        if isset_obj("plot_sheet_channels", parse):
+            if (parse.plot_sheet_channels).isdigit() and (int(parse.plot_sheet_channels) > 0):
+                pyradmon_config["plot_sheet_channels"] = int(parse.plot_sheet_channels)
+            else:
+                print "ERROR: Invalid number of sheet channels! The number of sheet"
+                print "channels must be an integer greater than 0."
+                return (None, None, None)
+        
+        if isset_obj("plot_pipeline", parse):
+            if (parse.plot_pipeline).isdigit() and (int(parse.plot_pipeline) > 1):
+                pyradmon_config["plot_pipeline"] = int(parse.plot_pipeline)
+            else:
+                print "ERROR: Invalid number of pipeline channel groups! The number of"
+                print "channel groups must be an integer greater than 1."
+                return (None, None, None)
             
             # Done!
     
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# PyRadmon - Python Radiance Monitoring Tool
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# Batch Job Library -
+#   library for loading batch job manifests, and building the
+#   configuration for each job from its config template
+# 
+
+from core import *
+import config
+
+import os
+import re
+import yaml
+
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
+
+# Template markers filled in from each job's fields. Templates use
+# these as >>>MARKER<<<, just like with pyradmon_driver.csh.
+JOB_TEMPLATE_MARKERS = {
+                         "experiment" : "EXPID",
+                         "instrument" : "INSTRUMENT_SAT",
+                         "start"      : "STARTDATE",
+                         "end"        : "ENDDATE",
+                       }
+
+# Fields that may be set for a job (or in the manifest, for all jobs)
+JOB_FIELDS = [ "experiment", "instrument", "start", "end", "template", "vars", "config" ]
+
+def parse_job_date(job_date, end = False):
+    """Parse a job start or end date.
+    
+    Given a date from a batch manifest, either in the PyRadmon
+    "YYYY-MM-DD HHz" format or in the YYYYMMDD format used by
+    pyradmon_driver.csh, return the date in the PyRadmon format.
+    YYYYMMDD dates start at 00z, or end at 18z if `end` is True, like
+    with pyradmon_driver.csh.
+    
+    Args:
+        job_date (str or int): The date to parse.
+        end (bool): Boolean indicating whether the date is an end
+            date. By default, this is set to False.
+    
+    Returns:
+        str: The date in "YYYY-MM-DD HHz" format, or None if the date
+        is not valid.
+    """
+    job_date = str(job_date).strip()
+    
+    if re.match(r"^[0-9]{8}$", job_date):
+        return "%s-%s-%s %s" % (job_date[:4], job_date[4:6], job_date[6:8], "18z" if end else "00z")
+    
+    if re.match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}z?$", job_date):
+        return job_date
+    
+    return None
+
+def expand_template(template_data, template_vars):
+    """Expand a config template.
+    
+    Replace every >>>MARKER<<< in the config template with its value.
+    
+    Args:
+        template_data (str): The config template.
+        template_vars (dict): A dictionary with the markers (without
+            the angle brackets) as keys, and their values as values.
+    
+    Returns:
+        str: The expanded config template.
+    """
+    for marker in template_vars:
+        template_data = template_data.replace(">>>%s<<<" % marker, str(template_vars[marker]))
+    
+    return template_data
+
+def load_manifest(manifest_file):
+    """Load a batch job manifest.
+    
+    Load the list of jobs from a YAML batch manifest. The manifest is
+    in this format::
+        
+        # Defaults for every job (all optional)
+        template: radiance_plots.yaml.tmpl
+        vars:
+          DATA_DIRBASE: /path/to/data
+          OUTPUT_DIR: /path/to/output
+        config:
+          mp_pool: true
+        
+        jobs:
+          - experiment: e5130_fp
+            instrument: [amsua_n15, amsua_n18]
+            start: 20140601
+            end: 20140814
+          - experiment: e5130_fp
+            instrument: ssmis_f16
+            start: 2014-06-01 00z
+            end: 2014-08-14 18z
+            template: radiance_plots.ssmis_f16.yaml.tmpl
+    
+    Each job needs an experiment, instrument, start and end date, and
+    config template, either set on the job itself or as a default. A
+    job with a list of instruments is run once per instrument. The
+    vars and config of a job are merged with the defaults. Relative
+    template paths are relative to the manifest's directory.
+    
+    Args:
+        manifest_file (str): The path of the batch manifest.
+    
+    Returns:
+        tuple: A tuple with the default config dict (for settings 
+        shared by all jobs, like multiprocessing), and the list of job
+        dicts - one per job (and instrument), with all of the fields 
+        above set.
+    """
+    try:
+        mf_fh = open(manifest_file, "r")
+        manifest = yaml.load(mf_fh, Loader=Loader)
+        mf_fh.close()
+    except IOError:
+        edie("ERROR: Could not read batch manifest '%s'!" % manifest_file)
+    except yaml.YAMLError:
+        edie("ERROR: Could not parse batch manifest '%s'!" % manifest_file)
+    
+    if (type(manifest) != dict) or (type(manifest.get("jobs", None)) != list) or (len(manifest["jobs"]) == 0):
+        edie("ERROR: Batch manifest '%s' must contain a list of jobs!" % manifest_file)
+    
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    
+    jobs = []
+    
+    for job_idx in xrange(0, len(manifest["jobs"])):
+        job_def = manifest["jobs"][job_idx]
+        
+        if type(job_def) != dict:
+            edie("ERROR: Job %i in the batch manifest is not a dict!" % (job_idx + 1))
+        
+        for job_field in job_def:
+            if not job_field in JOB_FIELDS:
+                edie("ERROR: Invalid field '%s' specified for job %i in the batch manifest! Valid fields: %s" % (job_field, job_idx + 1, ", ".join(JOB_FIELDS)))
+        
+        # Start with the defaults, and merge the job in
+        job = {}
+        
+        for job_field in [ "experiment", "instrument", "start", "end", "template" ]:
+            job[job_field] = job_def.get(job_field, manifest.get(job_field, None))
+            
+            if job[job_field] == None:
+                edie("ERROR: No %s specified for job %i in the batch manifest!" % (job_field, job_idx + 1))
+        
+        for job_field in [ "vars", "config" ]:
+            for field_src in [ manifest, job_def ]:
+                if (job_field in field_src) and (type(field_src[job_field]) != dict):
+                    edie("ERROR: The %s for job %i in the batch manifest must be a dict!" % (job_field, job_idx + 1))
+            
+            job[job_field] = dict(manifest.get(job_field, None) or {})
+            job[job_field].update(job_def.get(job_field, None) or {})
+        
+        job["start"] = parse_job_date(job["start"])
+        job["end"] = parse_job_date(job["end"], True)
+        
+        if (job["start"] == None) or (job["end"] == None):
+            edie("ERROR: Invalid start or end date for job %i in the batch manifest! Dates must be in 'YYYY-MM-DD HHz' or YYYYMMDD format." % (job_idx + 1))
+        
+        job["template"] = os.path.join(manifest_dir, os.path.expanduser(str(job["template"])))
+        
+        # Run the job once for each instrument
+        if type(job["instrument"]) == list:
+            instruments = job["instrument"]
+        else:
+            instruments = [ job["instrument"] ]
+        
+        for instrument in instruments:
+            inst_job = dict(job)
+            inst_job["instrument"] = str(instrument)
+            jobs.append(inst_job)
+    
+    return (dict(manifest.get("config", None) or {}), jobs)
+
+def job_desc(job):
+    """Describe a batch job.
+    
+    Args:
+        job (dict): The job dict, from :py:func:`load_manifest()`.
+    
+    Returns:
+        str: A short description of the job, for logging.
+    """
+    return "%s/%s (%s - %s)" % (job["experiment"], job["instrument"], job["start"], job["end"])
+
+def make_job_config(job, template_cache):
+    """Build the configuration for a batch job.
+    
+    Expand the job's config template (in memory) with the job's fields
+    and vars, and load the configuration from it. The job's config is
+    then merged into the configuration, along with the job's
+    experiment, instrument, and dates, so that they're set even if the
+    template doesn't use the markers for them.
+    
+    Args:
+        job (dict): The job dict, from :py:func:`load_manifest()`.
+        template_cache (dict): A dictionary of config templates read so
+            far, indexed by path, so that each template is only read
+            once.
+    
+    Returns:
+        tuple: A tuple with the PyRadmon configuration dict and the
+        plot dict for the job.
+    """
+    if not job["template"] in template_cache:
+        try:
+            tmpl_fh = open(job["template"], "r")
+            template_cache[job["template"]] = tmpl_fh.read()
+            tmpl_fh.close()
+        except IOError:
+            edie("ERROR: Could not read config template '%s'!" % job["template"])
+    
+    template_vars = dict(job["vars"])
+    
+    for job_field in JOB_TEMPLATE_MARKERS:
+        template_vars[JOB_TEMPLATE_MARKERS[job_field]] = job[job_field]
+    
+    res = config.loads(expand_template(template_cache[job["template"]], template_vars))
+    
+    if res == None:
+        edie("ERROR: Could not load config template '%s'!" % job["template"])
+    
+    (pyradmon_config, plot_dict) = res
+    
+    if pyradmon_config == None:
+        pyradmon_config = {}
+    
+    pyradmon_config.update(job["config"])
+    
+    pyradmon_config["experiment_id"] = job["experiment"]
+    pyradmon_config["data_instrument_sat"] = job["instrument"]
+    pyradmon_config["data_start_date"] = job["start"]
+    pyradmon_config["data_end_date"] = job["end"]
+    
+    return (pyradmon_config, plot_dict)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# PyRadmon - Python Radiance Monitoring Tool
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# Data Bundle Library -
+#   library for writing compact data bundles for client-side plotting
+# 
+
+from core import *
+from data import SPECIAL_FIELDS
+from plot import fetch_key_from_subplot_dict, spec_list, title_output_replace, check_output_path
+
+import os
+import gzip
+import json
+import math
+import calendar
+
+# Bundle format version - increment this if the bundle format changes
+# in an incompatible way!
+BUNDLE_VERSION = 1
+
+def bundle_time(timestamps):
+    """Convert a list of timestamps into bundle time values.
+    
+    Given a list of :py:class:`datetime.datetime` timestamps, convert
+    them into a list of UNIX epoch times (in seconds, UTC) for use in a
+    data bundle.
+    
+    Args:
+        timestamps (list): List of :py:class:`datetime.datetime`
+            objects to convert.
+    
+    Returns:
+        list: A list of integers with the UNIX epoch time for each
+        timestamp.
+    """
+    return [ calendar.timegm(timestamp.utctimetuple()) for timestamp in timestamps ]
+
+def bundle_series(series):
+    """Convert a data series into bundle series values.
+    
+    Given a list of data values, convert them into a list of floats for
+    use in a data bundle. Invalid (-9999.99) and NaN values are
+    converted to None (null in the bundle), so that they can be shown
+    as gaps by the viewer.
+    
+    Args:
+        series (list): List of data values to convert. Values may be
+            Decimal, float, or int.
+    
+    Returns:
+        list: A list of floats (or None, for invalid values).
+    """
+    bundle_vals = []
+    
+    for val in series:
+        val = float(val)
+        if (val <= -9999) or math.isnan(val):
+            bundle_vals.append(None)
+        else:
+            bundle_vals.append(val)
+    
+    return bundle_vals
+
+def bundle_plot_spec(plot_dict, metadata_dict, rel_channels_dict, custom_vars = None):
+    """Convert the plot specification into a bundle plot specification.
+    
+    Given the plot dictionary, create a simplified plot specification
+    for the viewer, containing the titles, axes, data variables,
+    colors, and labels for each plot and subplot. Title templates are
+    replaced, except for channel specific variables (%CHANNEL%,
+    %RELCHANNEL%, and %FREQUENCY%), which are replaced by the viewer
+    instead. The assimilation status is also determined by the viewer.
+    
+    Note that post_processing functions can't be represented in the
+    bundle. If any are found, a warning is emitted, and the data is
+    bundled as-is.
+    
+    Args:
+        plot_dict (dict): The plot dictionary with information on how
+            to make the plots. See :py:func:`.plot()` help (in plot.py)
+            for more information on its format.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. This should NOT include the channel.
+            See :py:func:`.plot()` help (in plot.py) for more
+            information on its format.
+        rel_channels_dict (dict): The relative channels dictionary to
+            map relative channels to actual data channels.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in title templates. By default, this is set to
+            None.
+    
+    Returns:
+        dict: A dictionary with the bundle plot specification, indexed
+        by plot ID.
+    """
+    bundle_plots = {}
+    
+    for plot_id in plot_dict:
+        # Convenience variable
+        plot = plot_dict[plot_id]
+        
+        bundle_plot = {
+                        "title"         : "",
+                        "assim_status"  : False,
+                        "target_size"   : plot["settings"]["target_size"],
+                        "subplots"      : [],
+                      }
+        
+        if isset("title", plot):
+            bundle_plot["title"] = title_output_replace(plot["title"], metadata_dict, None, rel_channels_dict, True, custom_vars)
+            bundle_plot["assim_status"] = ("%ASSIMILATION_STATUS%" in plot["title"])
+        
+        # Loop through subplot indexes
+        for subplotIndex in xrange(0, len(plot["plots"])):
+            # Grab the correct subplot ID (aka the key)
+            subplotIDKey = fetch_key_from_subplot_dict(plot["plots"][subplotIndex])
+            
+            # Convenience variable
+            subplot = plot["plots"][subplotIndex][subplotIDKey]
+            
+            bundle_subplot = {
+                                "id"        : subplotIDKey,
+                                "title"     : subplot["title"] if isset("title", subplot) else "",
+                                "x_label"   : "",
+                                "y_label"   : "",
+                                "y_ticks"   : None,
+                                "x"         : [],
+                                "y"         : [],
+                                "colors"    : [],
+                                "labels"    : [],
+                                "legend"    : None,
+                             }
+            
+            if isset("axes", subplot):
+                if isset("x", subplot["axes"]) and isset("label", subplot["axes"]["x"]):
+                    bundle_subplot["x_label"] = subplot["axes"]["x"]["label"]
+                if isset("y", subplot["axes"]):
+                    if isset("label", subplot["axes"]["y"]):
+                        bundle_subplot["y_label"] = subplot["axes"]["y"]["label"]
+                    if isset("ticks", subplot["axes"]["y"]):
+                        bundle_subplot["y_ticks"] = subplot["axes"]["y"]["ticks"]
+            
+            if isset("data", subplot):
+                for field in [ "x", "y", "colors", "labels" ]:
+                    if isset(field, subplot["data"]):
+                        bundle_subplot[field] = spec_list(subplot["data"][field])
+                
+                if isset("post_processing", subplot["data"]):
+                    warn("Subplot '%s' uses post_processing, which is not supported in data bundles. Data will be bundled as-is." % subplotIDKey)
+            
+            if isset("legend", subplot):
+                bundle_subplot["legend"] = subplot["legend"]["title"] if isset("title", subplot["legend"]) else ""
+            
+            bundle_plot["subplots"].append(bundle_subplot)
+        
+        bundle_plots[plot_id] = bundle_plot
+    
+    return bundle_plots
+
+def make_bundle(plot_dict, channel_data_dict, metadata_dict, rel_channels_dict, custom_vars = None):
+    """Create a data bundle for client-side plotting.
+    
+    Given the plot dictionary and the data for every channel, create a
+    data bundle containing everything needed to render the plots on
+    demand in a web browser: the time axis, the data series for each
+    channel, the iuse (assimilation) status, the frequency, and the
+    plot titles, labels, and colors.
+    
+    The bundle is a dictionary in the following format::
+    
+        {
+            "version": BUNDLE_VERSION,
+            "experiment_id": "exp_id",
+            "instrument_sat": "amsua_n18",
+            "start_date": "YYYYMMDD",
+            "end_date": "YYYYMMDD",
+            "time": [ EPOCH_SECS, ... ],
+            "channels": [
+                {
+                    "channel": 1,
+                    "rel_channel": 1,
+                    "frequency": "23.800",
+                    "iuse": { "ges": [ 1, ... ], "anl": [ 1, ... ] },
+                    "series": { "ges|bc_total|mean": [ 0.123, null, ... ], ... },
+                },
+                ...
+            ],
+            "plots": { "plot1": { ... }, ... }
+        }
+    
+    If a channel has a different time axis from the first channel, a
+    "time" entry is added to that channel as well.
+    
+    Args:
+        plot_dict (dict): The plot dictionary with information on how
+            to make the plots. See :py:func:`.plot()` help (in plot.py)
+            for more information on its format.
+        channel_data_dict (dict): A dictionary with data channels as
+            keys, and data dictionaries (from :py:func:`.get_data()`,
+            in data.py) as values.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. This should NOT include the channel.
+            See :py:func:`.plot()` help (in plot.py) for more
+            information on its format.
+        rel_channels_dict (dict): The relative channels dictionary to
+            map relative channels to actual data channels.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in title templates. By default, this is set to
+            None.
+    
+    Returns:
+        dict: A dictionary with the data bundle, in the format
+        described above.
+    """
+    bundle = {
+                "version"           : BUNDLE_VERSION,
+                "experiment_id"     : metadata_dict["experiment_id"],
+                "instrument_sat"    : metadata_dict["instrument_sat"],
+                "start_date"        : title_output_replace("%START_DATE%", metadata_dict, None, rel_channels_dict),
+                "end_date"          : title_output_replace("%END_DATE%", metadata_dict, None, rel_channels_dict),
+                "time"              : [],
+                "channels"          : [],
+                "plots"             : bundle_plot_spec(plot_dict, metadata_dict, rel_channels_dict, custom_vars),
+             }
+    
+    # Reverse the channel map
+    # Original: rel_channel -> actual data channel
+    # Inverted: actual data channel -> rel_channel
+    rel_channels_inv_map = dict(zip(rel_channels_dict.values(), rel_channels_dict.keys()))
+    
+    for channel in sorted(channel_data_dict.keys()):
+        # Convenience variable
+        data_dict = channel_data_dict[channel]
+        
+        bundle_channel = {
+                            "channel"       : channel,
+                            "rel_channel"   : rel_channels_inv_map.get(channel, channel),
+                            "frequency"     : str(data_dict["frequency"]) if isset("frequency", data_dict) else "",
+                            "iuse"          : {},
+                            "series"        : {},
+                         }
+        
+        # Time axis - share it with the first channel, if possible!
+        if isset("timestamp", data_dict):
+            channel_time = bundle_time(data_dict["timestamp"])
+            if len(bundle["channels"]) == 0:
+                bundle["time"] = channel_time
+            elif channel_time != bundle["time"]:
+                bundle_channel["time"] = channel_time
+        
+        if isset("iuse", data_dict):
+            for prefix in data_dict["iuse"]:
+                bundle_channel["iuse"][prefix] = [ int(iuse) for iuse in data_dict["iuse"][prefix] ]
+        
+        for data_var in data_dict:
+            if not data_var in SPECIAL_FIELDS:
+                bundle_channel["series"][data_var] = bundle_series(data_dict[data_var])
+        
+        bundle["channels"].append(bundle_channel)
+    
+    return bundle
+
+def write_bundle(bundle, bundle_output, make_dirs = False):
+    """Write a data bundle to a compressed file.
+    
+    Write the data bundle to the specified output path as compact,
+    gzip compressed JSON.
+    
+    Args:
+        bundle (dict): The data bundle, created with
+            :py:func:`make_bundle()`.
+        bundle_output (str): The output file path to write the data
+            bundle to. Typically, this should end in ".json.gz".
+        make_dirs (bool): Boolean indicating whether to automatically
+            create output path directories or not. This defaults to
+            False to ensure that the path specified is correct.
+    """
+    # Check to see if the path exists!
+    check_output_path(bundle_output, make_dirs)
+    
+    bundle_fh = gzip.open(bundle_output, "wb")
+    try:
+        json.dump(bundle, bundle_fh, separators = (",", ":"))
+    finally:
+        bundle_fh.close()
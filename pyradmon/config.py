@@ -36,14 +36,28 @@ try:
 except ImportError:
     from yaml import Loader, Dumper
 
+# Valid downsampling methods for the plot downsample setting
+DOWNSAMPLE_METHODS = [ "none", "lttb", "minmax" ]
+
 def load(config_file):
     try:
         cf_fh = open(config_file, "r")
-        config_dict = yaml.load(cf_fh, Loader=Loader)
+        config_data = cf_fh.read()
         cf_fh.close()
     except IOError:
         error("ERROR: Could not read configuration file!")
         return None
+    except:
+        error("ERROR: Something bad occurred...")
+        return None
+    
+    return loads(config_data)
+
+def loads(config_data):
+    # Load configuration from a string, e.g. a config template that
+    # was expanded in memory
+    try:
+        config_dict = yaml.load(config_data, Loader=Loader)
     except yaml.parser.ParserError:
         error("ERROR: Could not parse configuration file!")
         return None
@@ -321,6 +335,76 @@ def validate_config(pyradmon_config):
     if 'data_assim_only' in pyradmon_config:
         if type(pyradmon_config['data_assim_only']) != bool:
             edie("ERROR: Invalid data assimilation selection flag '%s' specified in data_assim_only! Must be a bool." % str(pyradmon_config["data_assim_only"]))
+    
+    if 'mp_cpu_source' in pyradmon_config:
+        if not pyradmon_config['mp_cpu_source'] in [ "PROCESS", "SYSTEM" ]:
+            edie("ERROR: Invalid multiprocessing (mp) CPU source '%s' specified in mp_cpu_source! Valid sources: PROCESS, SYSTEM" % str(pyradmon_config["mp_cpu_source"]))
+    
+    if 'mp_memory_limit' in pyradmon_config:
+        if (type(pyradmon_config['mp_memory_limit']) != int) or (pyradmon_config['mp_memory_limit'] <= 0):
+            edie("ERROR: Invalid multiprocessing (mp) memory limit '%s' specified in mp_memory_limit! Must be a positive int (in bytes)." % str(pyradmon_config["mp_memory_limit"]))
+    
+    if 'mp_shared_memory' in pyradmon_config:
+        if type(pyradmon_config['mp_shared_memory']) != bool:
+            edie("ERROR: Invalid multiprocessing (mp) shared memory flag '%s' specified in mp_shared_memory! Must be a bool." % str(pyradmon_config["mp_shared_memory"]))
+    
+    if 'mp_pool' in pyradmon_config:
+        if type(pyradmon_config['mp_pool']) != bool:
+            edie("ERROR: Invalid multiprocessing (mp) worker pool flag '%s' specified in mp_pool! Must be a bool." % str(pyradmon_config["mp_pool"]))
+    
+    if 'mp_batch_max' in pyradmon_config:
+        if (type(pyradmon_config['mp_batch_max']) != int) or (pyradmon_config['mp_batch_max'] <= 0):
+            edie("ERROR: Invalid multiprocessing (mp) batch size '%s' specified in mp_batch_max! Must be a positive int." % str(pyradmon_config["mp_batch_max"]))
+    
+    if 'mp_node_slots' in pyradmon_config:
+        if (type(pyradmon_config['mp_node_slots']) != int) or (pyradmon_config['mp_node_slots'] <= 0):
+            edie("ERROR: Invalid number of multiprocessing (mp) node slots '%s' specified in mp_node_slots! Must be a positive int." % str(pyradmon_config["mp_node_slots"]))
+    
+    if 'mp_agents' in pyradmon_config:
+        if (type(pyradmon_config['mp_agents']) != list) or (len([ a for a in pyradmon_config['mp_agents'] if type(a) != str ]) > 0):
+            edie("ERROR: Invalid multiprocessing (mp) remote agents '%s' specified in mp_agents! Must be a list of HOST:PORT addresses." % str(pyradmon_config["mp_agents"]))
+    
+    if 'plot_incremental' in pyradmon_config:
+        if type(pyradmon_config['plot_incremental']) != bool:
+            edie("ERROR: Invalid incremental plotting flag '%s' specified in plot_incremental! Must be a bool." % str(pyradmon_config["plot_incremental"]))
+    
+    if 'plot_incremental_state' in pyradmon_config:
+        if type(pyradmon_config['plot_incremental_state']) != str:
+            edie("ERROR: Invalid incremental state file '%s' specified in plot_incremental_state! Must be a str." % str(pyradmon_config["plot_incremental_state"]))
+    
+    if 'plot_journal' in pyradmon_config:
+        if type(pyradmon_config['plot_journal']) != str:
+            edie("ERROR: Invalid journal file '%s' specified in plot_journal! Must be a str." % str(pyradmon_config["plot_journal"]))
+    
+    if 'plot_resume' in pyradmon_config:
+        if type(pyradmon_config['plot_resume']) != bool:
+            edie("ERROR: Invalid resume flag '%s' specified in plot_resume! Must be a bool." % str(pyradmon_config["plot_resume"]))
+    
+    if 'plot_bundle' in pyradmon_config:
+        if type(pyradmon_config['plot_bundle']) != str:
+            edie("ERROR: Invalid data bundle file '%s' specified in plot_bundle! Must be a str." % str(pyradmon_config["plot_bundle"]))
+    
+    if 'plot_bundle_only' in pyradmon_config:
+        if type(pyradmon_config['plot_bundle_only']) != bool:
+            edie("ERROR: Invalid data bundle only flag '%s' specified in plot_bundle_only! Must be a bool." % str(pyradmon_config["plot_bundle_only"]))
+        if pyradmon_config['plot_bundle_only'] and not ('plot_bundle' in pyradmon_config):
+            edie("ERROR: plot_bundle_only is enabled, but no data bundle file was specified in plot_bundle!")
+    
+    if 'plot_archive' in pyradmon_config:
+        if type(pyradmon_config['plot_archive']) != str:
+            edie("ERROR: Invalid plot archive file '%s' specified in plot_archive! Must be a str." % str(pyradmon_config["plot_archive"]))
+    
+    if 'plot_layout' in pyradmon_config:
+        if not (pyradmon_config['plot_layout'] in [ "single", "pdf", "sheet" ]):
+            edie("ERROR: Invalid plot layout '%s' specified in plot_layout! Must be single, pdf, or sheet." % str(pyradmon_config["plot_layout"]))
+    
+    if 'plot_sheet_channels' in pyradmon_config:
+        if (type(pyradmon_config['plot_sheet_channels']) != int) or (pyradmon_config['plot_sheet_channels'] < 1):
+            edie("ERROR: Invalid number of sheet channels '%s' specified in plot_sheet_channels! Must be an int greater than 0." % str(pyradmon_config["plot_sheet_channels"]))
+    
+    if 'plot_pipeline' in pyradmon_config:
+        if (type(pyradmon_config['plot_pipeline']) != int) or (pyradmon_config['plot_pipeline'] < 2):
+            edie("ERROR: Invalid number of pipeline channel groups '%s' specified in plot_pipeline! Must be an int greater than 1." % str(pyradmon_config["plot_pipeline"]))
 
 def validate_plot(plot_dict):
     ## Plot dictionary verification
@@ -339,6 +423,9 @@ def validate_plot(plot_dict):
             edie("ERROR: Plot DPI must be specified and valid for plot '%s'." % plotID)
         if not ( ("target_size" in plot["settings"]) and (type(plot["settings"]["target_size"][0]) == int) and (type(plot["settings"]["target_size"][1]) == int) ):
             edie("ERROR: Plot size must be specified and valid for plot '%s'." % plotID)
+        if isset("downsample", plot["settings"]):
+            if not (plot["settings"]["downsample"] in DOWNSAMPLE_METHODS):
+                edie("ERROR: Downsampling method '%s' is invalid for plot '%s'! Must be one of: %s." % (str(plot["settings"]["downsample"]), plotID, ", ".join(DOWNSAMPLE_METHODS)))
         if isset("output", plot):
             if type(plot["output"]) != str:
                 edie("ERROR: Output file '%s' is not a str for plot '%s'." % (str(plot["output"]), plotID))
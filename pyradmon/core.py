@@ -215,3 +215,25 @@ def check_int(s):
     if s[0] in ('-', '+'):
         return s[1:].isdigit()
     return s.isdigit()
+
+def parse_size(s):
+    # Parse a size with an optional K, M, G, or T suffix (powers of
+    # 1024) into bytes. Returns None if the size is invalid.
+    s = s.strip().upper()
+    if s.endswith("B"):
+        s = s[:-1]
+    
+    multiplier = 1
+    if (len(s) > 0) and (s[-1] in "KMGT"):
+        multiplier = 1024 ** ("KMGT".index(s[-1]) + 1)
+        s = s[:-1]
+    
+    try:
+        size = float(s)
+    except ValueError:
+        return None
+    
+    if size < 0:
+        return None
+    
+    return int(size * multiplier)
@@ -733,7 +733,7 @@ def get_data(files_to_read, data_vars, selected_channel, data_path_format, all_c
         # Return single channel data dict...
         return data_dict
 
-def get_data_columns(files_to_read):
+def get_data_columns(files_to_read, data_path_format, suppress_warnings = False):
     """Returns a dict of the data columns in a file.
 
     Given a list of dicts containing information on files to read, scan
@@ -743,6 +743,10 @@ def get_data_columns(files_to_read):
         files_to_read (list of dict): A list of file dicts, returned by
             :py:func:`.enumerate()`. See :py:func:`.enumerate()` for 
             more information about the file dict format.
+        data_path_format (str): The data path format template, used
+            for extracting the date information from each file name.
+        suppress_warnings (bool): Boolean indicating whether to
+            suppress warnings. By default, this is set to False.
 
     Returns:
         dict: Column dictionary whose keys are the column names, and 
@@ -761,9 +765,6 @@ def get_data_columns(files_to_read):
     
     # Iterate through all of the files!
     for file_to_read in files_to_read:
-        # Increment internal file counter
-        file_counter += 1
-        
         # Extract the path field data from the filename
         field_data = extract_fields_via_template(template_regex, matching_groups, file_to_read["filename"], suppress_warnings)
         
@@ -845,6 +846,58 @@ def get_data_columns(files_to_read):
     # If all else fails, return nothing. (None)
     return None
 
+def get_data_channels(files_to_read):
+    """Returns a sorted list of the data channels in the files.
+
+    Given a list of dicts containing information on files to read, scan
+    each file and return all of the channel numbers found in any of
+    them. Only the channel number of each line is looked at, so this
+    is much faster than reading all of the data with 
+    :py:func:`get_data()` just to find the channels.
+
+    Args:
+        files_to_read (list of dict): A list of file dicts, returned by
+            :py:func:`.enumerate()`. See :py:func:`.enumerate()` for 
+            more information about the file dict format.
+
+    Returns:
+        list of int: A sorted list of the channel numbers found in the
+        files. If there are no files, an empty list is returned.
+    """
+    # Use a set, in case a channel is listed more than once
+    channels_found = set()
+    
+    # Scan every file - a channel may be missing from some cycles!
+    for file_to_read in files_to_read:
+        # with structure auto-closes the file...
+        with open(file_to_read["filename"], 'r') as data_file:
+            # Count the lines we've read, so that we can skip the
+            # metadata
+            data_line_counter = 0
+            
+            # Loop through each line in the data file...
+            for data_line in data_file:
+                # Increment the line counter
+                data_line_counter += 1
+                
+                # Grab the line, clean extra whitespace with strip(),
+                # and split() by space.
+                data_elements = data_line.strip().split()
+                
+                # Skip the metadata line, and only look at actual file
+                # data (not comments)!
+                if (data_line_counter != 2) and (len(data_elements) > 2) and (not data_line.strip().startswith("!")):
+                    # Check to make sure our channel number field is a
+                    # digit.
+                    if check_int(data_elements[0]):
+                        channels_found.add(int(data_elements[0]))
+                    else:
+                        # Channel number field isn't a number... not
+                        # good. Go boom!
+                        edie("ERROR: Data format seems corrupt (first element is non-int)...")
+    
+    return sorted(channels_found)
+
 def post_data_columns(data_columns):
     """Add important data columns to the column list and return them.
 
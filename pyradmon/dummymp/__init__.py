@@ -26,9 +26,17 @@ from detect import *
 from interface import *
 from taskmgr import *
 from config import *
+from shm import *
+from pool import *
+from remote import *
+from journal import *
+from slots import *
+from executor import *
+from aio import *
 
 import time
 import sys
+import signal
 
 # Just a test function.
 def test():
@@ -69,6 +77,19 @@ def test4(jellybean, **kwargs):
     logging.info("Hi there! Magical jelly bean number is arg %i - but sleeping for kwarg %i!" % (jellybean, jb))
     time.sleep(jb)
 
+# Just a test function, that sends large log messages until it's 
+# killed.
+def test5():
+    while True:
+        logging.info("Chatter! " * 10000)
+
+# Just a test function, that sends large log messages for a sec.
+def test6():
+    start = time.time()
+    while time.time() - start < 1:
+        logging.info("Chatter! " * 10000)
+    return 42
+
 # If run directly, run some tests using the test function above.
 if __name__ == "__main__":
     import random
@@ -118,3 +139,26 @@ if __name__ == "__main__":
     reset()
     process_until_done()
     
+    # Killed process test - a process killed while sending a message
+    # shouldn't hang (or break) the other processes! (Its messages
+    # back up while we sleep, so it's killed mid-message.)
+    print "Killing a process mid-task..."
+    reset()
+    chatty_pid = run(test5)
+    quiet_pid = run(test6)
+    
+    while chatty_pid not in config.dummymp_proc_ids:
+        process_process()
+        time.sleep(0.1)
+    
+    time.sleep(1)
+    os.kill(config.dummymp_procs[config.dummymp_proc_ids.index(chatty_pid)].pid, signal.SIGKILL)
+    
+    process_until_done()
+    
+    print get_returns()
+    
+    if (get_returns().get(quiet_pid) != 42) or (config.total_completed != 2):
+        print "ERROR: Killed process broke the other processes!"
+        sys.exit(1)
+    
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - asyncio Integration
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import logging
+
+import config
+from interface import run
+from taskmgr import process_process, process_queue, get_wait_fds, _get_wait_timeout
+from executor import _pop_outcome
+
+# asyncio is optional (it's only in the standard library for Python
+# 3, or from the "trollius" backport for Python 2) - if neither is
+# available, the asyncio functions raise a RuntimeError.
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+# Event loop drivers, indexed by event loop
+_aio_drivers = {}
+
+def aio_available():
+    """Check whether asyncio integration is available.
+    
+    asyncio integration requires asyncio (Python 3), or the trollius
+    backport (Python 2). If neither is installed,
+    :py:func:`run_async()` and :py:func:`wait_until_done_async()` will
+    raise a RuntimeError.
+    
+    Args:
+        None
+    
+    Returns:
+        bool: A boolean indicating whether asyncio integration is
+        available.
+    """
+    return asyncio != None
+
+class _AIODriver(object):
+    """Drive DummyMP tasks from an asyncio event loop.
+    
+    Instead of blocking in :py:func:`.process_until_done()`, the
+    DummyMP process sentinels and message queue are registered as
+    readers with the event loop, so that tasks are handled as soon
+    as a process sends a message or exits - without polling, and
+    without any extra threads. If tasks are waiting to be started
+    (for instance, waiting for CPUs to become available), a timer is
+    scheduled to recheck them.
+    
+    Args:
+        loop (asyncio.AbstractEventLoop): The event loop to drive
+            DummyMP tasks from.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.fds = set()
+        self.timer = None
+        self.scheduled = False
+        self.done_waiters = []
+    
+    def kick(self):
+        """Schedule a DummyMP update on the next event loop iteration."""
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop.call_soon(self._update)
+    
+    def _clear(self):
+        """Unregister all readers and timers from the event loop."""
+        for fd in self.fds:
+            self.loop.remove_reader(fd)
+        self.fds = set()
+        
+        if self.timer != None:
+            self.timer.cancel()
+            self.timer = None
+    
+    def _update(self):
+        """Handle DummyMP process events, and re-register for more."""
+        self.scheduled = False
+        
+        # Unregister everything first - handling process events may
+        # close the file descriptors we were waiting on!
+        self._clear()
+        
+        try:
+            # Fetch any messages first - otherwise, the processes may
+            # block on a full queue (and we'd keep waking up)!
+            process_queue()
+            done = process_process()
+        except Exception as e:
+            logging.exception("Error while processing DummyMP tasks!")
+            self._resolve_waiters(e)
+            return
+        
+        if done:
+            self._resolve_waiters()
+            return
+        
+        for fd in get_wait_fds():
+            self.loop.add_reader(fd, self.kick)
+            self.fds.add(fd)
+        
+        wait_timeout = _get_wait_timeout()
+        
+        if wait_timeout != None:
+            self.timer = self.loop.call_later(wait_timeout, self.kick)
+    
+    def _resolve_waiters(self, exc = None):
+        """Resolve all futures waiting for all tasks to complete.
+        
+        Args:
+            exc (Exception): The exception to set on the futures, if
+                processing failed. By default, this is set to None,
+                which resolves the futures normally.
+        """
+        done_waiters = self.done_waiters
+        self.done_waiters = []
+        
+        for waiter in done_waiters:
+            if waiter.done():
+                continue
+            if exc != None:
+                waiter.set_exception(exc)
+            else:
+                waiter.set_result(None)
+        
+        # Nothing else to drive for this loop - a new driver will be
+        # created for any new tasks.
+        _aio_drivers.pop(self.loop, None)
+
+def _get_driver(loop = None):
+    """Get (and create, if needed) the driver for an event loop.
+    
+    Args:
+        loop (asyncio.AbstractEventLoop): The event loop to get the
+            driver for. By default, this is set to None, which uses
+            the current event loop.
+    
+    Returns:
+        _AIODriver: The driver for the event loop.
+    """
+    if asyncio == None:
+        raise RuntimeError("asyncio integration requires asyncio (or trollius)!")
+    
+    if loop == None:
+        loop = asyncio.get_event_loop()
+    
+    if not loop in _aio_drivers:
+        _aio_drivers[loop] = _AIODriver(loop)
+    
+    return _aio_drivers[loop]
+
+def run_async(func, *args, **kwargs):
+    """Run a function in parallel, returning an awaitable future.
+    
+    Queue the function for running with :py:func:`.run()`, and return
+    an asyncio future for its result. The future is resolved with the
+    function's return value, or its exception, once the task
+    completes. DummyMP tasks are driven from the event loop while
+    there are tasks left, so there is no need to call
+    :py:func:`.process_until_done()`.
+    
+    Cancelling the future does not stop the task - its result is
+    simply discarded.
+    
+    Args:
+        func (function): The function to run.
+        *args: The arguments to pass to the function.
+        **kwargs: The keyword arguments to pass to the function. The
+            dummymp_cost keyword argument can be used for a cost hint
+            (see :py:func:`.run()`), and the dummymp_loop keyword
+            argument can be used to specify the event loop to use.
+            (By default, the current event loop is used.)
+    
+    Returns:
+        asyncio.Future: A future for the task's result.
+    """
+    driver = _get_driver(kwargs.pop("dummymp_loop", None))
+    
+    future = asyncio.Future(loop = driver.loop)
+    
+    def task_done(int_pid):
+        (result, exc) = _pop_outcome(int_pid)
+        
+        if future.cancelled():
+            return
+        
+        if exc != None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+    
+    int_pid = run(func, *args, **kwargs)
+    config.dummymp_task_callbacks[int_pid] = task_done
+    
+    driver.kick()
+    
+    return future
+
+def wait_until_done_async(loop = None):
+    """Wait for all tasks to complete, from an asyncio event loop.
+    
+    This is the asynchronous version of
+    :py:func:`.process_until_done()` - instead of blocking, it returns
+    a future that is resolved once all queued and running tasks have
+    completed. Tasks are driven from the event loop in the meantime.
+    
+    Args:
+        loop (asyncio.AbstractEventLoop): The event loop to use. By
+            default, this is set to None, which uses the current event
+            loop.
+    
+    Returns:
+        asyncio.Future: A future that is resolved (with None) once
+        all tasks have completed.
+    """
+    driver = _get_driver(loop)
+    
+    waiter = asyncio.Future(loop = driver.loop)
+    driver.done_waiters.append(waiter)
+    
+    driver.kick()
+    
+    return waiter
@@ -19,6 +19,7 @@
 #   (library for easily running functions in parallel)
 # 
 
+import os
 import datetime
 import psutil
 
@@ -75,10 +76,60 @@ DUMMYMP_STRING = {
                         DUMMYMP_NUCLEAR     : "Nuclear",
                  }
 
+# CPU availability sources
+# See set_cpu_source() documentation in interface.py for more
+# information.
+DUMMYMP_CPU_PROCESS = 1
+DUMMYMP_CPU_SYSTEM  = 2
+
+# String versions of CPU availability sources
+DUMMYMP_CPU_SOURCE_STRING = {
+                                DUMMYMP_CPU_PROCESS : "Process",
+                                DUMMYMP_CPU_SYSTEM  : "System",
+                            }
+
+# Interval to recheck memory usage when processes are waiting to be 
+# started with a memory budget set, in seconds
+DUMMYMP_MEMORY_INTERVAL = 1.0
+
+# cgroup filesystem mount point
+DUMMYMP_CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Node slot retry interval
+# Amount of time between attempts to take a node slot, when all of the
+# node slots are taken, in seconds.
+DUMMYMP_NODE_SLOT_INTERVAL = 0.5
+
+# Environment variables to fetch the number of node slots and the node
+# slot directory from - these allow node slots to be enabled for every
+# DummyMP instance started by a driver script, at once.
+DUMMYMP_NODE_SLOTS_ENV = "DUMMYMP_NODE_SLOTS"
+DUMMYMP_NODE_SLOT_DIR_ENV = "DUMMYMP_NODE_SLOT_DIR"
+
+# Task batch target time
+# Amount of time a batch of tasks should take to run, in seconds. The
+# batch size is adapted to the average task run time to meet it.
+DUMMYMP_BATCH_TARGET_TIME = 1.0
+
+# Task run time smoothing factor
+# Weight given to each completed task's run time in the average task
+# run time (an exponential moving average).
+DUMMYMP_BATCH_SMOOTHING = 0.3
+
+# Default TCP port for remote agents
+DUMMYMP_REMOTE_PORT = 7845
+
+# Environment variable to fetch the remote agent authentication key
+# from, if one isn't given
+DUMMYMP_REMOTE_AUTHKEY_ENV = "DUMMYMP_AUTHKEY"
+
 # Queue IDs
 # Internal IDs to track queue messages
 DUMMYMP_LOG_ID = 1
 DUMMYMP_RET_ID = 2
+DUMMYMP_END_ID = 3
+DUMMYMP_ERR_ID = 4
+DUMMYMP_STAT_ID = 5
 
 # Deepcopy Flags
 # Flags determining whether to perform a deepcopy or not.
@@ -93,13 +144,91 @@ DUMMYMP_KWARGS_DEEPCOPY = True
 # State Variables
 #######################################################################
 
-# Queues, processes, need-to-be-started process queue, returns
-global dummymp_queues, dummymp_procs, dummymp_start_procs, dummymp_rets
-dummymp_queues = []
+# Processes, need-to-be-started process queue, returns
+global dummymp_procs, dummymp_start_procs, dummymp_rets
 dummymp_procs = []
 dummymp_start_procs = []
 dummymp_rets = {}
 
+# Internal process IDs of running processes (in the same order as
+# dummymp_procs)
+global dummymp_proc_ids
+dummymp_proc_ids = []
+
+# Per-task completion callbacks, and errors from tasks with a 
+# completion callback, indexed by internal process ID
+global dummymp_task_callbacks, dummymp_errors
+dummymp_task_callbacks = {}
+dummymp_errors = {}
+
+# Cost hints for queued processes, indexed by internal process ID
+global dummymp_costs
+dummymp_costs = {}
+
+# Sentinel pipe read ends for running processes (in the same order as
+# dummymp_procs) - these become readable when the process exits
+global dummymp_sentinels
+dummymp_sentinels = []
+
+# Message pipe read ends for running processes (in the same order as
+# dummymp_procs) - each process sends its messages through its own 
+# pipe
+global dummymp_msg_conns
+dummymp_msg_conns = []
+
+# Shared memory directory, the PID of the process that owns it, and
+# the paths of shared arrays within it
+global dummymp_shm_dir, dummymp_shm_owner, dummymp_shm_paths
+dummymp_shm_dir = None
+dummymp_shm_owner = None
+dummymp_shm_paths = []
+
+# Worker pool state - whether the pool is running, worker processes,
+# their task queues, message pipe and sentinel pipe read ends, the 
+# internal ID of the task each worker is running (or None), and 
+# whether the pool is being stopped
+global dummymp_pool_active, dummymp_pool_workers, dummymp_pool_task_queues
+global dummymp_pool_msg_conns, dummymp_pool_sentinels, dummymp_pool_tasks
+global dummymp_pool_stopping
+dummymp_pool_active = False
+dummymp_pool_workers = []
+dummymp_pool_task_queues = []
+dummymp_pool_msg_conns = []
+dummymp_pool_sentinels = []
+dummymp_pool_tasks = []
+dummymp_pool_stopping = False
+
+# Remote agent state - whether agents are connected, the connection to
+# each agent (or None, if it was lost), each agent's address and 
+# number of task slots, the tasks each agent is running (indexed by 
+# internal ID), and any local agent processes that were started
+global dummymp_remote_active, dummymp_remote_conns, dummymp_remote_addrs
+global dummymp_remote_slots, dummymp_remote_tasks, dummymp_remote_local_agents
+dummymp_remote_active = False
+dummymp_remote_conns = []
+dummymp_remote_addrs = []
+dummymp_remote_slots = []
+dummymp_remote_tasks = []
+dummymp_remote_local_agents = []
+
+# Task accounting - the times each queued or running task was queued
+# and started (indexed by internal ID), and the resource usage stats 
+# of each task (indexed by internal ID)
+global dummymp_task_times, dummymp_stats
+dummymp_task_times = {}
+dummymp_stats = {}
+
+# Task journal state - the journal file descriptor (or None, if no 
+# journal is open), its path, the keys of the tasks recorded in it, 
+# and the journal records of queued and running tasks (indexed by 
+# internal ID)
+global dummymp_journal_fd, dummymp_journal_path, dummymp_journal_done
+global dummymp_journal_tasks
+dummymp_journal_fd = None
+dummymp_journal_path = None
+dummymp_journal_done = set()
+dummymp_journal_tasks = {}
+
 # Counters for processes
 global total_procs, total_completed, total_running
 total_procs = 0
@@ -110,10 +239,46 @@ total_running = 0
 global max_processes
 max_processes = 0
 
+# Memory budget configuration, in bytes (0 means no budget set), the
+# largest memory usage seen for a single process, and the last time a
+# process was started with the budget set
+global memory_budget, memory_peak, memory_last_start
+memory_budget = 0
+memory_peak = 0
+memory_last_start = datetime.datetime(1900, 1, 1)
+
+# Node slot configuration - the number of node-wide slots shared by
+# all DummyMP instances on this node (0 means node slots aren't used),
+# the node slot directory (None means the default directory), and the
+# slot lock file descriptor held by each running task (indexed by 
+# internal ID)
+global node_slots, node_slot_dir, node_slot_fds
+try:
+    node_slots = max(int(os.environ.get(DUMMYMP_NODE_SLOTS_ENV, 0)), 0)
+except ValueError:
+    node_slots = 0
+node_slot_dir = os.environ.get(DUMMYMP_NODE_SLOT_DIR_ENV)
+node_slot_fds = {}
+
+# Task batch configuration - the maximum number of tasks to run in a
+# single process (1 means tasks aren't batched), the time a batch 
+# should take, the average task run time so far (None if no task has
+# completed yet), and the tasks of each running batch that haven't 
+# completed yet (indexed by the internal ID of the batch's first task)
+global max_batch_size, batch_target_time, batch_task_time, dummymp_batches
+max_batch_size = 1
+batch_target_time = DUMMYMP_BATCH_TARGET_TIME
+batch_task_time = None
+dummymp_batches = {}
+
 # Current job running mode
 global DUMMYMP_MODE
 DUMMYMP_MODE = DUMMYMP_NORMAL
 
+# Current CPU availability source
+global DUMMYMP_CPU_SOURCE
+DUMMYMP_CPU_SOURCE = DUMMYMP_CPU_PROCESS
+
 # CPU availability, and checking interval threshold
 global CPU_AVAIL, LAST_CPU_CHECK, CPU_CHECK_TIMEDELTA_THRESHOLD
 CPU_AVAIL = psutil.cpu_count()
@@ -132,5 +297,7 @@ global PROCESS_START_CALLBACK, PROCESS_END_CALLBACK
 # Start callback - callback when a process starts
 PROCESS_START_CALLBACK = None
 
-# End callback - callback when a process terminates
+# End callback - callback when a process terminates, and whether to
+# pass the task's resource usage stats to it
 PROCESS_END_CALLBACK = None
+PROCESS_END_CALLBACK_STATS = False
@@ -25,6 +25,7 @@ import datetime
 import config
 import os
 import time
+import math
 
 def poll_procs(interval):
     """Poll for processes and return information about them.
@@ -135,11 +136,426 @@ def getTotalCPUs():
     """
     return psutil.cpu_count()
 
+def _readFile(path):
+    """Read a small system file.
+    
+    Read the entire contents of a small system file (in /proc or 
+    /sys), returning None if it can't be read.
+    
+    Args:
+        path (str): The path of the file to read.
+    
+    Returns:
+        str: The contents of the file, or None if the file could not be
+        read.
+    """
+    try:
+        fh = open(path, "r")
+        try:
+            return fh.read()
+        finally:
+            fh.close()
+    except (IOError, OSError):
+        return None
+
+def getAffinityCPUs():
+    """Get the number of CPUs this process is allowed to run on.
+    
+    Detects and returns the number of CPUs in the CPU affinity mask of
+    this process (as set by taskset, cpusets, or batch schedulers like
+    Slurm).
+    
+    Args:
+        None
+    
+    Returns:
+        int: An integer with the number of CPUs in the affinity mask, 
+        or None if the affinity mask could not be determined.
+    """
+    try:
+        return len(psutil.Process(os.getpid()).cpu_affinity())
+    except (AttributeError, NotImplementedError, psutil.Error):
+        pass
+    
+    # Fall back to the Linux process status
+    status = _readFile("/proc/self/status")
+    
+    if status == None:
+        return None
+    
+    for line in status.splitlines():
+        if line.startswith("Cpus_allowed_list:"):
+            ncpus = 0
+            
+            # Format: 0-3,8,10-11
+            for cpu_range in line.split(":", 1)[1].strip().split(","):
+                if "-" in cpu_range:
+                    (cpu_start, cpu_end) = cpu_range.split("-", 1)
+                    ncpus += int(cpu_end) - int(cpu_start) + 1
+                elif cpu_range != "":
+                    ncpus += 1
+            
+            return ncpus if ncpus > 0 else None
+    
+    return None
+
+def _getCgroupDirs():
+    """Get the cgroup directories for this process.
+    
+    Determine the cgroup directories with CPU controller files for 
+    this process, from the process's own cgroup up to the root. Both 
+    cgroup v1 (cpu controller) and cgroup v2 (unified) hierarchies are
+    supported. Directories that don't exist (for instance, in a 
+    container with its own cgroup namespace) are skipped.
+    
+    Args:
+        None
+    
+    Returns:
+        tuple: Tuple with the first element being the cgroup version 
+        (1 or 2), and the second element being a list of directories,
+        starting with the process's own cgroup. If no cgroup could be 
+        found, (None, []) is returned.
+    """
+    cgroups = _readFile("/proc/self/cgroup")
+    
+    if cgroups == None:
+        return (None, [])
+    
+    for line in cgroups.splitlines():
+        # Format: HIERARCHY_ID:CONTROLLERS:PATH
+        fields = line.split(":", 2)
+        
+        if len(fields) != 3:
+            continue
+        
+        if (fields[0] == "0") and (fields[1] == ""):
+            cgroup_version = 2
+            cgroup_mounts = [ config.DUMMYMP_CGROUP_ROOT ]
+        elif "cpu" in fields[1].split(","):
+            cgroup_version = 1
+            cgroup_mounts = [ os.path.join(config.DUMMYMP_CGROUP_ROOT, fields[1]), os.path.join(config.DUMMYMP_CGROUP_ROOT, "cpu") ]
+        else:
+            continue
+        
+        for cgroup_mount in cgroup_mounts:
+            if not os.path.isdir(cgroup_mount):
+                continue
+            
+            cgroup_dirs = []
+            cgroup_path = fields[2]
+            
+            # Walk up to the root - any of the parents may be limited
+            # too!
+            while True:
+                cgroup_dir = os.path.normpath(os.path.join(cgroup_mount, cgroup_path.lstrip("/")))
+                if os.path.isdir(cgroup_dir):
+                    cgroup_dirs.append(cgroup_dir)
+                if cgroup_path in [ "/", "" ]:
+                    break
+                cgroup_path = os.path.dirname(cgroup_path)
+            
+            return (cgroup_version, cgroup_dirs)
+    
+    return (None, [])
+
+def getCgroupCPUs():
+    """Get the cgroup CPU quota for this process.
+    
+    Detects and returns the CPU quota (in number of CPUs) set by the 
+    cgroup of this process, or any of its parents. For cgroup v2, this
+    is read from cpu.max, and for cgroup v1, this is read from 
+    cpu.cfs_quota_us and cpu.cfs_period_us.
+    
+    Args:
+        None
+    
+    Returns:
+        float: The number of CPUs allowed by the cgroup quota, or None
+        if there is no quota (or it could not be determined).
+    """
+    (cgroup_version, cgroup_dirs) = _getCgroupDirs()
+    
+    cgroup_cpus = None
+    
+    for cgroup_dir in cgroup_dirs:
+        if cgroup_version == 2:
+            # Format: QUOTA PERIOD, where QUOTA may be "max"
+            cpu_max = _readFile(os.path.join(cgroup_dir, "cpu.max"))
+            if cpu_max == None:
+                continue
+            cpu_max = cpu_max.split()
+            if (len(cpu_max) != 2) or (cpu_max[0] == "max"):
+                continue
+            (quota, period) = cpu_max
+        else:
+            quota = _readFile(os.path.join(cgroup_dir, "cpu.cfs_quota_us"))
+            period = _readFile(os.path.join(cgroup_dir, "cpu.cfs_period_us"))
+            if (quota == None) or (period == None):
+                continue
+        
+        try:
+            (quota, period) = (int(quota), int(period))
+        except ValueError:
+            continue
+        
+        # Quotas of -1 mean no limit
+        if (quota > 0) and (period > 0):
+            if (cgroup_cpus == None) or (float(quota) / period < cgroup_cpus):
+                cgroup_cpus = float(quota) / period
+    
+    return cgroup_cpus
+
+def getCPUPressure():
+    """Get the CPU pressure for this process.
+    
+    Detects and returns the CPU pressure stall information (PSI) - the
+    percentage of time, over the last 10 seconds, that some tasks were
+    waiting for a CPU. The pressure for the process's cgroup (cgroup 
+    v2 only) is used if available, otherwise the system-wide pressure 
+    is used.
+    
+    Args:
+        None
+    
+    Returns:
+        float: The CPU pressure percentage, or None if pressure stall 
+        information is not available.
+    """
+    (cgroup_version, cgroup_dirs) = _getCgroupDirs()
+    
+    pressure_files = []
+    if (cgroup_version == 2) and (len(cgroup_dirs) > 0):
+        pressure_files.append(os.path.join(cgroup_dirs[0], "cpu.pressure"))
+    pressure_files.append("/proc/pressure/cpu")
+    
+    for pressure_file in pressure_files:
+        pressure = _readFile(pressure_file)
+        
+        if pressure == None:
+            continue
+        
+        # Format: some avg10=0.00 avg60=0.00 avg300=0.00 total=0
+        for line in pressure.splitlines():
+            fields = line.split()
+            if (len(fields) > 1) and (fields[0] == "some") and fields[1].startswith("avg10="):
+                try:
+                    return float(fields[1].split("=", 1)[1])
+                except ValueError:
+                    pass
+    
+    return None
+
+def getCPULimit():
+    """Get the number of CPUs this process may use.
+    
+    Detects and returns the number of CPUs that this process may use,
+    taking into account the CPU affinity mask and the cgroup CPU 
+    quota. Partial CPUs from the cgroup quota are rounded down, since 
+    using them would get the processes throttled.
+    
+    Args:
+        None
+    
+    Returns:
+        int: An integer with the number of CPUs that this process may 
+        use. This is always at least 1.
+    """
+    ncpus = getAffinityCPUs()
+    
+    if ncpus == None:
+        ncpus = getTotalCPUs()
+    
+    cgroup_cpus = getCgroupCPUs()
+    
+    if cgroup_cpus != None:
+        ncpus = min(ncpus, int(cgroup_cpus))
+    
+    return max(ncpus, 1)
+
+def getCPUAvailSystem():
+    """Get number of CPUs available, from system load information.
+    
+    Fetch the number of CPUs available based on the CPU limit (see 
+    :py:func:`getCPULimit()`), the system load average, and the CPU 
+    pressure (PSI). Unlike :py:func:`getCPUAvail()` with the process 
+    CPU source, this reads a few small system files instead of 
+    polling every process on the system, so it returns immediately.
+    
+    The load average is host-wide, so only the share of external load
+    that falls within the CPU limit is counted. Fractions of a CPU 
+    count as a busy CPU when they exceed the current priority mode's 
+    threshold. If the CPU pressure exceeds that threshold too, the 
+    CPUs are considered oversubscribed, and no more CPUs are made 
+    available.
+    
+    Args:
+        None
+    
+    Returns:
+        int: An integer with the number of CPUs that are available.
+    """
+    ncpus = getCPULimit()
+    threshold = config.DUMMYMP_THRESHOLD[config.DUMMYMP_MODE]
+    
+    # External load - the load that isn't from our processes, scaled 
+    # down to our share of the system
+    try:
+        load = os.getloadavg()[0]
+    except OSError:
+        load = 0.0
+    
+    external_load = max(load - config.total_running, 0.0) * ncpus / getTotalCPUs()
+    
+    busy_cpus = int(math.floor(external_load + 1 - (threshold / 100.0)))
+    available_num_cpus = min(max(ncpus - busy_cpus, 0), ncpus)
+    
+    pressure = getCPUPressure()
+    
+    if (pressure != None) and (pressure > threshold):
+        logging.debug("CPU pressure is high (%.2f%%), not adding CPUs." % pressure)
+        available_num_cpus = min(available_num_cpus, config.total_running)
+    
+    logging.debug("External load: %.2f CPUs" % external_load)
+    logging.debug("Available CPUs: %i/%i" % (available_num_cpus, ncpus))
+    
+    return available_num_cpus
+
+def _getProcessMemory(pid):
+    """Get the memory used by a process.
+    
+    Get the private memory used by a process - its resident set size 
+    (RSS), minus memory shared with other processes (like shared 
+    libraries and memory-mapped files).
+    
+    Args:
+        pid (int): The system process ID of the process.
+    
+    Returns:
+        int: The memory used by the process, in bytes, or None if the 
+        process no longer exists.
+    """
+    try:
+        mem_info = psutil.Process(pid).memory_info()
+    except psutil.Error:
+        return None
+    
+    return max(mem_info.rss - getattr(mem_info, "shared", 0), 0)
+
+def getProcessMemory():
+    """Get the memory used by all running DummyMP processes.
+    
+    Get the private memory used by all running DummyMP spawned 
+    processes (and worker pool workers). The largest memory usage seen
+    for a single process is also recorded, to estimate how much memory
+    a process will use.
+    
+    Args:
+        None
+    
+    Returns:
+        tuple: Tuple with the first element being a list with the 
+        memory used by each process running a task, and the second 
+        element being a list with the memory used by each idle worker 
+        pool worker. All values are in bytes.
+    """
+    busy_pids = getSpawnProcPIDs()
+    idle_pids = []
+    
+    for worker_id in xrange(0, len(config.dummymp_pool_workers)):
+        if config.dummymp_pool_workers[worker_id].is_alive():
+            if config.dummymp_pool_tasks[worker_id] != None:
+                busy_pids.append(config.dummymp_pool_workers[worker_id].pid)
+            else:
+                idle_pids.append(config.dummymp_pool_workers[worker_id].pid)
+    
+    busy_memory = []
+    idle_memory = []
+    
+    for (pids, memory) in [ (busy_pids, busy_memory), (idle_pids, idle_memory) ]:
+        for pid in pids:
+            proc_memory = _getProcessMemory(pid)
+            if proc_memory != None:
+                memory.append(proc_memory)
+                config.memory_peak = max(config.memory_peak, proc_memory)
+    
+    return (busy_memory, idle_memory)
+
+def getMemoryAvail():
+    """Get the amount of memory available on the system.
+    
+    Detects and returns the amount of memory available for new 
+    processes on the system, without swapping.
+    
+    Args:
+        None
+    
+    Returns:
+        int: The amount of memory available, in bytes.
+    """
+    return psutil.virtual_memory().available
+
+def checkMemoryAvail():
+    """Check if there is enough memory to start another process.
+    
+    Using the memory budget (see :py:func:`.set_memory_budget()`), 
+    check whether another process can be started. The memory a process
+    will use is estimated from the largest memory usage seen for a 
+    single process so far - running processes may not have reached 
+    that yet, so they are counted at the estimate, too. Another 
+    process can be started if the projected memory usage fits within 
+    the budget, and the estimate fits within the memory available on 
+    the system.
+    
+    Until a process has completed, the estimate may be too low (the 
+    running processes may still be growing), so processes are started
+    gradually - at most one every DUMMYMP_MEMORY_INTERVAL seconds.
+    
+    If no budget is set, or no processes are running, this always 
+    allows another process to start.
+    
+    Args:
+        None
+    
+    Returns:
+        bool: Boolean indicating whether another process can be started
+        or not.
+    """
+    if config.memory_budget <= 0:
+        return True
+    
+    if config.total_running == 0:
+        config.memory_last_start = datetime.datetime.now()
+        return True
+    
+    if (config.total_completed == 0) and \
+        (datetime.datetime.now() - config.memory_last_start < datetime.timedelta(seconds = config.DUMMYMP_MEMORY_INTERVAL)):
+        logging.debug("No processes completed yet, starting processes gradually.")
+        return False
+    
+    (busy_memory, idle_memory) = getProcessMemory()
+    
+    projected_memory = sum([ max(proc_memory, config.memory_peak) for proc_memory in busy_memory ]) + sum(idle_memory) + config.memory_peak
+    
+    if projected_memory > config.memory_budget:
+        logging.debug("Memory budget reached (%i MB projected, %i MB budget), waiting to start more processes." % (projected_memory >> 20, config.memory_budget >> 20))
+        return False
+    
+    avail_memory = getMemoryAvail()
+    
+    if config.memory_peak > avail_memory:
+        logging.debug("Not enough memory available (%i MB estimated, %i MB available), waiting to start more processes." % (config.memory_peak >> 20, avail_memory >> 20))
+        return False
+    
+    config.memory_last_start = datetime.datetime.now()
+    
+    return True
+
 def getCPUAvail():
     """Get number of CPUs available.
     
     Fetch the number of CPUs available based on the current priority
-    and limit configuration.
+    mode, CPU source, and limit configuration.
     
     Args:
         None
@@ -153,6 +569,18 @@ def getCPUAvail():
     if (config.DUMMYMP_MODE == config.DUMMYMP_NUCLEAR) or (datetime.datetime.now() - config.LAST_CPU_CHECK <= config.CPU_CHECK_TIMEDELTA_THRESHOLD):
         return config.CPU_AVAIL
     
+    # With the system CPU source, just read the system load!
+    if config.DUMMYMP_CPU_SOURCE == config.DUMMYMP_CPU_SYSTEM:
+        logging.debug("Querying CPUs (%s mode, %s source)..." % (config.DUMMYMP_STRING[config.DUMMYMP_MODE], config.DUMMYMP_CPU_SOURCE_STRING[config.DUMMYMP_CPU_SOURCE]))
+        
+        available_num_cpus = getCPUAvailSystem()
+        
+        # Update state
+        config.CPU_AVAIL = available_num_cpus
+        config.LAST_CPU_CHECK = datetime.datetime.now()
+        
+        return available_num_cpus
+    
     # Get number of CPUs!
     ncpus = psutil.cpu_count()
     
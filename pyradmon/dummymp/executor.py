@@ -0,0 +1,517 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - Executor
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import time
+import logging
+from collections import deque
+
+import config
+from interface import run
+from taskmgr import process_process, process_queue, wait, _get_wait_timeout
+
+# concurrent.futures is optional (it's only in the standard library
+# for Python 3, or from the "futures" backport) - if it's available,
+# DummyMPExecutor is a real Executor, and uses its exceptions.
+try:
+    import concurrent.futures as futures
+except ImportError:
+    futures = None
+
+if futures != None:
+    ExecutorBase = futures.Executor
+    CancelledError = futures.CancelledError
+    TimeoutError = futures.TimeoutError
+else:
+    ExecutorBase = object
+    
+    class CancelledError(Exception):
+        """The future was cancelled."""
+        pass
+    
+    class TimeoutError(Exception):
+        """The operation exceeded the given deadline."""
+        pass
+
+class TaskError(Exception):
+    """The task failed, but its exception could not be passed back.
+    
+    Raised by :py:meth:`DummyMPFuture.result()` when the task failed
+    with an exception that couldn't be sent back from the process
+    (for instance, if it couldn't be pickled), or when the process
+    exited without returning anything. The message contains the
+    traceback from the process, if available.
+    """
+    pass
+
+# Future states
+_PENDING    = "PENDING"
+_RUNNING    = "RUNNING"
+_CANCELLED  = "CANCELLED"
+_FINISHED   = "FINISHED"
+
+def _pump(timeout = None):
+    """Make progress on all DummyMP tasks.
+    
+    Start any queued tasks, handle completed tasks, and wait (up to
+    the timeout) for something to happen. Futures are completed from
+    here, as their tasks complete.
+    
+    Args:
+        timeout (float): The maximum time to wait, in seconds. By
+            default, this is set to None, which waits until an event
+            occurs.
+    
+    Returns:
+        bool: A boolean indicating whether all DummyMP tasks have
+        completed.
+    """
+    if process_process():
+        return True
+    
+    wait_timeout = _get_wait_timeout()
+    if (timeout != None) and ((wait_timeout == None) or (timeout < wait_timeout)):
+        wait_timeout = timeout
+    
+    wait(wait_timeout)
+    
+    # Fetch the messages that woke us up - otherwise, the processes
+    # may block on a full queue (and we'd keep waking up)!
+    process_queue()
+    
+    return False
+
+def _pop_outcome(int_pid):
+    """Fetch (and remove) the outcome of a completed task.
+    
+    Fetch the return value or exception of a completed task, removing
+    it from the return dictionary (and the error dictionary).
+    
+    Args:
+        int_pid (int): The internal process ID of the task.
+    
+    Returns:
+        tuple: Tuple with the first element being the task's return 
+        value (or None), and the second element being the exception 
+        raised by the task (or None, if the task returned normally).
+    """
+    if int_pid in config.dummymp_errors:
+        (exc, exc_tb) = config.dummymp_errors.pop(int_pid)
+        config.dummymp_rets.pop(int_pid, None)
+        if exc == None:
+            exc = TaskError("Task failed! Error follows:\n%s" % exc_tb)
+        return (None, exc)
+    elif int_pid in config.dummymp_rets:
+        return (config.dummymp_rets.pop(int_pid), None)
+    else:
+        return (None, TaskError("Task exited without returning a value!"))
+
+class DummyMPFuture(object):
+    """The result of a task submitted to a :py:class:`DummyMPExecutor`.
+    
+    This has the same interface as :py:class:`concurrent.futures.Future`.
+    Since DummyMP doesn't use a background thread, waiting on a future
+    (with :py:meth:`result()` or :py:meth:`exception()`) is what runs
+    the tasks - so use these methods, rather than
+    :py:func:`concurrent.futures.wait()` or
+    :py:func:`concurrent.futures.as_completed()`. (Use
+    :py:meth:`DummyMPExecutor.as_completed()` instead.)
+    
+    Futures should only be created by :py:meth:`DummyMPExecutor.submit()`.
+    """
+    def __init__(self):
+        self._state = _PENDING
+        self._result = None
+        self._exception = None
+        self._done_callbacks = []
+    
+    def cancel(self):
+        """Cancel the task, if possible.
+        
+        Tasks can only be cancelled if they haven't been handed to
+        DummyMP yet (they are still waiting for the executor's
+        max_workers limit).
+        
+        Returns:
+            bool: True if the task was cancelled, or False otherwise.
+        """
+        if self._state in [ _RUNNING, _FINISHED ]:
+            return False
+        
+        if self._state == _PENDING:
+            self._state = _CANCELLED
+            self._invoke_callbacks()
+        
+        return True
+    
+    def cancelled(self):
+        """Return True if the task was cancelled."""
+        return self._state == _CANCELLED
+    
+    def running(self):
+        """Return True if the task has been handed to DummyMP, and has
+        not finished yet."""
+        return self._state == _RUNNING
+    
+    def done(self):
+        """Return True if the task was cancelled, or has finished."""
+        return self._state in [ _CANCELLED, _FINISHED ]
+    
+    def _wait(self, timeout):
+        """Run tasks until this future is done, or the timeout expires.
+        
+        Args:
+            timeout (float): The maximum time to wait, in seconds. If
+                None, there is no limit.
+        """
+        if timeout != None:
+            deadline = time.time() + timeout
+        
+        while not self.done():
+            if timeout != None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError()
+            else:
+                remaining = None
+            
+            if _pump(remaining) and (not self.done()):
+                # Everything is done, but our task isn't - DummyMP
+                # must have been reset!
+                self.set_exception(TaskError("Task was lost - DummyMP may have been reset."))
+    
+    def result(self, timeout = None):
+        """Return the task's return value.
+        
+        Run tasks until this task completes (or the timeout expires),
+        and return its return value.
+        
+        Args:
+            timeout (float): The maximum time to wait, in seconds. By
+                default, this is set to None, which waits until the
+                task completes.
+        
+        Returns:
+            object: The task's return value.
+        
+        Raises:
+            CancelledError: If the task was cancelled.
+            TimeoutError: If the task didn't complete before the
+                timeout.
+            Exception: If the task raised an exception, the same
+                exception is raised here.
+        """
+        self._wait(timeout)
+        
+        if self._state == _CANCELLED:
+            raise CancelledError()
+        
+        if self._exception != None:
+            raise self._exception
+        
+        return self._result
+    
+    def exception(self, timeout = None):
+        """Return the exception raised by the task.
+        
+        Run tasks until this task completes (or the timeout expires),
+        and return the exception it raised, if any.
+        
+        Args:
+            timeout (float): The maximum time to wait, in seconds. By
+                default, this is set to None, which waits until the
+                task completes.
+        
+        Returns:
+            Exception: The exception raised by the task, or None if the
+            task completed without raising an exception.
+        
+        Raises:
+            CancelledError: If the task was cancelled.
+            TimeoutError: If the task didn't complete before the
+                timeout.
+        """
+        self._wait(timeout)
+        
+        if self._state == _CANCELLED:
+            raise CancelledError()
+        
+        return self._exception
+    
+    def add_done_callback(self, fn):
+        """Add a callback to call when the future is done.
+        
+        The callback is called with the future as its only argument. If
+        the future is already done, the callback is called immediately.
+        
+        Args:
+            fn (function): The callback to call.
+        """
+        if self.done():
+            fn(self)
+        else:
+            self._done_callbacks.append(fn)
+    
+    def set_running_or_notify_cancel(self):
+        """Mark the future as running, unless it was cancelled.
+        
+        Returns:
+            bool: False if the future was cancelled, or True otherwise.
+        """
+        if self._state == _CANCELLED:
+            return False
+        
+        self._state = _RUNNING
+        return True
+    
+    def set_result(self, result):
+        """Set the task's return value, and mark the future as done."""
+        self._result = result
+        self._state = _FINISHED
+        self._invoke_callbacks()
+    
+    def set_exception(self, exception):
+        """Set the task's exception, and mark the future as done."""
+        self._exception = exception
+        self._state = _FINISHED
+        self._invoke_callbacks()
+    
+    def _invoke_callbacks(self):
+        for callback in self._done_callbacks:
+            try:
+                callback(self)
+            except:
+                logging.exception("Exception calling future callback!")
+        self._done_callbacks = []
+
+class DummyMPExecutor(ExecutorBase):
+    """An Executor that runs tasks with DummyMP.
+    
+    An Executor (see :py:mod:`concurrent.futures`) that runs each
+    submitted task with :py:func:`.run()`, so tasks are started based
+    on DummyMP's CPU availability, priority mode, and limits (and run
+    in the worker pool, if it's running). Multiple executors can be
+    used at once - they share DummyMP's CPUs, but each executor only
+    tracks (and limits) its own tasks.
+    
+    Tasks are run while waiting on their futures (see
+    :py:class:`DummyMPFuture`), or on :py:meth:`map()`,
+    :py:meth:`as_completed()`, and :py:meth:`shutdown()`. Tasks from
+    other executors (and :py:func:`.run()`) make progress at the same
+    time. Note that task return values are removed from the return
+    dictionary (see :py:func:`.get_returns()`) once they are set on
+    the future.
+    
+    Example::
+    
+        with DummyMPExecutor(max_workers = 4) as executor:
+            futures = [ executor.submit(func, arg) for arg in args ]
+            for future in executor.as_completed(futures):
+                print future.result()
+    
+    Args:
+        max_workers (int): The maximum number of this executor's tasks
+            to hand to DummyMP at once. By default, this is set to
+            None, which hands every task to DummyMP as soon as it is
+            submitted (DummyMP still limits how many run at once).
+    """
+    def __init__(self, max_workers = None):
+        if (max_workers != None) and (max_workers <= 0):
+            raise ValueError("max_workers must be greater than 0")
+        
+        self._max_workers = max_workers
+        self._pending = deque()
+        self._running = {}
+        self._shutdown = False
+    
+    def submit(self, fn, *args, **kwargs):
+        """Submit a task to run.
+        
+        Args:
+            fn (function): The function to run.
+            *args: The arguments to pass to the function.
+            **kwargs: The keyword arguments to pass to the function.
+                The dummymp_cost keyword argument can be used for a
+                cost hint (see :py:func:`.run()`).
+        
+        Returns:
+            DummyMPFuture: A future for the task.
+        """
+        if self._shutdown:
+            raise RuntimeError("Cannot submit new tasks after shutdown!")
+        
+        future = DummyMPFuture()
+        self._pending.append((future, fn, args, kwargs))
+        self._start_pending()
+        
+        return future
+    
+    def _start_pending(self):
+        """Hand pending tasks to DummyMP, up to the max_workers limit."""
+        while (len(self._pending) > 0) and \
+            ((self._max_workers == None) or (len(self._running) < self._max_workers)):
+            (future, fn, args, kwargs) = self._pending.popleft()
+            
+            if not future.set_running_or_notify_cancel():
+                continue
+            
+            int_pid = run(fn, *args, **kwargs)
+            
+            self._running[int_pid] = future
+            config.dummymp_task_callbacks[int_pid] = self._task_done
+    
+    def _task_done(self, int_pid):
+        """Complete the future for a task that has completed.
+        
+        This is the task's completion callback, called by DummyMP.
+        
+        Args:
+            int_pid (int): The internal process ID of the task.
+        """
+        future = self._running.pop(int_pid)
+        
+        (result, exc) = _pop_outcome(int_pid)
+        
+        if exc != None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        
+        self._start_pending()
+    
+    def map(self, fn, *iterables, **kwargs):
+        """Run a function over the given iterables.
+        
+        Like the built-in :py:func:`map()`, but the function calls are
+        submitted as tasks. The results are returned in order.
+        
+        Args:
+            fn (function): The function to run.
+            *iterables: Iterables with the arguments for each call.
+            timeout (float): The maximum time to wait for all of the
+                results, in seconds (keyword argument only). By
+                default, there is no limit.
+            chunksize (int): Ignored - for compatibility only (keyword
+                argument only).
+        
+        Returns:
+            generator: A generator yielding the results, in order.
+        
+        Raises:
+            TimeoutError: If a result isn't available before the
+                timeout (when iterating).
+            Exception: If a task raised an exception, the same
+                exception is raised when its result is reached.
+        """
+        timeout = kwargs.get("timeout", None)
+        
+        if timeout != None:
+            deadline = time.time() + timeout
+        
+        fs = [ self.submit(fn, *fn_args) for fn_args in zip(*iterables) ]
+        
+        def result_iterator():
+            try:
+                for future in fs:
+                    if timeout == None:
+                        yield future.result()
+                    else:
+                        yield future.result(deadline - time.time())
+            finally:
+                for future in fs:
+                    future.cancel()
+        
+        return result_iterator()
+    
+    def as_completed(self, fs, timeout = None):
+        """Yield futures as they complete.
+        
+        Like :py:func:`concurrent.futures.as_completed()`, but runs
+        tasks while waiting.
+        
+        Args:
+            fs (list): The futures to wait for.
+            timeout (float): The maximum time to wait for all of the
+                futures, in seconds. By default, there is no limit.
+        
+        Returns:
+            generator: A generator yielding each future, once it is
+            done.
+        
+        Raises:
+            TimeoutError: If the futures aren't all done before the
+                timeout.
+        """
+        if timeout != None:
+            deadline = time.time() + timeout
+        
+        fs = list(fs)
+        
+        while len(fs) > 0:
+            for future in [ future for future in fs if future.done() ]:
+                fs.remove(future)
+                yield future
+            
+            if len(fs) == 0:
+                break
+            
+            if timeout != None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError()
+            else:
+                remaining = None
+            
+            if _pump(remaining):
+                # Everything is done - anything left was lost!
+                for future in [ future for future in fs if not future.done() ]:
+                    future.set_exception(TaskError("Task was lost - DummyMP may have been reset."))
+    
+    def shutdown(self, wait = True, cancel_futures = False):
+        """Shut down the executor.
+        
+        No more tasks can be submitted after shutting down.
+        
+        Args:
+            wait (bool): Boolean indicating whether to run tasks until
+                all of this executor's tasks have completed. By
+                default, this is set to True.
+            cancel_futures (bool): Boolean indicating whether to cancel
+                tasks that haven't been handed to DummyMP yet. By
+                default, this is set to False.
+        """
+        self._shutdown = True
+        
+        if cancel_futures:
+            for (future, fn, args, kwargs) in self._pending:
+                future.cancel()
+            self._pending.clear()
+        
+        if wait:
+            fs = [ pending[0] for pending in self._pending ] + self._running.values()
+            for future in self.as_completed(fs):
+                pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait = True)
+        return False
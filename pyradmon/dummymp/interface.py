@@ -25,11 +25,20 @@
 # 
 
 from multiprocessing import Process, Queue
+import os
 import copy
+import time
+import datetime
+import psutil
 
 import config
 import _version
-from taskmgr import process_queue
+from taskmgr import process_queue, _proc_complete, _task_complete
+from shm import release_shared
+from pool import stop_pool
+from remote import disconnect_agents
+from journal import close_journal
+from detect import getCPULimit
 
 def set_max_processes(max_proc):
     """Set maximum processors for DummyMP to use.
@@ -59,6 +68,84 @@ def get_max_processes():
     """
     return config.max_processes
 
+def set_memory_budget(budget):
+    """Set the memory budget for DummyMP to use.
+    
+    Set the maximum amount of memory for DummyMP processes to use. 
+    Before starting a process, DummyMP checks the memory used by the 
+    running processes, and the memory available on the system. If 
+    starting another process would likely exceed the budget (or the 
+    available memory), starting processes is held off until memory is
+    freed. At least one process is always allowed to run.
+    
+    Args:
+        budget (int): Integer specifying the memory budget, in bytes. 
+            If set to 0, no memory budget is used. (This is the 
+            default.)
+    """
+    config.memory_budget = budget
+
+def get_memory_budget():
+    """Get the memory budget for DummyMP to use.
+    
+    Fetch and return the memory budget for DummyMP to use.
+    
+    Args:
+        None
+    
+    Returns:
+        int: Integer specifying the current memory budget, in bytes. 
+        A value of 0 means that no memory budget is set.
+    """
+    return config.memory_budget
+
+def set_batch_size(max_size, target_time = None):
+    """Set the maximum number of tasks to run in a single process.
+    
+    When there are many small tasks, starting a process for each task
+    can take longer than the task itself. With batching enabled, 
+    several queued tasks are started together in a single process, 
+    which runs them one after another.
+    
+    The batch size adapts to the tasks - DummyMP keeps track of the 
+    average task run time, and picks the number of tasks that should
+    take about target_time to run (up to max_size). Until a task has
+    completed, tasks aren't batched. To keep the load balanced, a 
+    batch never takes more than its share of the queued tasks across
+    the available CPUs, so batches get smaller as the queue empties.
+    
+    Each task in a batch is still its own task - returns, stats, 
+    errors, and callbacks are handled the same way as unbatched 
+    tasks. Batching only applies to tasks started in new processes -
+    tasks run by the worker pool (see :py:func:`.start_pool()`) or by
+    remote agents are not batched.
+    
+    Args:
+        max_size (int): Integer specifying the maximum number of tasks
+            to run in a single process. If set to 1, tasks are not 
+            batched. (This is the default.)
+        target_time (float): The time a batch should take to run, in
+            seconds. By default, this is set to None, which keeps the
+            current target time (initially 1 second).
+    """
+    config.max_batch_size = max(int(max_size), 1)
+    
+    if target_time != None:
+        config.batch_target_time = float(target_time)
+
+def get_batch_size():
+    """Get the maximum number of tasks to run in a single process.
+    
+    Args:
+        None
+    
+    Returns:
+        int: Integer specifying the current maximum number of tasks to
+        run in a single process. A value of 1 means that tasks are not
+        batched.
+    """
+    return config.max_batch_size
+
 def set_priority_mode(mode):
     """Set the priority mode for DummyMP.
     
@@ -115,6 +202,60 @@ def set_priority_mode(mode):
     """
     config.DUMMYMP_MODE = mode
 
+def set_cpu_source(source):
+    """Set the CPU availability source for DummyMP.
+    
+    Set the source DummyMP uses to determine how many CPUs are 
+    available. The priority mode (see :py:func:`set_priority_mode()`)
+    still controls how conscious DummyMP is of other running 
+    processes, regardless of the source.
+    
+    Available sources:
+    
+        DUMMYMP_CPU_PROCESS - Process source.
+                              Polls every process on the system for 
+                              its CPU usage, and counts the CPUs used
+                              by other processes. This is the default,
+                              and is the most precise on a shared 
+                              machine, but it takes a while (up to a 
+                              second) to poll the processes.
+        DUMMYMP_CPU_SYSTEM  - System source.
+                              Reads the CPU affinity mask, the cgroup
+                              CPU quota (cgroup v1 or v2), the load 
+                              average, and the CPU pressure (PSI). 
+                              This respects the CPU limits set by 
+                              containers and batch schedulers (like 
+                              Slurm), and is nearly instant.
+    
+    Args:
+        source (int): Integer constant specifying the CPU availability
+            source for DummyMP to use.
+    """
+    config.DUMMYMP_CPU_SOURCE = source
+    
+    # Start over with the CPU availability, since the limits may be 
+    # different!
+    if source == config.DUMMYMP_CPU_SYSTEM:
+        config.CPU_AVAIL = getCPULimit()
+    else:
+        config.CPU_AVAIL = psutil.cpu_count()
+    config.LAST_CPU_CHECK = datetime.datetime(1900, 1, 1)
+
+def get_cpu_source():
+    """Get the CPU availability source that DummyMP is using.
+    
+    Fetch and return the CPU availability source integer constant that
+    DummyMP is using.
+    
+    Args:
+        None
+    
+    Returns:
+        int: Integer constant specifying the CPU availability source 
+        that DummyMP is using.
+    """
+    return config.DUMMYMP_CPU_SOURCE
+
 def set_start_callback(callback):
     """Set the process starting callback for DummyMP.
     
@@ -135,7 +276,7 @@ def set_start_callback(callback):
     """
     config.PROCESS_START_CALLBACK = callback
 
-def set_end_callback(callback):
+def set_end_callback(callback, with_stats = False):
     """Set the process completion callback for DummyMP.
     
     Set the callback for DummyMP to call when a process has completed.
@@ -148,11 +289,19 @@ def set_end_callback(callback):
     * ``total_procs``: Total processes overall, regardless of whether
       they are running or not.
     
+    If with_stats is enabled, the callback is also called with the
+    resource usage stats of the completed task, as a fourth argument
+    (see :py:func:`get_stats()`).
+    
     Args:
         callback (function): Function callback to call when a process
             has completed.
+        with_stats (bool): Boolean indicating whether to pass the 
+            completed task's resource usage stats to the callback. By
+            default, this is set to False.
     """
     config.PROCESS_END_CALLBACK = callback
+    config.PROCESS_END_CALLBACK_STATS = with_stats
 
 def get_priority_mode():
     """Get the priority mode that DummyMP is using.
@@ -182,7 +331,7 @@ def get_version():
     """
     return _version.__version__
 
-def get_returns():
+def get_returns(with_stats = False):
     """Get function returns from completed function runs.
     
     Fetch and return a dictionary of function returns from completed
@@ -190,23 +339,74 @@ def get_returns():
     indexed.
     
     Args:
-        None
+        with_stats (bool): Boolean indicating whether to include the 
+            resource usage stats of each function run. If enabled,
+            each value in the dictionary is a dictionary with the
+            function return ("return") and the resource usage stats
+            ("stats", see :py:func:`get_stats()`). By default, this is
+            set to False, which returns just the function returns.
     
     Returns:
         dict: Dictionary of function returns, indexed by call order, 
         and zero indexed.
     """
+    if with_stats:
+        return dict([ (int_pid, { "return" : config.dummymp_rets[int_pid],
+                                  "stats"  : config.dummymp_stats.get(int_pid) })
+                      for int_pid in config.dummymp_rets ])
+    
     return config.dummymp_rets
 
+def get_stats():
+    """Get resource usage stats from completed function runs.
+    
+    Fetch and return a dictionary of resource usage stats from 
+    completed function runs (whether they succeeded or not). The 
+    dictionary is indexed by call order, zero indexed, and each value
+    is a dictionary with the following stats:
+    
+    * ``queued``: Time spent waiting in the queue before the function
+      was started, in seconds.
+    * ``wall``: Wall clock time spent running the function, in 
+      seconds.
+    * ``user``: CPU time spent in user mode, in seconds.
+    * ``sys``: CPU time spent in system (kernel) mode, in seconds.
+    * ``max_rss``: Peak resident memory of the process running the
+      function, in bytes. (With the worker pool, this is the peak of
+      the worker, which may have run other functions before.)
+    
+    Stats that couldn't be determined (for instance, if the process 
+    running the function was killed) are set to None.
+    
+    Args:
+        None
+    
+    Returns:
+        dict: Dictionary of resource usage stats, indexed by call 
+        order, and zero indexed.
+    """
+    return config.dummymp_stats
+
 def killall():
     """Kill all currently running processes and remove them from queue.
     
     Kill all of the currently running processes and remove them from 
-    the internal running queue.
+    the internal running queue. Queued functions that haven't started
+    yet are removed as well. Both are counted as completed (without a 
+    return value).
     
     Args:
         None
     """
+    # Stop the worker pool, if it's running
+    stop_pool(True)
+    
+    # Disconnect from any remote agents, terminating their tasks
+    disconnect_agents(True)
+    
+    # Run process_queue() once to get any queue items
+    process_queue()
+    
     # Clear out all of the processes!
     while len(config.dummymp_procs) != 0:
         # Pick the first one
@@ -215,25 +415,31 @@ def killall():
         try:
             # Attempt to terminate...
             dummymp_proc.terminate()
+            dummymp_proc.join()
         except:
             pass
         
-        # Run process_queue() once to get any queue items
-        process_queue()
-        
-        # Remove the queue and process
+        # Remove the process, sentinel, message pipe, and internal
+        # process ID. (Terminated processes may have left partial 
+        # messages behind, so their pipes are just closed.)
         pi = config.dummymp_procs.index(dummymp_proc)
-        config.dummymp_queues.pop(pi)
         config.dummymp_procs.pop(pi)
+        os.close(config.dummymp_sentinels.pop(pi))
+        config.dummymp_msg_conns.pop(pi).close()
+        int_pid = config.dummymp_proc_ids.pop(pi)
         
-        # Add to the completed count and remove from running count...
-        config.total_completed += 1
-        config.total_running -= 1
+        # Add to the completed count, remove from running count, and
+        # make any callbacks, if necessary.
+        _proc_complete(int_pid)
+    
+    # Remove any queued functions that haven't started yet, too.
+    while len(config.dummymp_start_procs) != 0:
+        int_pid = config.dummymp_start_procs.pop(0)[0]
+        config.dummymp_costs.pop(int_pid, None)
         
-        # Make any callbacks, if necessary.
-        if config.PROCESS_END_CALLBACK:
-            config.PROCESS_END_CALLBACK(config.total_completed, config.total_running, config.total_procs)
-            
+        # Count it as running, so that it can be completed
+        config.total_running += 1
+        _task_complete(int_pid)
 
 def reset():
     """Reset DummyMP state and kill all currently running processes.
@@ -247,6 +453,8 @@ def reset():
         None
     """
     killall()
+    release_shared()
+    close_journal()
     reload(config)
 
 def set_args_deepcopy(tf):
@@ -283,11 +491,36 @@ def run(func, *args, **kwargs):
     :py:func:`.process_process()` or :py:func:`.process_until_done()` 
     in order to actually execute the function.
     
+    Queued functions are started in the order they were queued, 
+    unless a cost hint is given with the dummymp_cost keyword 
+    argument. Functions with a cost hint are started longest (most 
+    costly) first, ahead of functions without one, so that a long 
+    running function doesn't end up running alone at the end. 
+    Functions with the same cost are started in the order they were 
+    queued.
+    
     Args:
         func (function) - Function to run.
         *args - Arguments to use with the function.
-        **kwargs - Keyword arguments to use with the function.
+        **kwargs - Keyword arguments to use with the function. The 
+            dummymp_cost keyword argument is reserved for the cost 
+            hint (a non-negative number, in any unit - only the 
+            relative cost matters), and is not passed to the function.
+            Likewise, the dummymp_journal keyword argument is reserved
+            for the task's journal record - if a task journal is open,
+            the record is written to it once the function returns 
+            (see :py:func:`.open_journal()`).
+    
+    Returns:
+        int: The internal process ID for the queued function run. This
+        is the same ID that indexes the return dictionary from
+        :py:func:`get_returns()`.
     """
+    # Pull out the cost hint and journal record, if any - they're not
+    # for the function!
+    cost = kwargs.pop("dummymp_cost", None)
+    journal_rec = kwargs.pop("dummymp_journal", None)
+    
     # We need to perform a deepcopy, since we want the original
     # arguments before running! Without a deepcopy, list, dict, and
     # possibly other arguments could be changed, making the function
@@ -310,8 +543,38 @@ def run(func, *args, **kwargs):
     # Create our start entry
     start_entry = [ config.total_procs, func, final_args, final_kwargs ]
     
-    # Append our start entry!
-    config.dummymp_start_procs.append(start_entry)
+    if journal_rec != None:
+        config.dummymp_journal_tasks[start_entry[0]] = journal_rec
+    
+    # Keep track of when the function was queued (and started), so 
+    # that its queue wait and run time can be reported.
+    config.dummymp_task_times[start_entry[0]] = [ time.time(), None ]
+    
+    if cost == None:
+        # Append our start entry!
+        config.dummymp_start_procs.append(start_entry)
+    else:
+        cost = max(float(cost), 0.0)
+        config.dummymp_costs[start_entry[0]] = cost
+        
+        # The start queue is kept sorted by cost, from highest to 
+        # lowest (with no cost counting as zero), so find the first 
+        # entry that costs less than ours, and insert our start entry 
+        # before it.
+        lo = 0
+        hi = len(config.dummymp_start_procs)
+        
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if config.dummymp_costs.get(config.dummymp_start_procs[mid][0], 0.0) >= cost:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        config.dummymp_start_procs.insert(lo, start_entry)
     
     # Increment total process count
     config.total_procs += 1
+    
+    # Return the internal process ID
+    return start_entry[0]
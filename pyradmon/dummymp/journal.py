@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - Task Journal
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import os
+import json
+import time
+import logging
+
+import config
+
+def _journal_key(record):
+    """Get the journal key for a task record.
+    
+    Args:
+        record (object): The task record - typically a dict.
+    
+    Returns:
+        str: The record serialized to JSON with sorted keys, so that
+        equal records have equal keys.
+    """
+    return json.dumps(record, sort_keys = True, default = str)
+
+def journal_active():
+    """Check whether a task journal is open.
+    
+    Args:
+        None
+    
+    Returns:
+        bool: A boolean indicating whether a task journal is open.
+    """
+    return config.dummymp_journal_fd != None
+
+def open_journal(path, resume = False):
+    """Open a task journal.
+    
+    Open the task journal at the given path. Tasks queued with
+    :py:func:`.run()` with the dummymp_journal keyword argument set to
+    a record (typically a dict describing the task, e.g. its outputs)
+    are recorded in the journal as soon as they complete successfully.
+    A task that fails (or is killed) is not recorded.
+    
+    Each record is written as a single JSON line, appended with one
+    write and synced to disk before continuing, so that the journal
+    stays valid even if the main process dies. (A partially written
+    last line is simply ignored.) The journal is in this format::
+    
+        {"task": RECORD, "time": EPOCH_SECS}
+        ...
+    
+    If the journal is being resumed, the tasks already recorded in it
+    can be checked with :py:func:`journal_done()`, so that they can be
+    skipped.
+    
+    Args:
+        path (str): The path of the journal file.
+        resume (bool): Boolean indicating whether to keep the tasks
+            already recorded in the journal. By default, this is set
+            to False, which starts a new, empty journal.
+    
+    Returns:
+        int: The number of tasks already recorded in the journal.
+    """
+    close_journal()
+    
+    config.dummymp_journal_done = set()
+    
+    if resume and os.path.isfile(path):
+        journal_fh = open(path, "r")
+        
+        try:
+            journal_data = journal_fh.read()
+        finally:
+            journal_fh.close()
+        
+        for journal_line in journal_data.splitlines():
+            try:
+                config.dummymp_journal_done.add(_journal_key(json.loads(journal_line)["task"]))
+            except (ValueError, KeyError, TypeError):
+                logging.debug("Ignoring invalid journal line: %s" % journal_line)
+        
+        journal_flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    else:
+        journal_data = ""
+        journal_flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+    
+    config.dummymp_journal_fd = os.open(path, journal_flags, 0644)
+    config.dummymp_journal_path = path
+    
+    # If the last line was only partially written, end it, so that it
+    # doesn't swallow the next record!
+    if (journal_data != "") and (not journal_data.endswith("\n")):
+        os.write(config.dummymp_journal_fd, "\n")
+    
+    logging.debug("Opened journal %s with %i recorded tasks." % (path, len(config.dummymp_journal_done)))
+    
+    return len(config.dummymp_journal_done)
+
+def journal_done(record):
+    """Check whether a task is recorded in the task journal.
+    
+    Args:
+        record (object): The task record, as passed to :py:func:`.run()`
+            (or :py:func:`journal_record()`).
+    
+    Returns:
+        bool: A boolean indicating whether the task is recorded in the
+        journal. If no journal is open, False is returned.
+    """
+    return _journal_key(record) in config.dummymp_journal_done
+
+def journal_record(record):
+    """Record a completed task in the task journal.
+    
+    This is done automatically for tasks queued with the
+    dummymp_journal keyword argument, but can also be called directly
+    (for instance, for tasks that weren't run in parallel). If no
+    journal is open, nothing is done.
+    
+    Args:
+        record (object): The task record - typically a dict. It must
+            be serializable to JSON.
+    """
+    if config.dummymp_journal_fd == None:
+        return
+    
+    journal_line = json.dumps({ "task" : record, "time" : int(time.time()) }, sort_keys = True, default = str) + "\n"
+    
+    # Write the whole line at once, and make sure it's on disk!
+    os.write(config.dummymp_journal_fd, journal_line)
+    os.fsync(config.dummymp_journal_fd)
+    
+    config.dummymp_journal_done.add(_journal_key(record))
+
+def close_journal():
+    """Close the task journal.
+    
+    Tasks that complete after the journal is closed are not recorded.
+    (This is called automatically by :py:func:`.reset()`.)
+    
+    Args:
+        None
+    """
+    if config.dummymp_journal_fd != None:
+        os.close(config.dummymp_journal_fd)
+        logging.debug("Closed journal %s." % config.dummymp_journal_path)
+    
+    config.dummymp_journal_fd = None
+    config.dummymp_journal_path = None
+    config.dummymp_journal_done = set()
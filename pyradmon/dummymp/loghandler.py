@@ -29,7 +29,7 @@ class DummyMPLogHandler(logging.Handler):
     This class is a custom logging handler to allow spawned processes 
     (from :py:mod:`multiprocessing`) to log without any issues. This 
     works by intercepting emitted log records, and sending them via 
-    queue to the master process. The master process will process each 
+    pipe to the master process. The master process will process each 
     record and call :py:meth:`logging.Logger.handle` to emit the 
     logging record at the master process level.
     
@@ -37,24 +37,24 @@ class DummyMPLogHandler(logging.Handler):
     handler simply by removing the int_pid attribute.
     
     Attributes:
-        queue (:py:class:`multiprocessing.Queue`): The Queue object to 
-            forward logging records to.
+        conn (:py:class:`multiprocessing.Connection`): The message pipe
+            to forward logging records to.
         int_pid (int): The internal PID used to reference the process.
     """
     
-    def __init__(self, int_pid, queue):
+    def __init__(self, int_pid, conn):
         """Initializes DummyMPLogHandler with the inputted internal PID
-        and Queue object."""
+        and message pipe."""
         logging.Handler.__init__(self)
-        self.queue = queue
+        self.conn = conn
         self.int_pid = int_pid
     
     def emit(self, record):
         """Method override to forward logging records to the internal
-        Queue object."""
+        message pipe."""
         try:
             # Format: [ [queueMsgID, PID, internal PID], record ]
-            self.queue.put([[config.DUMMYMP_LOG_ID, os.getpid(), self.int_pid], record])
+            self.conn.send([[config.DUMMYMP_LOG_ID, os.getpid(), self.int_pid], record])
         except:
             # Something went wrong...
             self.handleError(record)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - Worker Pool
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import logging
+
+import config
+from detect import getCPULimit
+from taskmgr import process_queue, wait, _spawn_pool_worker, _check_pool_workers
+
+def pool_active():
+    """Check whether the worker pool is running.
+    
+    Args:
+        None
+    
+    Returns:
+        bool: A boolean indicating whether the worker pool is running.
+    """
+    return config.dummymp_pool_active
+
+def start_pool(num_workers = None):
+    """Start the worker pool.
+    
+    Start a pool of long-lived worker processes. Once the pool is 
+    running, tasks queued with :py:func:`.run()` are handed to the 
+    pool workers instead of each being run in a brand new process. 
+    Workers are forked once, so any modules imported (and any caches 
+    warmed up) before starting the pool are shared by all tasks. The 
+    rest of the API - :py:func:`.process_process()`, 
+    :py:func:`.process_until_done()`, :py:func:`.get_returns()`, and 
+    the callbacks - works the same way.
+    
+    Each task is handed to an idle worker, so no more tasks run at 
+    once than there are workers. Note that with the pool running, the
+    function and arguments for each task are sent to the workers 
+    through a Queue, so they must be picklable.
+    
+    Args:
+        num_workers (int): The number of workers to start. By default,
+            this is set to None, which uses the maximum number of 
+            processes (if set with :py:func:`.set_max_processes()`), or
+            the number of CPUs this process may use otherwise (see 
+            :py:func:`.getCPULimit()`).
+    """
+    if pool_active():
+        logging.warning("WARNING: Worker pool is already running!")
+        return
+    
+    if num_workers == None:
+        if config.max_processes > 0:
+            num_workers = config.max_processes
+        else:
+            num_workers = getCPULimit()
+    
+    num_workers = max(int(num_workers), 1)
+    
+    logging.debug("Starting worker pool with %i workers." % num_workers)
+    
+    config.dummymp_pool_active = True
+    config.dummymp_pool_stopping = False
+    
+    for worker_id in xrange(0, num_workers):
+        _spawn_pool_worker(worker_id)
+
+def stop_pool(kill = False):
+    """Stop the worker pool.
+    
+    Stop the worker pool, sending the END message to each worker and 
+    waiting for them to finish their current tasks and exit. Any tasks
+    that haven't been handed to the pool yet remain queued, and will 
+    be run in their own processes if processing continues.
+    
+    Args:
+        kill (bool): Boolean indicating whether to terminate the 
+            workers immediately instead. Tasks that are running are 
+            counted as completed (without a return value). By default,
+            this is set to False.
+    """
+    if not pool_active():
+        return
+    
+    logging.debug("Stopping worker pool.")
+    
+    config.dummymp_pool_stopping = True
+    
+    if kill:
+        # Get any messages sent so far...
+        process_queue()
+        
+        for worker_id in xrange(0, len(config.dummymp_pool_workers)):
+            try:
+                config.dummymp_pool_workers[worker_id].terminate()
+                config.dummymp_pool_workers[worker_id].join()
+            except:
+                pass
+        
+        # (Partial messages left behind by the terminated workers are
+        # dropped.)
+        _check_pool_workers()
+    else:
+        for worker_id in xrange(0, len(config.dummymp_pool_workers)):
+            # END message
+            config.dummymp_pool_task_queues[worker_id].put(None)
+    
+    # Wait for all of the workers to exit, processing their messages
+    # as we go (so that they can flush their queues and exit).
+    while len([ s for s in config.dummymp_pool_sentinels if s != None ]) > 0:
+        wait()
+        process_queue()
+        _check_pool_workers()
+    
+    config.dummymp_pool_active = False
+    config.dummymp_pool_workers = []
+    config.dummymp_pool_task_queues = []
+    config.dummymp_pool_msg_conns = []
+    config.dummymp_pool_sentinels = []
+    config.dummymp_pool_tasks = []
+    config.dummymp_pool_stopping = False
@@ -20,33 +20,145 @@
 # 
 
 import os
-import time
+import sys
+import pickle
 import logging
+import resource
+import traceback
 
 from loghandler import *
+from shm import attach_shared
 import config
 
-def _runner(process_id, dummymp_queue, func, *args, **kwargs):
+def _setup_logging(process_id, dummymp_conn):
+    """Set up logging in a spawned process.
+    
+    Replace the logging handlers in a spawned process with a 
+    :py:class:`DummyMPLogHandler`, so that all log records are sent to
+    the master process through the process's message pipe.
+    
+    Args:
+        process_id (int): The internal process ID for the particular
+            process. This is NOT the actual system process ID.
+        dummymp_conn (multiprocessing.Connection): The message pipe
+            that the process should send log records to.
+    
+    Returns:
+        DummyMPLogHandler: The logging handler that was installed.
+    """
+    # Get the default logger
+    logger = logging.getLogger()
+    
+    # Set to DEBUG so that we get ALL messages
+    logger.setLevel(logging.DEBUG)
+    
+    # Switch out the logging handler...
+    
+    # First, remove existing handlers...
+    hdlrs = list(logger.handlers)
+    for hdlr in hdlrs:
+        logger.removeHandler(hdlr)
+    
+    # Initialize our DummyMPLogHandler...
+    dmp_handler = DummyMPLogHandler(process_id, dummymp_conn)
+    
+    # ...and then add that handler instance to the main logger!
+    logger.addHandler(dmp_handler)
+    
+    return dmp_handler
+
+def _attach_args(args, kwargs):
+    """Attach any shared arrays passed in the arguments.
+    
+    Args:
+        args (list): The arguments to be passed to the function.
+        kwargs (dict): The keyword arguments to be passed to the 
+            function.
+    
+    Returns:
+        tuple: A tuple containing the arguments and keyword arguments,
+        with shared array descriptors replaced by their arrays. See 
+        :py:func:`.attach_shared()` for more information.
+    """
+    args = [ attach_shared(arg) for arg in args ]
+    for kwarg in kwargs:
+        kwargs[kwarg] = attach_shared(kwargs[kwarg])
+    
+    return (args, kwargs)
+
+def _send_error(process_id, dummymp_conn):
+    """Send the current exception to the master process.
+    
+    Send the exception currently being handled, along with its 
+    formatted traceback, to the master process through the message 
+    pipe. If 
+    the exception can't be pickled, only the traceback is sent.
+    
+    Args:
+        process_id (int): The internal process ID for the particular
+            process. This is NOT the actual system process ID.
+        dummymp_conn (multiprocessing.Connection): The message pipe
+            that the process should send the exception to.
+    """
+    exc = sys.exc_info()[1]
+    exc_tb = traceback.format_exc()
+    
+    try:
+        pickle.dumps(exc)
+    except:
+        exc = None
+    
+    dummymp_conn.send([ [config.DUMMYMP_ERR_ID, os.getpid(), process_id], (exc, exc_tb) ])
+
+def _send_stats(process_id, dummymp_conn, rusage_start):
+    """Send the resource usage stats for a task to the master process.
+    
+    Args:
+        process_id (int): The internal process ID for the task.
+        dummymp_conn (multiprocessing.Connection): The message pipe to
+            send the stats to.
+        rusage_start (resource.struct_rusage): The resource usage of
+            the process when the task was started.
+    """
+    rusage_end = resource.getrusage(resource.RUSAGE_SELF)
+    
+    # ru_maxrss is in bytes on OS X, and in kilobytes everywhere else
+    if sys.platform == "darwin":
+        max_rss = rusage_end.ru_maxrss
+    else:
+        max_rss = rusage_end.ru_maxrss * 1024
+    
+    task_stats = {
+                    "user"      : rusage_end.ru_utime - rusage_start.ru_utime,
+                    "sys"       : rusage_end.ru_stime - rusage_start.ru_stime,
+                    "max_rss"   : max_rss,
+                 }
+    
+    dummymp_conn.send([ [config.DUMMYMP_STAT_ID, os.getpid(), process_id], task_stats ])
+
+def _runner(process_id, dummymp_conn, func, *args, **kwargs):
     """Multiprocess function wrapper for running a function given args.
     
     This function wraps an existing function with its args, and allows 
     for additional fields related to multiprocessing. In particular, 
-    the internal process ID and the multiprocessing Queue object are 
+    the internal process ID and the process's message pipe are 
     added to facilitate communication between the subprocess and the 
     master process.
     
     Args:
         process_id (int): The internal process ID for the particular
             process. This is NOT the actual system process ID.
-        dummymp_queue (multiprocessing.Queue): The Queue object that 
-            the process should send data to. The Queue should be a 
-            Queue made specifically for this process.
+        dummymp_conn (multiprocessing.Connection): The message pipe 
+            that the process should send data to. Every process has 
+            its own pipe, so a process that dies while sending a 
+            message can't break the pipes of the others. (Every 
+            message is still tagged with the internal process ID.)
         func (function): The function that the process should call.
         *args: The arguments that should be passed to the function.
     
     Returns:
         Nothing... but the function will periodically send messages to
-        the Queue in this format:
+        the message pipe in this format:
             [ [ DUMMYMP_MSG_TYPE_ID, SYSTEM_PID, INTERNAL_ID ], DATA... ]
         
         Possible DUMMYMP_MSG_TYPE_IDs include:
@@ -69,32 +181,162 @@ def _runner(process_id, dummymp_queue, func, *args, **kwargs):
                 retrieval. (In plain English: the return values are 
                 sent to the main process, and are stored in a 
                 dictionary for reference.)
+            
+            DUMMYMP_ERR_ID: ID for exceptions. The entire format is:
+                
+                [ [ DUMMYMP_ERR_ID, SYSTEM_PID, INTERNAL_ID ], ( EXCEPTION, TRACEBACK ) ]
+                
+                When a message of this type is sent, the function 
+                raised EXCEPTION (or None, if it couldn't be pickled),
+                with the formatted TRACEBACK string. This is passed to
+                the task's completion callback, if any.
+            
+            DUMMYMP_STAT_ID: ID for resource usage stats, sent whether
+                the function succeeded or not. The entire format is:
+                
+                [ [ DUMMYMP_STAT_ID, SYSTEM_PID, INTERNAL_ID ], STATS ]
+                
+                STATS is a dictionary with the CPU user and system 
+                time used by the function ("user" and "sys", in 
+                seconds), and the peak resident memory of the process
+                ("max_rss", in bytes).
         
     """
-    # Get the default logger
-    logger = logging.getLogger()
+    rusage_start = resource.getrusage(resource.RUSAGE_SELF)
     
-    # Set to DEBUG so that we get ALL messages
-    logger.setLevel(logging.DEBUG)
+    # Send all logging to the master process
+    _setup_logging(process_id, dummymp_conn)
     
-    # Switch out the logging handler...
+    try:
+        # Attach any shared arrays passed in the arguments...
+        (args, kwargs) = _attach_args(args, kwargs)
+        
+        # Call the function!
+        ret = func(*args, **kwargs)
+    except:
+        # Let the master process know, then fail as usual
+        _send_error(process_id, dummymp_conn)
+        raise
+    finally:
+        _send_stats(process_id, dummymp_conn, rusage_start)
     
-    # First, remove existing handlers...
-    hdlrs = logger.handlers
-    for hdlr in hdlrs:
-        logger.removeHandler(hdlr)
+    # Send the return value through the message pipe! (Sending is 
+    # synchronous, so there's no need to wait for it to be flushed.)
+    dummymp_conn.send([ [config.DUMMYMP_RET_ID, os.getpid(), process_id], ret ])
+
+def _batch_runner(dummymp_conn, tasks):
+    """Process function for running a batch of functions in sequence.
     
-    # Initialize our DummyMPLogHandler...
-    dmp_handler = DummyMPLogHandler(process_id, dummymp_queue)
+    This function is called when a batch of tasks is started in a 
+    single process (see :py:func:`.set_batch_size()`). Each task is run
+    in turn, like the tasks of a worker pool worker - a failed task 
+    doesn't stop the rest of the batch.
     
-    # ...and then add that handler instance to the main logger!
-    logger.addHandler(dmp_handler)
+    Tasks are in this format:
+        [ INTERNAL_ID, FUNCTION, ARGS, KWARGS ]
     
-    # Call the function!
-    ret = func(*args, **kwargs)
+    Args:
+        dummymp_conn (multiprocessing.Connection): The message pipe 
+            that the process should send data to.
+        tasks (list): The tasks to run, in order.
     
-    # Send the return value through the queue!
-    dummymp_queue.put([ [config.DUMMYMP_RET_ID, os.getpid(), process_id], ret ])
+    Returns:
+        Nothing... but the process will send messages to the pipe, in 
+        the same format as :py:func:`_pool_runner()`, including the 
+        DUMMYMP_END_ID message once each task is done. (The peak 
+        resident memory in the stats is the peak for the batch so 
+        far.)
+    """
+    # Send all logging to the master process - the internal process ID
+    # is updated for each task.
+    dmp_handler = _setup_logging(None, dummymp_conn)
     
-    # Pause to avoid losing queue (may be a race condition bug?)
-    time.sleep(0.1)
+    for (process_id, func, args, kwargs) in tasks:
+        dmp_handler.int_pid = process_id
+        
+        rusage_start = resource.getrusage(resource.RUSAGE_SELF)
+        
+        try:
+            # Attach any shared arrays passed in the arguments...
+            (args, kwargs) = _attach_args(args, kwargs)
+            
+            # Call the function!
+            ret = func(*args, **kwargs)
+            
+            # Send the return value through the message pipe!
+            dummymp_conn.send([ [config.DUMMYMP_RET_ID, os.getpid(), process_id], ret ])
+        except:
+            # Don't let a failed task take down the rest of the batch!
+            logging.getLogger().error("Task failed! Error follows:\n%s" % traceback.format_exc())
+            _send_error(process_id, dummymp_conn)
+        
+        _send_stats(process_id, dummymp_conn, rusage_start)
+        
+        dummymp_conn.send([ [config.DUMMYMP_END_ID, os.getpid(), process_id], None ])
+
+def _pool_runner(worker_id, task_queue, dummymp_conn):
+    """Worker pool process loop for running functions given args.
+    
+    This function runs in each long-lived worker process of the 
+    worker pool (see :py:func:`.start_pool()`). It pulls tasks from 
+    its task Queue and runs them one at a time, until it receives the
+    END message (None). Logging is set up once, and the worker is 
+    reused for every task.
+    
+    Tasks are in this format:
+        [ INTERNAL_ID, FUNCTION, ARGS, KWARGS ]
+    
+    Args:
+        worker_id (int): The index of the worker in the pool.
+        task_queue (multiprocessing.Queue): The Queue object to pull 
+            tasks from. The Queue should be a Queue made specifically 
+            for this worker.
+        dummymp_conn (multiprocessing.Connection): The message pipe 
+            that the worker should send data to. The pipe is made 
+            specifically for this worker.
+    
+    Returns:
+        Nothing... but the worker will send messages to the pipe, in 
+        the same format as :py:func:`_runner()`. (Since the worker 
+        is reused, the peak resident memory in the stats is the peak 
+        for the worker so far.) In addition, this DUMMYMP_MSG_TYPE_ID 
+        is sent for every task:
+            DUMMYMP_END_ID: Sent when the worker finishes running a 
+                task, whether it succeeded or not. The entire format 
+                is:
+                
+                [ [ DUMMYMP_END_ID, SYSTEM_PID, INTERNAL_ID ], None ]
+    """
+    # Send all logging to the master process - the internal process ID
+    # is updated for each task.
+    dmp_handler = _setup_logging(None, dummymp_conn)
+    
+    while True:
+        task = task_queue.get()
+        
+        # END message - time to go!
+        if task == None:
+            break
+        
+        (process_id, func, args, kwargs) = task
+        dmp_handler.int_pid = process_id
+        
+        rusage_start = resource.getrusage(resource.RUSAGE_SELF)
+        
+        try:
+            # Attach any shared arrays passed in the arguments...
+            (args, kwargs) = _attach_args(args, kwargs)
+            
+            # Call the function!
+            ret = func(*args, **kwargs)
+            
+            # Send the return value through the message pipe!
+            dummymp_conn.send([ [config.DUMMYMP_RET_ID, os.getpid(), process_id], ret ])
+        except:
+            # Don't let a failed task take down the worker!
+            logging.getLogger().error("Task failed! Error follows:\n%s" % traceback.format_exc())
+            _send_error(process_id, dummymp_conn)
+        
+        _send_stats(process_id, dummymp_conn, rusage_start)
+        
+        dummymp_conn.send([ [config.DUMMYMP_END_ID, os.getpid(), process_id], None ])
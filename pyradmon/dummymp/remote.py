@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - Remote Agents
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import os
+import socket
+import select
+import errno
+import atexit
+import logging
+from multiprocessing import Process, AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import config
+from detect import getCPULimit
+from process import _runner
+from taskmgr import process_queue, wait, _task_complete, _get_msg_pipe
+
+def _get_authkey(authkey = None):
+    """Get the remote agent authentication key.
+    
+    Args:
+        authkey (str): The authentication key to use. By default, this
+            is set to None, which fetches the key from the environment
+            variable named by DUMMYMP_REMOTE_AUTHKEY_ENV
+            ("DUMMYMP_AUTHKEY").
+    
+    Returns:
+        str: The authentication key.
+    
+    Raises:
+        ValueError: If no authentication key was given or found.
+    """
+    if authkey == None:
+        authkey = os.environ.get(config.DUMMYMP_REMOTE_AUTHKEY_ENV)
+    
+    if not authkey:
+        raise ValueError("A remote agent authentication key is required! Set it with the %s environment variable." % config.DUMMYMP_REMOTE_AUTHKEY_ENV)
+    
+    return authkey
+
+def _parse_address(address):
+    """Parse a remote agent address.
+    
+    Args:
+        address (str): The address, in HOST:PORT format. If the port
+            is omitted, DUMMYMP_REMOTE_PORT is used. (A (HOST, PORT)
+            tuple may also be given.)
+    
+    Returns:
+        tuple: A (HOST, PORT) tuple for the address.
+    """
+    if type(address) == tuple:
+        return address
+    
+    if ":" in address:
+        (host, port) = address.rsplit(":", 1)
+        return (host, int(port))
+    
+    return (address, config.DUMMYMP_REMOTE_PORT)
+
+def _forward_msgs(msg_conn, conn):
+    """Forward all pending task messages to the client.
+    
+    Args:
+        msg_conn (multiprocessing.Connection): The read end of the 
+            task's message pipe to forward messages from.
+        conn (multiprocessing.connection.Connection): The client
+            connection to forward messages to.
+    """
+    try:
+        while msg_conn.poll():
+            conn.send(msg_conn.recv())
+    except EOFError:
+        # The task has exited, and all of its messages were read.
+        pass
+    except IOError:
+        logging.warning("WARNING: Dropped a partial message from a task that died while sending it!")
+
+def _serve_client(conn, slots):
+    """Run tasks for a connected client.
+    
+    Receive tasks from the client, and run each of them in a new
+    process. Messages from the tasks are forwarded to the client as
+    they are received, and an END message is sent once each task's
+    process exits. This continues until the client disconnects (or
+    sends the END message, None), at which point any tasks still
+    running are terminated.
+    
+    Tasks are in this format:
+        [ INTERNAL_ID, FUNCTION, ARGS, KWARGS ]
+    
+    Args:
+        conn (multiprocessing.connection.Connection): The client
+            connection.
+        slots (int): The number of task slots to advertise to the
+            client.
+    """
+    # Running tasks, indexed by sentinel pipe read end. Each task 
+    # sends its messages through its own pipe (see _get_msg_pipe()).
+    tasks = {}
+    
+    try:
+        conn.send({ "slots" : slots, "host" : socket.gethostname() })
+        
+        while True:
+            try:
+                (ready_fds, _, _) = select.select([ conn.fileno() ] + tasks.keys() + [ t[2].fileno() for t in tasks.values() ], [], [])
+            except (select.error, OSError) as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            
+            for (p, int_pid, msg_conn) in tasks.values():
+                _forward_msgs(msg_conn, conn)
+            
+            for sentinel in ready_fds:
+                if sentinel in tasks:
+                    (p, int_pid, msg_conn) = tasks.pop(sentinel)
+                    
+                    p.join()
+                    _forward_msgs(msg_conn, conn)
+                    os.close(sentinel)
+                    msg_conn.close()
+                    
+                    conn.send([ [config.DUMMYMP_END_ID, p.pid, int_pid], None ])
+            
+            if conn.fileno() in ready_fds:
+                task = conn.recv()
+                
+                # END message - the client is done with us!
+                if task == None:
+                    break
+                
+                (int_pid, func, args, kwargs) = task
+                
+                (msg_r, msg_w) = _get_msg_pipe()
+                p = Process(target = _runner, args = [ int_pid, msg_w, func ] + list(args), kwargs = kwargs)
+                
+                # See process_process() - the sentinel pipe lets us
+                # wait for the task to exit.
+                (sentinel_r, sentinel_w) = os.pipe()
+                p.start()
+                os.close(sentinel_w)
+                msg_w.close()
+                
+                tasks[sentinel_r] = (p, int_pid, msg_r)
+                
+                logging.debug("Started task %i (PID %i)." % (int_pid, p.pid))
+    except (EOFError, IOError, OSError):
+        logging.warning("WARNING: Lost connection to client!")
+    finally:
+        for sentinel in tasks:
+            (p, int_pid, msg_conn) = tasks[sentinel]
+            
+            try:
+                p.terminate()
+                p.join()
+            except:
+                pass
+            
+            # Terminated tasks may have left partial messages behind, 
+            # so don't try to read them!
+            os.close(sentinel)
+            msg_conn.close()
+        
+        conn.close()
+
+def _serve_agent(listener, slots = None, once = False):
+    """Accept clients and run their tasks.
+    
+    Args:
+        listener (multiprocessing.connection.Listener): The listener
+            to accept clients from.
+        slots (int): The number of task slots to advertise to clients.
+            By default, this is set to None, which uses the number of
+            CPUs this process may use (see :py:func:`.getCPULimit()`).
+        once (bool): Boolean indicating whether to exit after serving
+            a single client. By default, this is set to False.
+    """
+    if slots == None:
+        slots = getCPULimit()
+    
+    slots = max(int(slots), 1)
+    
+    while True:
+        try:
+            conn = listener.accept()
+        except (AuthenticationError, EOFError, IOError) as e:
+            logging.warning("WARNING: Rejected client connection! (%s)" % str(e))
+            continue
+        
+        logging.info("Client connected, serving with %i task slots." % slots)
+        _serve_client(conn, slots)
+        logging.info("Client disconnected.")
+        
+        if once:
+            break
+    
+    listener.close()
+
+def run_agent(address = None, authkey = None, slots = None):
+    """Run a remote agent.
+    
+    Listen for connections from DummyMP clients (see
+    :py:func:`connect_agents()`), and run their tasks on this host,
+    forever. Each task is run in its own process, with its return
+    value and log records sent back to the client - just like local
+    tasks. Clients are served one at a time.
+    
+    Tasks (along with their functions and arguments) are pickled, so
+    clients must be trusted - the authentication key makes sure that
+    only clients with the same key can connect. The functions must be
+    importable on this host as well, under the same module names.
+    
+    Args:
+        address (str): The address to listen on, in HOST:PORT format.
+            By default, this is set to None, which listens on all
+            interfaces, on port DUMMYMP_REMOTE_PORT.
+        authkey (str): The authentication key. By default, this is set
+            to None, which fetches the key from the DUMMYMP_AUTHKEY
+            environment variable.
+        slots (int): The number of tasks to run at once. By default,
+            this is set to None, which uses the number of CPUs this
+            process may use (see :py:func:`.getCPULimit()`).
+    """
+    if address == None:
+        address = ("0.0.0.0", config.DUMMYMP_REMOTE_PORT)
+    
+    listener = Listener(_parse_address(address), authkey = _get_authkey(authkey))
+    
+    logging.info("DummyMP remote agent listening on %s:%i." % listener.address)
+    
+    _serve_agent(listener, slots)
+
+def remote_active():
+    """Check whether remote agents are connected.
+    
+    Args:
+        None
+    
+    Returns:
+        bool: A boolean indicating whether remote agents are
+        connected.
+    """
+    return config.dummymp_remote_active
+
+def connect_agents(addresses, authkey = None):
+    """Connect to remote agents.
+    
+    Connect to remote agents started with :py:func:`run_agent()` on
+    other hosts. Once connected, tasks queued with :py:func:`.run()`
+    are sent to the agents instead of being run locally - each agent
+    runs as many tasks at once as it has task slots. The rest of the
+    API - :py:func:`.process_process()`,
+    :py:func:`.process_until_done()`, :py:func:`.get_returns()`, and
+    the callbacks - works the same way, and log records from the tasks
+    are sent back as well.
+    
+    The function and arguments for each task are pickled and sent to
+    the agents, so they must be picklable, and the functions must be
+    importable on the agents' hosts. Shared arrays (see
+    :py:func:`.share_array()`) are copied into each task.
+    
+    If the connection to an agent is lost, the tasks it was running
+    are queued to run again. If no agents are left, tasks are run
+    locally.
+    
+    Args:
+        addresses (list): A list of agent addresses, in HOST:PORT
+            format.
+        authkey (str): The authentication key. By default, this is set
+            to None, which fetches the key from the DUMMYMP_AUTHKEY
+            environment variable.
+    
+    Returns:
+        int: The number of agents that were connected to.
+    """
+    authkey = _get_authkey(authkey)
+    num_connected = 0
+    
+    for address in addresses:
+        address = _parse_address(address)
+        
+        try:
+            conn = Client(address, authkey = authkey)
+            agent_info = conn.recv()
+        except (AuthenticationError, EOFError, IOError, socket.error) as e:
+            logging.warning("WARNING: Could not connect to remote agent %s:%i! (%s)" % (address[0], address[1], str(e)))
+            continue
+        
+        config.dummymp_remote_conns.append(conn)
+        config.dummymp_remote_addrs.append("%s:%i" % address)
+        config.dummymp_remote_slots.append(max(int(agent_info["slots"]), 1))
+        config.dummymp_remote_tasks.append({})
+        
+        logging.debug("Connected to remote agent %s:%i (%s) with %i task slots." % (address[0], address[1], agent_info["host"], agent_info["slots"]))
+        
+        num_connected += 1
+    
+    if num_connected > 0:
+        config.dummymp_remote_active = True
+    
+    return num_connected
+
+def start_local_agents(num_agents, slots = 1, authkey = None):
+    """Start remote agents on this host, and connect to them.
+    
+    Start agents in local processes, listening on localhost, and
+    connect to them with :py:func:`connect_agents()`. This is mainly
+    useful for testing. The agents are stopped by
+    :py:func:`disconnect_agents()`.
+    
+    Args:
+        num_agents (int): The number of agents to start.
+        slots (int): The number of task slots for each agent. By
+            default, this is set to 1.
+        authkey (str): The authentication key. By default, this is set
+            to None, which fetches the key from the DUMMYMP_AUTHKEY
+            environment variable, or generates a random one if it
+            isn't set.
+    
+    Returns:
+        int: The number of agents that were connected to.
+    """
+    if authkey == None:
+        authkey = os.environ.get(config.DUMMYMP_REMOTE_AUTHKEY_ENV) or os.urandom(32)
+    
+    addresses = []
+    
+    for agent_id in xrange(0, num_agents):
+        listener = Listener(("127.0.0.1", 0), authkey = authkey)
+        
+        # Agents run tasks in their own processes, so they can't be
+        # daemonic - they're stopped by _stop_local_agents() instead.
+        p = Process(target = _serve_agent, args = [ listener, slots, True ])
+        p.start()
+        
+        addresses.append(listener.address)
+        listener.close()
+        
+        config.dummymp_remote_local_agents.append(p)
+        
+        logging.debug("Started local remote agent %i (PID %i) on %s:%i." % (agent_id, p.pid, listener.address[0], listener.address[1]))
+    
+    return connect_agents(addresses, authkey)
+
+def _stop_local_agents():
+    """Close all agent connections, and stop any local agents."""
+    for conn in config.dummymp_remote_conns:
+        if conn != None:
+            try:
+                conn.close()
+            except:
+                pass
+    
+    config.dummymp_remote_conns = [ None for c in config.dummymp_remote_conns ]
+    
+    # Local agents exit once their client disconnects - give them a
+    # chance to clean up their tasks, first.
+    for p in config.dummymp_remote_local_agents:
+        p.join(5)
+        if p.is_alive():
+            p.terminate()
+            p.join()
+    
+    config.dummymp_remote_local_agents = []
+
+def disconnect_agents(kill = False):
+    """Disconnect from all remote agents.
+    
+    Wait for all tasks running on remote agents to finish, and then
+    disconnect from the agents. Any tasks that haven't been sent to
+    the agents yet remain queued, and will be run locally if
+    processing continues. Local agents started with
+    :py:func:`start_local_agents()` are stopped.
+    
+    Args:
+        kill (bool): Boolean indicating whether to disconnect
+            immediately instead, terminating the running tasks. Tasks
+            that are running are counted as completed (without a
+            return value). By default, this is set to False.
+    """
+    if kill:
+        # Get any messages sent so far...
+        process_queue()
+        
+        for agent_id in xrange(0, len(config.dummymp_remote_tasks)):
+            agent_tasks = config.dummymp_remote_tasks[agent_id]
+            config.dummymp_remote_tasks[agent_id] = {}
+            
+            for int_pid in sorted(agent_tasks.keys()):
+                _task_complete(int_pid)
+    else:
+        # Wait for the running tasks to finish, processing their
+        # messages as we go.
+        while config.dummymp_remote_active and (sum([ len(t) for t in config.dummymp_remote_tasks ]) > 0):
+            wait()
+            process_queue()
+        
+        # END message
+        for conn in config.dummymp_remote_conns:
+            if conn != None:
+                try:
+                    conn.send(None)
+                except (EOFError, IOError, OSError):
+                    pass
+    
+    _stop_local_agents()
+    
+    config.dummymp_remote_active = False
+    config.dummymp_remote_conns = []
+    config.dummymp_remote_addrs = []
+    config.dummymp_remote_slots = []
+    config.dummymp_remote_tasks = []
+
+# Make sure to clean up after ourselves! (This runs before
+# multiprocessing waits for the local agents to exit.)
+atexit.register(_stop_local_agents)
+
+# If run directly, run a remote agent.
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description = "Run a DummyMP remote agent. The authentication key is read from the %s environment variable." % config.DUMMYMP_REMOTE_AUTHKEY_ENV)
+    parser.add_argument("--listen", metavar = "HOST:PORT", default = "0.0.0.0:%i" % config.DUMMYMP_REMOTE_PORT, help = "Address to listen on. (Default: %(default)s)")
+    parser.add_argument("--slots", metavar = "NUM_SLOTS", type = int, default = None, help = "Number of tasks to run at once. (Default: number of CPUs available)")
+    parse = parser.parse_args()
+    
+    logging.basicConfig(level = logging.INFO, format = "[%(asctime)s] %(levelname)s: %(message)s")
+    
+    run_agent(parse.listen, slots = parse.slots)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - Shared Memory
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import os
+import shutil
+import atexit
+import tempfile
+import logging
+
+import config
+
+# NumPy is optional - shared arrays are only available if it is
+# installed!
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class SharedArray(object):
+    """Descriptor for a NumPy array stored in shared memory.
+    
+    A small, picklable descriptor for an array created with
+    :py:func:`share_array()`. Only this descriptor is passed in the
+    task arguments - when the task runs, the descriptor is replaced
+    with a read-only, memory-mapped view of the array via
+    :py:func:`attach_shared()`.
+    
+    Args:
+        path (str): The path of the memory-mapped file holding the
+            array data.
+        dtype (str): The NumPy data type of the array.
+        shape (tuple): The shape of the array.
+    """
+    def __init__(self, path, dtype, shape):
+        self.path = path
+        self.dtype = dtype
+        self.shape = shape
+    
+    def attach(self):
+        """Attach to the shared array.
+        
+        Map the shared array data into memory, read-only.
+        
+        Returns:
+            numpy.memmap: A read-only, memory-mapped view of the array.
+        """
+        return np.memmap(self.path, dtype = self.dtype, mode = "r", shape = self.shape)
+    
+    def __repr__(self):
+        return "SharedArray(%s, %s, %s)" % (self.path, self.dtype, str(self.shape))
+
+def shared_available():
+    """Check whether shared arrays are available.
+    
+    Shared arrays require NumPy. If NumPy is not installed,
+    :py:func:`share_array()` will simply return its input as-is.
+    
+    Args:
+        None
+    
+    Returns:
+        bool: A boolean indicating whether shared arrays are available.
+    """
+    return np != None
+
+def _get_shared_dir():
+    """Get (and create, if needed) the shared memory directory.
+    
+    The shared memory directory holds the memory-mapped files for all
+    shared arrays. It is created in /dev/shm (if available), so that
+    the arrays live in memory, and falls back to the system temporary
+    directory otherwise.
+    
+    Args:
+        None
+    
+    Returns:
+        str: The path of the shared memory directory.
+    """
+    if not config.dummymp_shm_dir:
+        if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+            shm_base = "/dev/shm"
+        else:
+            shm_base = tempfile.gettempdir()
+        
+        config.dummymp_shm_dir = tempfile.mkdtemp(prefix = "dummymp_", dir = shm_base)
+        config.dummymp_shm_owner = os.getpid()
+        logging.debug("Created shared memory directory %s." % config.dummymp_shm_dir)
+    
+    return config.dummymp_shm_dir
+
+def share_array(arr):
+    """Copy a NumPy array into shared memory.
+    
+    Copy the array into a memory-mapped file, and return a small
+    :py:class:`SharedArray` descriptor for it. The descriptor can be
+    passed as an argument to :py:func:`.run()` (directly, or within a
+    dictionary), and will be replaced with a read-only view of the
+    array when the task runs. This avoids copying (or pickling) large
+    arrays for every task.
+    
+    If NumPy is not available, or the array is empty, the array is
+    returned as-is.
+    
+    Shared arrays are kept until :py:func:`release_shared()` (or
+    :py:func:`.reset()`) is called, or the main process exits.
+    
+    Args:
+        arr (numpy.ndarray): The array to share.
+    
+    Returns:
+        SharedArray: A descriptor for the shared array, or the original
+        array if it could not be shared.
+    """
+    if (np == None) or (not isinstance(arr, np.ndarray)) or (arr.size == 0):
+        return arr
+    
+    shm_fd, shm_path = tempfile.mkstemp(suffix = ".npy", dir = _get_shared_dir())
+    os.close(shm_fd)
+    
+    shm_arr = np.memmap(shm_path, dtype = arr.dtype, mode = "w+", shape = arr.shape)
+    shm_arr[...] = arr
+    shm_arr.flush()
+    del shm_arr
+    
+    config.dummymp_shm_paths.append(shm_path)
+    
+    return SharedArray(shm_path, arr.dtype.str, arr.shape)
+
+def attach_shared(obj):
+    """Replace shared array descriptors with their arrays.
+    
+    Given an object, replace any :py:class:`SharedArray` descriptors
+    with read-only views of their arrays. Descriptors are searched for
+    in the object itself, and (recursively) in dictionary values. Other
+    objects are returned as-is.
+    
+    Args:
+        obj (object): The object to attach shared arrays for.
+    
+    Returns:
+        object: The object, with shared array descriptors replaced by
+        their arrays. Dictionaries containing descriptors are copied,
+        rather than modified in place.
+    """
+    if isinstance(obj, SharedArray):
+        return obj.attach()
+    
+    if type(obj) == dict:
+        attached_obj = None
+        
+        for key in obj:
+            attached_val = attach_shared(obj[key])
+            
+            if attached_val is not obj[key]:
+                if attached_obj == None:
+                    attached_obj = dict(obj)
+                attached_obj[key] = attached_val
+        
+        if attached_obj != None:
+            return attached_obj
+    
+    return obj
+
+def inline_shared(obj):
+    """Replace shared array descriptors with copies of their arrays.
+    
+    Given an object, replace any :py:class:`SharedArray` descriptors
+    with in-memory copies of their arrays, in the same way as
+    :py:func:`attach_shared()`. This is used when sending tasks to 
+    other hosts, where the shared memory isn't available.
+    
+    Args:
+        obj (object): The object to inline shared arrays for.
+    
+    Returns:
+        object: The object, with shared array descriptors replaced by
+        copies of their arrays. Dictionaries containing descriptors 
+        are copied, rather than modified in place.
+    """
+    if isinstance(obj, SharedArray):
+        return np.array(obj.attach())
+    
+    if type(obj) == dict:
+        inlined_obj = None
+        
+        for key in obj:
+            inlined_val = inline_shared(obj[key])
+            
+            if inlined_val is not obj[key]:
+                if inlined_obj == None:
+                    inlined_obj = dict(obj)
+                inlined_obj[key] = inlined_val
+        
+        if inlined_obj != None:
+            return inlined_obj
+    
+    return obj
+
+def release_shared():
+    """Release all shared arrays.
+    
+    Remove all of the memory-mapped files for shared arrays created
+    with :py:func:`share_array()`. This should only be done once all
+    tasks using the shared arrays have completed. (This is called
+    automatically by :py:func:`.reset()`, and when the main process
+    exits.)
+    
+    Args:
+        None
+    """
+    # Only the process that created the shared arrays should remove
+    # them!
+    if (not config.dummymp_shm_dir) or (config.dummymp_shm_owner != os.getpid()):
+        return
+    
+    logging.debug("Releasing %i shared arrays." % len(config.dummymp_shm_paths))
+    shutil.rmtree(config.dummymp_shm_dir, True)
+    
+    config.dummymp_shm_dir = None
+    config.dummymp_shm_owner = None
+    config.dummymp_shm_paths = []
+
+# Make sure to clean up after ourselves!
+atexit.register(release_shared)
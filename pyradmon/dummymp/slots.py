@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# DummyMP - Multiprocessing Library for Dummies!
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# DummyMP Library - Node Slots
+#   multiprocessing library for dummies!
+#   (library for easily running functions in parallel)
+# 
+
+import os
+import errno
+import fcntl
+import logging
+import tempfile
+
+import config
+from detect import getCPULimit
+
+def set_node_slots(num_slots = None, slot_dir = None):
+    """Set the number of node-wide slots to share with other instances.
+    
+    Node slots coordinate the number of running processes across every
+    DummyMP instance on the node (for instance, several PyRadmon runs
+    started by the same driver script). Each slot is a lock file in
+    the node slot directory - a process may only be started once a
+    slot has been taken, and the slot is freed as soon as the process
+    completes. Every instance using the same slot directory (and
+    number of slots) shares the same slots, so the total number of
+    processes on the node stays within the number of slots.
+    
+    With node slots set, CPU usage is no longer polled to determine
+    the CPU availability - the slots take its place, so no instance
+    has to pay for polling. Slot locks are released automatically if
+    an instance dies, so slots are never lost.
+    
+    Node slots can also be set for every instance at once with the
+    DUMMYMP_NODE_SLOTS (and DUMMYMP_NODE_SLOT_DIR) environment
+    variables.
+    
+    Args:
+        num_slots (int): The number of node slots. By default, this is
+            set to None, which uses the number of CPUs this process
+            may use (see :py:func:`.getCPULimit()`). If set to 0, node
+            slots are disabled.
+        slot_dir (str): The node slot directory. By default, this is
+            set to None, which uses a directory in the system temporary
+            directory, shared by all instances run by the same user.
+            To share slots between users, specify a directory that
+            all of the users can write to.
+    """
+    if num_slots == None:
+        num_slots = getCPULimit()
+    
+    config.node_slots = max(int(num_slots), 0)
+    
+    if slot_dir != None:
+        config.node_slot_dir = slot_dir
+    
+    if config.node_slots > 0:
+        logging.debug("Using %i node slots in %s." % (config.node_slots, get_node_slot_dir()))
+
+def get_node_slots():
+    """Get the number of node-wide slots.
+    
+    Args:
+        None
+    
+    Returns:
+        int: The number of node slots. If node slots aren't used, 0 is
+        returned.
+    """
+    return config.node_slots
+
+def get_node_slot_dir():
+    """Get (and create, if needed) the node slot directory.
+    
+    Args:
+        None
+    
+    Returns:
+        str: The path of the node slot directory.
+    """
+    if config.node_slot_dir == None:
+        config.node_slot_dir = os.path.join(tempfile.gettempdir(), "dummymp_slots_%i" % os.getuid())
+    
+    try:
+        os.makedirs(config.node_slot_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    
+    return config.node_slot_dir
+
+def _acquire_node_slot(int_pid):
+    """Try to take a node slot for a task.
+    
+    Args:
+        int_pid (int): The internal process ID of the task.
+    
+    Returns:
+        bool: A boolean indicating whether a node slot was taken. If
+        all of the node slots are taken, False is returned.
+    """
+    slot_dir = get_node_slot_dir()
+    
+    for slot_id in xrange(0, config.node_slots):
+        slot_fd = os.open(os.path.join(slot_dir, "slot.%i" % slot_id), os.O_RDWR | os.O_CREAT, 0666)
+        
+        try:
+            fcntl.flock(slot_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            os.close(slot_fd)
+            
+            if e.errno in [ errno.EWOULDBLOCK, errno.EAGAIN ]:
+                continue
+            raise
+        
+        config.node_slot_fds[int_pid] = slot_fd
+        logging.debug("Took node slot %i for task %i." % (slot_id, int_pid))
+        
+        return True
+    
+    return False
+
+def _release_node_slot(int_pid):
+    """Free the node slot held by a task, if any.
+    
+    Args:
+        int_pid (int): The internal process ID of the task.
+    """
+    slot_fd = config.node_slot_fds.pop(int_pid, None)
+    
+    if slot_fd != None:
+        # Processes started since the slot was taken share the lock
+        # (through the inherited file descriptor), so unlock it
+        # explicitly, instead of just closing it!
+        fcntl.flock(slot_fd, fcntl.LOCK_UN)
+        os.close(slot_fd)
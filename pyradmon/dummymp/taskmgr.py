@@ -22,17 +22,29 @@
 import logging
 import config
 import time
-from multiprocessing import Process, Queue
+import math
+import os
+import select
+import errno
+import datetime
+from multiprocessing import Process, Queue, Pipe
+from Queue import Empty
 
 from detect import *
-from process import _runner
+from process import _runner, _batch_runner, _pool_runner
+from shm import inline_shared
+from journal import journal_record
+from slots import _acquire_node_slot, _release_node_slot
 
 def process_queue():
     """Process inter-process messages.
     
-    Process the inter-process :py:class:`multiprocessing.Queue` 
-    objects, which receive messages from the spawned process for 
-    logging events and function returns.
+    Process the inter-process message pipes, which receive messages 
+    from the spawned processes (and worker pool workers) for logging 
+    events and function returns. Every message waiting in the pipes is
+    handled at once, so that processes that send a lot of messages 
+    don't back up. Messages from remote agents, if any are connected, 
+    are handled as well.
     
     Args:
         None
@@ -40,34 +52,567 @@ def process_queue():
     Note:
         Warnings are emitted to log if an invalid message is received.
     """
-    # Get main process logger
-    logger = logging.getLogger()
+    for msg_conn in config.dummymp_msg_conns:
+        _drain_conn(msg_conn, logging.getLogger())
     
-    # Loop through queues...
-    for dummymp_queue in config.dummymp_queues:
-        # Make sure there's something to fetch from the queue!
-        if not dummymp_queue.empty():
-            # Make a request to get the queue, with a timeout to ensure
-            # no blocking (or long waiting)
-            qout = dummymp_queue.get(timeout = 0.001)
+    for msg_conn in config.dummymp_pool_msg_conns:
+        if msg_conn != None:
+            _drain_conn(msg_conn, logging.getLogger())
+    
+    if config.dummymp_remote_active:
+        _drain_agents(logging.getLogger())
+
+def _get_msg_pipe():
+    """Get a new inter-process message pipe.
+    
+    Get a new one-way pipe for a spawned process (or worker pool 
+    worker) to send messages to the main process. Every process gets 
+    its own pipe, instead of sharing a single 
+    :py:class:`multiprocessing.Queue` - a process killed while sending
+    a message (say, by the OOM killer) could leave a shared Queue's 
+    write lock held, or a partial message in its pipe, hanging or 
+    breaking every other process. With a pipe per process, only the 
+    killed process's pipe is affected, and it is closed once the 
+    process is reaped.
+    
+    Args:
+        None
+    
+    Returns:
+        tuple: A tuple containing the read end and the write end of the
+        pipe, as :py:class:`multiprocessing.Connection` objects. The 
+        main process must close the write end once the process is 
+        started, so that the read end hits EOF when the process exits.
+    """
+    return Pipe(False)
+
+def _drain_conn(msg_conn, logger):
+    """Process all pending inter-process messages from a message pipe.
+    
+    Fetch and handle every message currently waiting in the given
+    message pipe, without blocking. If the process at the other end 
+    was killed while sending a message, the partial message is 
+    dropped.
+    
+    Args:
+        msg_conn (multiprocessing.Connection): The read end of the 
+            message pipe to process messages from.
+        logger (logging.Logger): The main process logger to emit 
+            logging records to.
+    """
+    try:
+        while msg_conn.poll():
+            _handle_message(msg_conn.recv(), logger)
+    except EOFError:
+        # The process has exited, and all of its messages were read.
+        pass
+    except IOError:
+        logger.warning("WARNING: Dropped a partial message from a process that died while sending it!")
+
+def _handle_message(qout, logger):
+    """Handle a single inter-process message.
+    
+    Args:
+        qout (list): The message, in the format:
+            [ [ DUMMYMP_MSG_TYPE_ID, SYSTEM_PID, INTERNAL_ID ], DATA ]
+        logger (logging.Logger): The main process logger to emit 
+            logging records to.
+    """
+    # Check if it's a list or not
+    if type(qout) != list:
+        logger.warning("WARNING: Received invalid message from process! This may be a bug! Message: %s" % str(qout))
+        return
+    
+    # Check the message type IDs!
+    # Format: [ [ DUMMYMP_MSG_TYPE_ID, SYSTEM_PID, INTERNAL_ID ], DATA... ]
+    if qout[0][0] == config.DUMMYMP_LOG_ID:
+        # Append PID info text
+        qout[1].msg = ("[PID %i] " % qout[0][1]) + qout[1].msg
+        # Emit the modified log record
+        logger.handle(qout[1])
+    elif qout[0][0] == config.DUMMYMP_RET_ID:
+        # Store return into return dictionary
+        config.dummymp_rets[qout[0][2]] = qout[1]
+    elif qout[0][0] == config.DUMMYMP_STAT_ID:
+        # Store the resource usage stats (merging them into the stats
+        # already recorded, in case the task already completed)
+        config.dummymp_stats.setdefault(qout[0][2], {}).update(qout[1])
+    elif qout[0][0] == config.DUMMYMP_ERR_ID:
+        # Store the error, if someone is waiting for it
+        if qout[0][2] in config.dummymp_task_callbacks:
+            config.dummymp_errors[qout[0][2]] = qout[1]
+    elif qout[0][0] == config.DUMMYMP_END_ID:
+        # Worker pool worker, batch process (or remote agent) finished
+        # a task - find the worker (or batch, or agent) running it. (If
+        # none is found, the task was already counted as completed.)
+        if qout[0][2] in config.dummymp_pool_tasks:
+            config.dummymp_pool_tasks[config.dummymp_pool_tasks.index(qout[0][2])] = None
+            logging.debug("Task complete!")
+            _task_complete(qout[0][2])
+        else:
+            for batch in config.dummymp_batches.values():
+                if qout[0][2] in batch:
+                    batch.remove(qout[0][2])
+                    logging.debug("Batched task complete!")
+                    _task_complete(qout[0][2])
+                    
+                    # The batch moves on to its next task, if any
+                    if len(batch) > 0:
+                        _batch_task_started(batch[0])
+                    break
             
-            # Check if it's a list or not
-            if type(qout) != list:
-                logger.warning("WARNING: Received invalid message from process! This may be a bug! Message: %s" % str(qout))
+            for agent_tasks in config.dummymp_remote_tasks:
+                if qout[0][2] in agent_tasks:
+                    del agent_tasks[qout[0][2]]
+                    logging.debug("Remote task complete!")
+                    _task_complete(qout[0][2])
+                    break
+    else:
+        logger.warning("WARNING: Received invalid message from process! (Invalid message type ID!) This may be a bug! Message: %s" % str(qout))
+
+def _task_started(int_pid):
+    """Record that a task has started.
+    
+    Args:
+        int_pid (int): The internal process ID of the task.
+    """
+    if int_pid in config.dummymp_task_times:
+        config.dummymp_task_times[int_pid][1] = time.time()
+
+def _task_complete(int_pid):
+    """Record that a task has completed.
+    
+    Update the completed and running counts, record the task's 
+    resource usage stats, and make the end callback, if one is set. 
+    If the task has its own completion callback, it is called too. If 
+    the task has a journal record and returned successfully, the 
+    record is written to the task journal first.
+    
+    Args:
+        int_pid (int): The internal process ID of the task.
+    """
+    # Free the task's node slot, if any
+    _release_node_slot(int_pid)
+    
+    # Fill in the task's stats - the times are tracked here, while the
+    # CPU and memory usage is sent by the process itself (if it got 
+    # the chance to).
+    (queued_at, started_at) = config.dummymp_task_times.pop(int_pid, [ None, None ])
+    end_time = time.time()
+    
+    task_stats = { "queued" : None, "wall" : None, "user" : None, "sys" : None, "max_rss" : None }
+    
+    if started_at != None:
+        task_stats["queued"] = started_at - queued_at
+        task_stats["wall"] = end_time - started_at
+    
+    task_stats.update(config.dummymp_stats.get(int_pid, {}))
+    config.dummymp_stats[int_pid] = task_stats
+    
+    # Keep track of the average task run time, for sizing batches
+    if task_stats["wall"] != None:
+        if config.batch_task_time == None:
+            config.batch_task_time = task_stats["wall"]
+        else:
+            config.batch_task_time += config.DUMMYMP_BATCH_SMOOTHING * (task_stats["wall"] - config.batch_task_time)
+    
+    # Record the task in the journal, if it returned successfully
+    journal_rec = config.dummymp_journal_tasks.pop(int_pid, None)
+    if (journal_rec != None) and (int_pid in config.dummymp_rets):
+        journal_record(journal_rec)
+    
+    # Add to the completed count and remove from running count...
+    config.total_completed += 1
+    config.total_running -= 1
+    
+    # Make any callbacks, if necessary.
+    if config.PROCESS_END_CALLBACK:
+        if config.PROCESS_END_CALLBACK_STATS:
+            config.PROCESS_END_CALLBACK(config.total_completed, config.total_running, config.total_procs, task_stats)
+        else:
+            config.PROCESS_END_CALLBACK(config.total_completed, config.total_running, config.total_procs)
+    
+    task_callback = config.dummymp_task_callbacks.pop(int_pid, None)
+    if task_callback:
+        task_callback(int_pid)
+
+def _proc_complete(int_pid):
+    """Record that a started process has exited.
+    
+    Record that the task run by the process has completed - or, if the
+    process ran a batch of tasks, that the batch tasks that haven't 
+    completed yet (if the process died, or was killed) have completed.
+    
+    Args:
+        int_pid (int): The internal process ID of the process's task 
+            (or the first task of its batch).
+    """
+    batch = config.dummymp_batches.pop(int_pid, None)
+    
+    if batch == None:
+        _task_complete(int_pid)
+        return
+    
+    if len(batch) > 0:
+        logging.warning("WARNING: Batch process exited with %i task(s) left to complete!" % len(batch))
+    
+    for batch_pos in xrange(0, len(batch)):
+        # Only the current task in the batch is counted as running!
+        if batch_pos > 0:
+            _batch_task_started(batch[batch_pos])
+        _task_complete(batch[batch_pos])
+
+def _batch_task_started(int_pid):
+    """Record that a batch process has moved on to its next task.
+    
+    Args:
+        int_pid (int): The internal process ID of the task.
+    """
+    config.total_running += 1
+    _task_started(int_pid)
+    
+    if config.PROCESS_START_CALLBACK:
+        config.PROCESS_START_CALLBACK(config.total_completed, config.total_running, config.total_procs)
+
+def _get_batch_size():
+    """Get the number of tasks to start in the next process.
+    
+    Pick the number of tasks that should take about the batch target 
+    time to run, based on the average task run time so far, up to the
+    maximum batch size. To keep the load balanced, the batch is also
+    limited to an even share of the queued tasks across the available
+    CPUs.
+    
+    Args:
+        None
+    
+    Returns:
+        int: The number of tasks to start in the next process. If 
+        tasks aren't batched (or no task has completed yet), 1 is 
+        returned.
+    """
+    if (config.max_batch_size <= 1) or (config.batch_task_time == None):
+        return 1
+    
+    batch_size = int(config.batch_target_time / max(config.batch_task_time, 0.001))
+    
+    if config.node_slots > 0:
+        ncpus = config.node_slots
+    else:
+        ncpus = max(config.CPU_AVAIL, 1)
+    if config.max_processes > 0:
+        ncpus = min(ncpus, config.max_processes)
+    
+    batch_share = int(math.ceil(len(config.dummymp_start_procs) / float(ncpus)))
+    
+    return max(min(batch_size, batch_share, config.max_batch_size), 1)
+
+def _spawn_pool_worker(worker_id):
+    """Spawn a worker pool worker.
+    
+    Spawn a long-lived worker process for the worker pool, along with
+    its task queue, message pipe, and sentinel pipe. If a worker 
+    already exists at the given index, it is replaced.
+    
+    Args:
+        worker_id (int): The index of the worker in the pool.
+    """
+    task_q = Queue()
+    (msg_r, msg_w) = _get_msg_pipe()
+    p = Process(target = _pool_runner, args = [ worker_id, task_q, msg_w ])
+    
+    # Don't hold up exiting if the pool isn't stopped!
+    p.daemon = True
+    
+    # Setup sentinel pipe - the worker inherits the write end, which 
+    # is closed when it exits.
+    (sentinel_r, sentinel_w) = os.pipe()
+    
+    if worker_id < len(config.dummymp_pool_workers):
+        config.dummymp_pool_workers[worker_id] = p
+        config.dummymp_pool_task_queues[worker_id] = task_q
+        config.dummymp_pool_msg_conns[worker_id] = msg_r
+        config.dummymp_pool_sentinels[worker_id] = sentinel_r
+        config.dummymp_pool_tasks[worker_id] = None
+    else:
+        config.dummymp_pool_workers.append(p)
+        config.dummymp_pool_task_queues.append(task_q)
+        config.dummymp_pool_msg_conns.append(msg_r)
+        config.dummymp_pool_sentinels.append(sentinel_r)
+        config.dummymp_pool_tasks.append(None)
+    
+    p.start()
+    os.close(sentinel_w)
+    msg_w.close()
+    
+    logging.debug("Started worker pool worker %i (PID %i)." % (worker_id, p.pid))
+
+def _check_pool_workers():
+    """Check for worker pool workers that have exited.
+    
+    Check the worker pool for workers that have exited, and clean them
+    up. If a worker exited unexpectedly while running a task, the task
+    is counted as completed (without a return value), and the worker 
+    is replaced - unless the pool is being stopped.
+    
+    Args:
+        None
+    
+    Returns:
+        int: The number of workers that have exited.
+    """
+    if len(config.dummymp_pool_sentinels) == 0:
+        return 0
+    
+    try:
+        (done_sentinels, _, _) = select.select([ s for s in config.dummymp_pool_sentinels if s != None ], [], [], 0)
+    except (select.error, OSError) as e:
+        if e.args[0] != errno.EINTR:
+            raise
+        return 0
+    
+    for done_sentinel in done_sentinels:
+        worker_id = config.dummymp_pool_sentinels.index(done_sentinel)
+        
+        # Reap the worker, and fetch any remaining messages
+        config.dummymp_pool_workers[worker_id].join()
+        _drain_conn(config.dummymp_pool_msg_conns[worker_id], logging.getLogger())
+        
+        config.dummymp_pool_msg_conns[worker_id].close()
+        config.dummymp_pool_msg_conns[worker_id] = None
+        config.dummymp_pool_task_queues[worker_id].close()
+        os.close(done_sentinel)
+        config.dummymp_pool_sentinels[worker_id] = None
+        
+        if config.dummymp_pool_tasks[worker_id] != None:
+            logging.warning("WARNING: Worker pool worker %i exited while running task %i!" % (worker_id, config.dummymp_pool_tasks[worker_id]))
+            int_pid = config.dummymp_pool_tasks[worker_id]
+            config.dummymp_pool_tasks[worker_id] = None
+            _task_complete(int_pid)
+        
+        if not config.dummymp_pool_stopping:
+            logging.warning("WARNING: Worker pool worker %i exited unexpectedly, replacing it." % worker_id)
+            _spawn_pool_worker(worker_id)
+    
+    return len(done_sentinels)
+
+def _drain_agents(logger):
+    """Process all pending messages from remote agents.
+    
+    Fetch and handle every message currently waiting on the remote 
+    agent connections, without blocking. Agents send the same messages
+    as local processes (see :py:func:`._runner()`), along with an END
+    message for every task. If an agent's connection is lost, its 
+    tasks are queued to run again.
+    
+    Args:
+        logger (logging.Logger): The main process logger to emit 
+            logging records to.
+    """
+    for agent_id in xrange(0, len(config.dummymp_remote_conns)):
+        conn = config.dummymp_remote_conns[agent_id]
+        
+        if conn == None:
+            continue
+        
+        try:
+            while conn.poll():
+                _handle_message(conn.recv(), logger)
+        except (EOFError, IOError, OSError):
+            _lose_agent(agent_id)
+
+def _lose_agent(agent_id):
+    """Handle a lost remote agent connection.
+    
+    Close the connection to the agent, and put any tasks it was 
+    running back at the front of the execution queue, so that they 
+    are run again elsewhere. If no agents are left, tasks are run 
+    locally from now on.
+    
+    Args:
+        agent_id (int): The index of the agent.
+    """
+    try:
+        config.dummymp_remote_conns[agent_id].close()
+    except:
+        pass
+    
+    config.dummymp_remote_conns[agent_id] = None
+    
+    agent_tasks = config.dummymp_remote_tasks[agent_id]
+    config.dummymp_remote_tasks[agent_id] = {}
+    
+    if len(agent_tasks) > 0:
+        logging.warning("WARNING: Lost connection to remote agent %s while running %i tasks, queuing them to run again." % (config.dummymp_remote_addrs[agent_id], len(agent_tasks)))
+    else:
+        logging.warning("WARNING: Lost connection to remote agent %s." % config.dummymp_remote_addrs[agent_id])
+    
+    for int_pid in sorted(agent_tasks.keys(), reverse = True):
+        config.dummymp_start_procs.insert(0, agent_tasks[int_pid])
+        config.total_running -= 1
+    
+    if len([ c for c in config.dummymp_remote_conns if c != None ]) == 0:
+        logging.warning("WARNING: No remote agents left, running tasks locally.")
+        config.dummymp_remote_active = False
+
+def _dispatch_remote():
+    """Hand queued tasks to remote agents with free task slots.
+    
+    Tasks are handed to the least loaded agent with a free task slot,
+    until either every slot is taken, or the execution queue is empty
+    (or the max_processes limit is reached). Shared arrays can't be 
+    shared across hosts, so any passed in the arguments are copied 
+    into the task instead.
+    """
+    while (len(config.dummymp_start_procs) > 0) and config.dummymp_remote_active and \
+        ((config.max_processes == 0) or (config.total_running < config.max_processes)):
+        
+        # Find the least loaded agent with a free slot
+        agent_id = None
+        agent_load = None
+        
+        for i in xrange(0, len(config.dummymp_remote_conns)):
+            if (config.dummymp_remote_conns[i] == None) or \
+                (len(config.dummymp_remote_tasks[i]) >= config.dummymp_remote_slots[i]):
                 continue
             
-            # Check the message type IDs!
-            # Format: [ [ DUMMYMP_MSG_TYPE_ID, SYSTEM_PID, INTERNAL_ID ], DATA... ]
-            if qout[0][0] == config.DUMMYMP_LOG_ID:
-                # Append PID info text
-                qout[1].msg = ("[PID %i] " % qout[0][1]) + qout[1].msg
-                # Emit the modified log record
-                logger.handle(qout[1])
-            elif qout[0][0] == config.DUMMYMP_RET_ID:
-                # Store return into return dictionary
-                config.dummymp_rets[qout[0][2]] = qout[1]
-            else:
-                logger.warning("WARNING: Received invalid message from process! (Invalid message type ID!) This may be a bug! Message: %s" % str(qout))
+            load = float(len(config.dummymp_remote_tasks[i])) / config.dummymp_remote_slots[i]
+            
+            if (agent_load == None) or (load < agent_load):
+                agent_id = i
+                agent_load = load
+        
+        if agent_id == None:
+            break
+        
+        dummymp_proc_entry = config.dummymp_start_procs[0]
+        (int_pid, func, final_args, final_kwargs) = dummymp_proc_entry
+        
+        remote_args = [ inline_shared(arg) for arg in final_args ]
+        remote_kwargs = dict([ (k, inline_shared(final_kwargs[k])) for k in final_kwargs ])
+        
+        try:
+            config.dummymp_remote_conns[agent_id].send([ int_pid, func, remote_args, remote_kwargs ])
+        except (EOFError, IOError, OSError):
+            _lose_agent(agent_id)
+            continue
+        
+        logging.debug("Sent task %i to remote agent %s." % (int_pid, config.dummymp_remote_addrs[agent_id]))
+        
+        config.dummymp_remote_tasks[agent_id][int_pid] = dummymp_proc_entry
+        config.dummymp_start_procs.pop(0)
+        config.dummymp_costs.pop(int_pid, None)
+        config.total_running += 1
+        _task_started(int_pid)
+        
+        if config.PROCESS_START_CALLBACK:
+            config.PROCESS_START_CALLBACK(config.total_completed, config.total_running, config.total_procs)
+
+def get_wait_fds():
+    """Get the file descriptors to wait on for process events.
+    
+    Get the file descriptors that become readable when a running
+    process sends a message (its message pipe), or when it exits (its
+    sentinel pipe, which is closed when the process exits). Remote 
+    agent connections are included as well.
+    
+    Args:
+        None
+    
+    Returns:
+        list: A list of file descriptors (ints) to wait on.
+    """
+    wait_fds = list(config.dummymp_sentinels)
+    wait_fds += [ c.fileno() for c in config.dummymp_msg_conns ]
+    
+    # Worker pool workers, if any
+    wait_fds += [ s for s in config.dummymp_pool_sentinels if s != None ]
+    wait_fds += [ c.fileno() for c in config.dummymp_pool_msg_conns if c != None ]
+    
+    # Remote agents, if any
+    wait_fds += [ c.fileno() for c in config.dummymp_remote_conns if c != None ]
+    
+    return wait_fds
+
+def wait(timeout = None):
+    """Wait for a process event.
+    
+    Block until a running process sends a message or exits, or until
+    the timeout expires. This allows waiting for processes without
+    polling (and burning CPU in the main process).
+    
+    Args:
+        timeout (float): The maximum time to wait, in seconds. By 
+            default, this is set to None, which waits until an event 
+            occurs.
+    
+    Returns:
+        list: A list of file descriptors (from :py:func:`get_wait_fds()`)
+        that are ready. An empty list is returned if the timeout 
+        expired, or if there was nothing to wait for.
+    """
+    wait_fds = get_wait_fds()
+    
+    # Nothing to wait for? Don't block forever!
+    if len(wait_fds) == 0:
+        if timeout:
+            time.sleep(timeout)
+        return []
+    
+    try:
+        (ready_fds, _, _) = select.select(wait_fds, [], [], timeout)
+    except (select.error, OSError) as e:
+        # Interrupted by a signal - just return, and let the caller
+        # check again.
+        if e.args[0] == errno.EINTR:
+            return []
+        raise
+    
+    return ready_fds
+
+def _get_wait_timeout():
+    """Get the maximum time to wait for a process event.
+    
+    If there are processes waiting to be started, they may be waiting
+    for CPUs (or memory, or node slots) to become available, so we 
+    need to wake up when any of them need to be rechecked. Otherwise,
+    there's nothing to do until a process sends a message or exits.
+    
+    Args:
+        None
+    
+    Returns:
+        float: The maximum time to wait, in seconds, or None to wait
+        until a process event occurs.
+    """
+    if len(config.dummymp_start_procs) == 0:
+        return None
+    
+    # If there's a memory budget, recheck memory usage periodically
+    if config.memory_budget > 0:
+        wait_timeout = config.DUMMYMP_MEMORY_INTERVAL
+    else:
+        wait_timeout = None
+    
+    # If node slots are used, try to take a slot periodically - other
+    # instances don't tell us when they free one! (The CPU 
+    # availability isn't used, so it's never rechecked.)
+    if config.node_slots > 0:
+        if wait_timeout == None:
+            return config.DUMMYMP_NODE_SLOT_INTERVAL
+        return min(wait_timeout, config.DUMMYMP_NODE_SLOT_INTERVAL)
+    
+    # (In NUCLEAR mode, the CPU availability is never rechecked.)
+    if (config.CPU_CHECK_TIMEDELTA_THRESHOLD == None) or (config.DUMMYMP_MODE == config.DUMMYMP_NUCLEAR):
+        return wait_timeout
+    
+    wait_timedelta = config.CPU_CHECK_TIMEDELTA_THRESHOLD - (datetime.datetime.now() - config.LAST_CPU_CHECK)
+    cpu_wait_timeout = max(wait_timedelta.days * 86400 + wait_timedelta.seconds + wait_timedelta.microseconds / 1000000.0, 0.01)
+    
+    if wait_timeout == None:
+        return cpu_wait_timeout
+    
+    return min(wait_timeout, cpu_wait_timeout)
 
 def process_process():
     """Process the execution queue and inter-process messages.
@@ -90,49 +635,76 @@ def process_process():
         until processes have completed. (This is somewhat similar to 
         multiprocessing's join().)
     """
-    nproc = 0
-    # Loop through processes via index!
-    while nproc < len(config.dummymp_procs):
-        dummymp_proc = config.dummymp_procs[nproc]
-        
-        # Check if process is complete! (In this case, ensure that
-        # the process is not in a start queue and it isn't alive
-        # anymore!)
-        if (not dummymp_proc in config.dummymp_start_procs) and (not dummymp_proc.is_alive()):
-            # Run process_queue() to fetch the remaining queue items
-            # from the process.
-            process_queue()
-            
-            # Remove the queue and process
-            pi = config.dummymp_procs.index(dummymp_proc)
-            
-            # Make sure to close the queue!
-            config.dummymp_queues[pi].close()
-            config.dummymp_queues.pop(pi)
-            config.dummymp_procs.pop(pi)
-            
-            logging.debug("Process complete!")
-            
-            # Add to the completed count and remove from running count...
-            config.total_completed += 1
-            config.total_running -= 1
-            
-            # Make any callbacks, if necessary.
-            if config.PROCESS_END_CALLBACK:
-                config.PROCESS_END_CALLBACK(config.total_completed, config.total_running, config.total_procs)
-            
-            # Deincrement index counter, since we just removed a process
-            # from the list.
-            nproc -= 1
+    # Find the processes that have exited - their sentinel pipes will
+    # be readable (at EOF). This avoids checking every process.
+    if len(config.dummymp_sentinels) > 0:
+        try:
+            (done_sentinels, _, _) = select.select(config.dummymp_sentinels, [], [], 0)
+        except (select.error, OSError) as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            done_sentinels = []
+    else:
+        done_sentinels = []
+    
+    for done_sentinel in done_sentinels:
+        pi = config.dummymp_sentinels.index(done_sentinel)
+        dummymp_proc = config.dummymp_procs[pi]
+        
+        # Make sure the process has actually exited (and reap it)...
+        dummymp_proc.join()
         
-        # Increment
-        nproc += 1
+        # Fetch the remaining messages from the process.
+        _drain_conn(config.dummymp_msg_conns[pi], logging.getLogger())
+        
+        # Make sure to close the sentinel and message pipe!
+        os.close(config.dummymp_sentinels[pi])
+        config.dummymp_msg_conns[pi].close()
+        
+        # Remove the process, sentinel, message pipe, and internal 
+        # process ID
+        config.dummymp_procs.pop(pi)
+        config.dummymp_sentinels.pop(pi)
+        config.dummymp_msg_conns.pop(pi)
+        int_pid = config.dummymp_proc_ids.pop(pi)
+        
+        logging.debug("Process complete!")
+        
+        _proc_complete(int_pid)
+    
+    # If the worker pool is running, fetch messages from the workers to
+    # find completed tasks, and check the workers themselves.
+    if config.dummymp_pool_active:
+        process_queue()
+        _check_pool_workers()
+    
+    # If batches are running, fetch messages from them to find the
+    # completed batch tasks.
+    if len(config.dummymp_batches) > 0:
+        process_queue()
+    
+    # If remote agents are connected, fetch their messages to find 
+    # completed tasks, and hand them more tasks. Agents have their own
+    # CPUs (and memory), so local availability doesn't apply.
+    if config.dummymp_remote_active:
+        process_queue()
+        _dispatch_remote()
+    
+    # If there's a memory budget, keep track of memory usage
+    if (config.memory_budget > 0) and (config.total_running > 0) and (not config.dummymp_remote_active):
+        getProcessMemory()
     
-    # Fetch available CPUs
-    avail_cpus = getCPUAvail() - config.total_running
+    # Fetch available CPUs (unless tasks are being run by remote 
+    # agents). If node slots are used, they take the place of the CPU
+    # availability - each task just needs to take a slot.
+    if not config.dummymp_remote_active:
+        if config.node_slots > 0:
+            avail_cpus = len(config.dummymp_start_procs)
+        else:
+            avail_cpus = getCPUAvail() - config.total_running
     
     # Check if we need to update CPU avail
-    if not needUpdateCPUAvail():
+    if (not config.dummymp_remote_active) and ((config.node_slots > 0) or (not needUpdateCPUAvail())):
         nproc = 0
         # Loop through process execution queue
         while nproc < len(config.dummymp_start_procs):
@@ -140,7 +712,8 @@ def process_process():
             
             # Check to make sure we can meet max_processes limit
             # (0 means no limit set)
-            if (config.max_processes == 0) or (config.total_running < config.max_processes):
+            if ((config.max_processes == 0) or (config.total_running < config.max_processes)) and \
+                ((not config.dummymp_pool_active) or (None in config.dummymp_pool_tasks)):
                 
                 # If there's no available CPUs, check to make sure that a
                 # process isn't already running, and that the mode set is
@@ -152,18 +725,48 @@ def process_process():
                 
                 # Check if we have any available (or "available") CPUs!
                 if avail_cpus > 0:
+                    # Check that we have enough memory, too! If not, 
+                    # hold off on starting anything else.
+                    if not checkMemoryAvail():
+                        break
+                    
+                    # Take a node slot, too! If none are free, other 
+                    # instances on this node are using all of them.
+                    if (config.node_slots > 0) and (not _acquire_node_slot(dummymp_proc_entry[0])):
+                        logging.debug("No node slots available, waiting for a slot to be freed.")
+                        break
+                    
                     logging.debug("%i CPUs available, spawning process!" % avail_cpus)
                     
                     # Deincrement counter
                     avail_cpus -= 1
                     
-                    # Setup Queue
-                    # We create the Queue and Process here so that we can
-                    # prevent the error from opening too many Queue objects
-                    # in multiprocessing.Pipe:
+                    # If the worker pool is running, just hand the task
+                    # over to an idle worker! (The task is tracked here,
+                    # so that it isn't lost if the worker dies.)
+                    if config.dummymp_pool_active:
+                        worker_id = config.dummymp_pool_tasks.index(None)
+                        config.dummymp_pool_task_queues[worker_id].put(dummymp_proc_entry)
+                        config.dummymp_pool_tasks[worker_id] = dummymp_proc_entry[0]
+                        config.dummymp_start_procs.remove(dummymp_proc_entry)
+                        config.dummymp_costs.pop(dummymp_proc_entry[0], None)
+                        config.total_running += 1
+                        _task_started(dummymp_proc_entry[0])
+                        
+                        if config.PROCESS_START_CALLBACK:
+                            config.PROCESS_START_CALLBACK(config.total_completed, config.total_running, config.total_procs)
+                        
+                        # Don't increment the index counter, since we
+                        # just removed a task from the start queue list.
+                        continue
+                    
+                    # Get a message pipe for the process. Pipes are
+                    # closed as soon as their process is reaped, so 
+                    # only running processes hold one open - keeping
+                    # the descriptors low enough for select():
                     #   IOError: handle out of range in select()
                     # Bug: http://bugs.python.org/issue10527
-                    q = Queue()
+                    (msg_r, msg_w) = _get_msg_pipe()
                     
                     # Extract internal PID, function, final_args, and
                     # final_kwargs
@@ -172,29 +775,63 @@ def process_process():
                     final_args = dummymp_proc_entry[2]
                     final_kwargs = dummymp_proc_entry[3]
                     
-                    # Now add some arguments to the front:
-                    # Function to actually run
-                    final_args.insert(0, func)
-                    # Queue
-                    final_args.insert(0, q)
-                    # Process ID
-                    final_args.insert(0, int_pid)
+                    # If tasks are batched, take the following tasks 
+                    # in the queue, too!
+                    batch_entries = config.dummymp_start_procs[nproc:nproc + _get_batch_size()]
                     
-                    # Create Process object
-                    p = Process(target = _runner, args = final_args, kwargs = final_kwargs)
+                    if len(batch_entries) > 1:
+                        logging.debug("Batching %i tasks in a single process." % len(batch_entries))
+                        
+                        # Create Process object for the whole batch
+                        p = Process(target = _batch_runner, args = [ msg_w, batch_entries ])
+                        
+                        config.dummymp_batches[int_pid] = [ batch_entry[0] for batch_entry in batch_entries ]
+                        
+                        # The batch holds its node slot (if any) until
+                        # its last task completes.
+                        if int_pid in config.node_slot_fds:
+                            config.node_slot_fds[batch_entries[-1][0]] = config.node_slot_fds.pop(int_pid)
+                    else:
+                        # Now add some arguments to the front:
+                        # Function to actually run
+                        final_args.insert(0, func)
+                        # Message pipe
+                        final_args.insert(0, msg_w)
+                        # Process ID
+                        final_args.insert(0, int_pid)
+                        
+                        # Create Process object
+                        p = Process(target = _runner, args = final_args, kwargs = final_kwargs)
+                    
+                    # Setup sentinel pipe - the process inherits the
+                    # write end, which is closed when it exits. This
+                    # lets us wait for processes to exit without
+                    # polling them.
+                    (sentinel_r, sentinel_w) = os.pipe()
                     
                     # Save it
-                    config.dummymp_queues.append(q)
                     config.dummymp_procs.append(p)
+                    config.dummymp_sentinels.append(sentinel_r)
+                    config.dummymp_msg_conns.append(msg_r)
+                    config.dummymp_proc_ids.append(int_pid)
                     
                     # Start the process...
                     p.start()
                     
-                    # ...and remove it from the starting queue.
-                    config.dummymp_start_procs.remove(dummymp_proc_entry)
+                    # ...and close our copies of the sentinel and 
+                    # message pipe write ends.
+                    os.close(sentinel_w)
+                    msg_w.close()
+                    
+                    # ...and remove it (or its batch) from the starting
+                    # queue.
+                    for batch_entry in batch_entries:
+                        config.dummymp_start_procs.remove(batch_entry)
+                        config.dummymp_costs.pop(batch_entry[0], None)
                     
                     # Increment running counter...
                     config.total_running += 1
+                    _task_started(int_pid)
                     
                     # Make any callbacks, if necessary.
                     if config.PROCESS_START_CALLBACK:
@@ -209,8 +846,11 @@ def process_process():
             # Increment
             nproc += 1
     
-    # Check to see if we are done!
-    if len(config.dummymp_procs) == 0:
+    # Check to see if we are done! Tasks may still be queued with
+    # nothing running - for instance, if other instances hold every
+    # node slot - so they need to be waited on, too.
+    if (len(config.dummymp_procs) == 0) and (len(config.dummymp_start_procs) == 0) and \
+        (((not config.dummymp_pool_active) and (not config.dummymp_remote_active)) or (config.total_running == 0)):
         logging.debug("All processes complete, returning True.")
         return True
     return False
@@ -227,7 +867,9 @@ def process_until_done():
         None
     """
     # Run process_queue() and process_process() until process_process()
-    # returns False (when it completes the process queue)
+    # returns False (when it completes the process queue). In between,
+    # block until a process sends a message or exits (or until we need
+    # to recheck CPU availability for queued processes).
     while not process_process():
+        wait(_get_wait_timeout())
         process_queue()
-        time.sleep(0.001)
@@ -44,6 +44,13 @@ END_HOUR          = "18"
 INSTRUMENT_SAT    = "ssmi_f08"
 DATA_TYPE         = "anl|ges"
 
+# Keyword arguments that affect the results of enumerate() - used to
+# look up cached results in enumerate_cached()
+ENUMERATE_OPTS = [ "data_path_format", "experiment_id",
+                   "start_year", "start_month", "start_day", "start_hour",
+                   "end_year", "end_month", "end_day", "end_hour",
+                   "instrument_sat", "data_type", "time_delta" ]
+
 def make_subst_variable(year, month, day, hour, experiment_id, instrument_sat, data_type):
     """Create a dict with var substitution values for data_path_format.
     
@@ -170,6 +177,39 @@ def path_substitute(path_format, variables):
     # Return the substituted path!
     return final_path
 
+def check_file_cached(file_path, dir_cache):
+    """Check if a data file exists, using cached directory listings.
+    
+    Given a file path, check the (cached) listing of its directory 
+    before checking the file itself. Each directory is only listed 
+    once, so files that don't exist - the bulk of the checks when 
+    enumerating many instruments over the same dates - are rejected 
+    without touching the filesystem again.
+    
+    Args:
+        file_path (str): The path of the file to check.
+        dir_cache (dict): A dictionary with directory paths as keys, 
+            and sets of the file names in each directory as values. 
+            Directories that haven't been listed yet are added to it.
+    
+    Returns:
+        bool: A boolean indicating whether the file exists and can be
+        read.
+    """
+    (file_dir, file_name) = os.path.split(file_path)
+    
+    if not file_dir in dir_cache:
+        try:
+            dir_cache[file_dir] = set(os.listdir(file_dir if file_dir != "" else "."))
+        except OSError:
+            # Directory doesn't exist (or can't be read)
+            dir_cache[file_dir] = set()
+    
+    if not file_name in dir_cache[file_dir]:
+        return False
+    
+    return check_file(file_path)
+
 def enumerate(**opts):
     """Returns a list of files that matches the given search range.
 
@@ -204,6 +244,10 @@ def enumerate(**opts):
         time_delta (:py:class:`datetime.timedelta`): 
             :py:class:`datetime.timedelta` object to increment the date 
             with. Default is one hour.
+        dir_cache (dict): Dictionary of cached directory listings to
+            check for data files with. See 
+            :py:func:`check_file_cached` help for more information. 
+            Default is None, which checks each file directly.
         
     For all variables except time_delta, the default value is the
     capitalized global variable version specified in this file.
@@ -259,6 +303,9 @@ def enumerate(**opts):
     time_delta = opts["time_delta"] if "time_delta" in opts \
         else None
     
+    dir_cache = opts["dir_cache"] if "dir_cache" in opts \
+        else None
+    
     # Split up the data types, as necessary. (Basically, are there
     # pipes ("|") in the data type definition?)
     if data_type:
@@ -321,7 +368,7 @@ def enumerate(**opts):
                 # the dictionary!
                 file_path = path_substitute(data_path_format, subs_var)
                 
-                if check_file(file_path):
+                if (check_file_cached(file_path, dir_cache) if dir_cache != None else check_file(file_path)):
                     # Success! Calculate the interval average!
                     average_interval = ((average_interval * interval_measurements) + interval_count) / (interval_measurements + 1)
                     
@@ -388,6 +435,45 @@ def enumerate(**opts):
     # Done!
     return (files_to_read, stats_dict)
 
+def enumerate_cached(enum_cache, **opts):
+    """Returns enumerate() results, reusing results from earlier calls.
+    
+    Calls :py:func:`enumerate` with the given keyword arguments, unless
+    it was already called with the same arguments (using the same 
+    cache), in which case the earlier results are returned instead. 
+    Directory listings are cached as well, so that enumerating other
+    instruments or data types over the same dates only needs to list
+    each directory once.
+    
+    The returned results are shared with the cache, so they must not
+    be modified.
+    
+    Args:
+        enum_cache (dict): The enumeration cache - an empty dictionary
+            to start with, reused across calls.
+    
+    Keyword Args:
+        See :py:func:`enumerate` help.
+    
+    Returns:
+        tuple: A tuple with the list of file dicts and the statistics
+        dict. See :py:func:`enumerate` help for more information.
+    """
+    enum_key = repr(sorted([ (opt, opts[opt]) for opt in opts if opt in ENUMERATE_OPTS ]))
+    
+    if not "results" in enum_cache:
+        enum_cache["results"] = {}
+        enum_cache["dirs"] = {}
+    
+    if enum_key in enum_cache["results"]:
+        debug("Reusing cached enumeration results.")
+    else:
+        enum_opts = dict(opts)
+        enum_opts["dir_cache"] = enum_cache["dirs"]
+        enum_cache["results"][enum_key] = enumerate(**enum_opts)
+    
+    return enum_cache["results"][enum_key]
+
 if __name__ == "__main__":
     import pprint
     pprint.pprint(enumerate())
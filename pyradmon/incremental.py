@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# PyRadmon - Python Radiance Monitoring Tool
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# Incremental Plotting Library -
+#   library for tracking plot inputs and skipping up-to-date plots
+# 
+
+from core import *
+
+import os
+import json
+import hashlib
+
+# Default incremental state file path
+INCREMENTAL_STATE_FILE = "pyradmon_incremental.json"
+
+def hash_obj(obj):
+    """Compute a stable hash for an object.
+    
+    Given an object (typically a dict or list), serialize it to JSON
+    with sorted keys and compute a SHA1 hash of the result. Objects
+    that can't be serialized into JSON directly (e.g.
+    :py:class:`datetime.datetime` or :py:class:`decimal.Decimal`) are
+    converted to strings first.
+    
+    Args:
+        obj (object): The object to hash.
+    
+    Returns:
+        str: A string containing the hexadecimal SHA1 hash of the
+        object.
+    """
+    return hashlib.sha1(json.dumps(obj, sort_keys = True, default = str)).hexdigest()
+
+def input_fingerprint(files_to_read):
+    """Compute a fingerprint for the input data files.
+    
+    Given the list of files to read (from :py:func:`.enumerate()`),
+    compute a fingerprint based on each file's path, modification time,
+    and size. If any input file is added, removed, or modified, the
+    fingerprint will change.
+    
+    Args:
+        files_to_read (list): A list of dictionaries with file
+            information. See :py:func:`.enumerate()` help for more
+            information on its format.
+    
+    Returns:
+        str: A string containing the hexadecimal fingerprint of the
+        input data files.
+    """
+    file_info = []
+    
+    for file_to_read in files_to_read:
+        try:
+            file_stat = os.stat(file_to_read["filename"])
+            file_info.append([ file_to_read["filename"], file_stat.st_mtime, file_stat.st_size ])
+        except OSError:
+            # File went missing? Just use the path - the fingerprint
+            # will still change from when the file existed.
+            file_info.append([ file_to_read["filename"], None, None ])
+    
+    return hash_obj(sorted(file_info))
+
+def plot_fingerprint(input_fp, plot_dict, metadata_dict, custom_vars = None):
+    """Compute a fingerprint for a single plot.
+    
+    Given the input data fingerprint, the plot dictionary for a single
+    plot, and the plot metadata (including the channel), compute a
+    fingerprint for the plot. If any of these change, the fingerprint
+    will change, indicating that the plot needs to be regenerated.
+    
+    Args:
+        input_fp (str): The input data fingerprint, computed with
+            :py:func:`input_fingerprint()`.
+        plot_dict (dict): The plot dictionary for the single plot to
+            compute the fingerprint for. (This is the dictionary for a
+            single plot ID, not the entire plot dictionary!) See
+            :py:func:`.plot()` help (in plot.py) for more information
+            on its format.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information, including the channel. See
+            :py:func:`.plot()` help (in plot.py) for more information
+            on its format.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in title and output path templates. By default,
+            this is set to None.
+    
+    Returns:
+        str: A string containing the hexadecimal fingerprint of the
+        plot.
+    """
+    return hash_obj([ input_fp, hash_obj(plot_dict), metadata_dict, custom_vars ])
+
+def load_state(state_file):
+    """Load the incremental state from a file.
+    
+    Load the incremental state - a dictionary mapping output file paths
+    to plot fingerprints - from the specified JSON file. If the file
+    does not exist or can't be read, an empty state is returned.
+    
+    Args:
+        state_file (str): The path to the incremental state file.
+    
+    Returns:
+        dict: A dictionary with output file paths as keys, and plot
+        fingerprints as values.
+    """
+    if not os.path.isfile(state_file):
+        return {}
+    
+    try:
+        with open(state_file, "r") as state_fh:
+            state = json.load(state_fh)
+    except (IOError, ValueError):
+        warn("Could not read incremental state file %s - all plots will be regenerated." % state_file)
+        return {}
+    
+    if type(state) != dict:
+        warn("Incremental state file %s is not valid - all plots will be regenerated." % state_file)
+        return {}
+    
+    return state
+
+def save_state(state_file, state):
+    """Save the incremental state to a file.
+    
+    Save the incremental state - a dictionary mapping output file paths
+    to plot fingerprints - to the specified JSON file. The state is
+    first written to a temporary file, and then moved into place, so
+    that an interrupted save will not corrupt the existing state.
+    
+    Args:
+        state_file (str): The path to the incremental state file.
+        state (dict): A dictionary with output file paths as keys, and
+            plot fingerprints as values.
+    
+    Returns:
+        bool: A boolean indicating whether the state was saved
+        successfully or not.
+    """
+    state_file_tmp = state_file + ".tmp"
+    
+    try:
+        with open(state_file_tmp, "w") as state_fh:
+            json.dump(state, state_fh, sort_keys = True, indent = 1)
+        os.rename(state_file_tmp, state_file)
+    except (IOError, OSError):
+        error("ERROR: Could not write incremental state file %s!" % state_file)
+        return False
+    
+    return True
+
+def is_up_to_date(state, output_path, fingerprint):
+    """Check if a plot output is up to date.
+    
+    Check whether the output file exists, and whether its recorded
+    fingerprint matches the given fingerprint.
+    
+    Args:
+        state (dict): A dictionary with output file paths as keys, and
+            plot fingerprints as values.
+        output_path (str): The output file path of the plot.
+        fingerprint (str): The current fingerprint of the plot,
+            computed with :py:func:`plot_fingerprint()`.
+    
+    Returns:
+        bool: A boolean indicating whether the plot output is up to
+        date (True) or needs to be regenerated (False).
+    """
+    return (state.get(output_path) == fingerprint) and os.path.isfile(output_path)
+
+def update_state(state, fingerprints, plot_outputs):
+    """Update the incremental state with newly generated plots.
+    
+    Given the fingerprints for the plots that were requested, and the
+    output file paths of the plots that were actually generated, record
+    the fingerprints of the generated plots in the incremental state.
+    Plots that were not generated (e.g. due to an error) are left out,
+    so that they will be regenerated on the next run.
+    
+    Args:
+        state (dict): A dictionary with output file paths as keys, and
+            plot fingerprints as values. This dictionary is updated in
+            place.
+        fingerprints (dict): A dictionary with output file paths as
+            keys, and plot fingerprints as values, for the plots that
+            were requested.
+        plot_outputs (list): A list of output file paths for the plots
+            that were generated, as returned by :py:func:`.plot()` (in
+            plot.py).
+    """
+    if not plot_outputs:
+        return
+    
+    for plot_output in plot_outputs:
+        if plot_output in fingerprints:
+            state[plot_output] = fingerprints[plot_output]
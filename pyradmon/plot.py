@@ -22,6 +22,7 @@ import matplotlib
 matplotlib.use('Agg', warn=False)
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.backends.backend_pdf import PdfPages
 import numpy as np
 import math
 
@@ -30,6 +31,7 @@ from data import VALID_PREFIX
 
 import datetime
 import re
+import io
 import copy
 import warnings
 
@@ -134,6 +136,414 @@ def subst_data(plot_dict, data_dict):
     
     return plot_dict_new
 
+def spec_list(spec_value):
+    """Fetch a plot specification value as a list.
+    
+    Given a plot specification value that may be a single string or a
+    list of strings (e.g. data variables, colors, or labels), return
+    the value as a list. The original value is not modified.
+    
+    Args:
+        spec_value (str or list): The plot specification value to 
+            fetch as a list.
+    
+    Returns:
+        list: The plot specification value as a list. If the value was
+        a string, a list with a single string is returned.
+    """
+    if type(spec_value) == str:
+        return [ spec_value ]
+    return spec_value
+
+def plot_spec(plot_dict):
+    """Parse and normalize a plot dictionary into a plot specification.
+    
+    Given the plot dictionary, create a plot specification that can be
+    shared (read-only) across all channels and plot() calls. This 
+    validates the subplot structure, and converts any single string 
+    data variables, colors, and labels into lists, so that this only 
+    needs to be done once per run.
+    
+    The plot specification is never modified by :py:func:`plot()` - 
+    instead, data is bound locally for each plot from the data 
+    dictionary that is passed in.
+    
+    Args:
+        plot_dict (dict): The plot dictionary to create a plot 
+            specification from. See :py:func:`plot()` help for more 
+            information on its format.
+    
+    Returns:
+        dict: A plot dictionary with its subplot data fields normalized
+        into lists. See :py:func:`plot()` help for more information on
+        its format.
+    """
+    # Make a full copy of the plot dictionary so that we can work on
+    # our own copy (and not modify the original).
+    plot_dict_new = copy.deepcopy(plot_dict)
+    
+    # Loop through each plot ID...
+    for plot_id in plot_dict_new:
+        # Convenience variable
+        plot = plot_dict_new[plot_id]
+        
+        # Loop through all of the plots... at least their index first!
+        for subplotIndex in xrange(0, len(plot["plots"])):
+            # Then fetch their key - there should only be one key.
+            subplotIDKey = fetch_key_from_subplot_dict(plot["plots"][subplotIndex])
+            
+            # Convenience variable
+            subplot = plot["plots"][subplotIndex][subplotIDKey]
+            
+            # Normalize any string fields into lists
+            if isset("data", subplot):
+                for field in [ "x", "y", "colors", "labels" ]:
+                    if isset(field, subplot["data"]):
+                        subplot["data"][field] = spec_list(subplot["data"][field])
+    
+    return plot_dict_new
+
+def bind_data(data_vars, data_dict):
+    """Bind data from the data dict for the specified data variables.
+    
+    Given a list of data variables from the plot specification, fetch 
+    the data for each variable from the data dictionary, and return a 
+    new list with the data. Any data that has already been substituted
+    in (e.g. via :py:func:`subst_data()`) is used as-is. Neither the 
+    data variable list nor the data dictionary are modified.
+    
+    Args:
+        data_vars (str or list): The data variable, or list of data 
+            variables, to bind data for.
+        data_dict (dict): The data dictionary to retrieve values from.
+            See :py:func:`.get_data()` help (in data.py) for more
+            information on its format.
+    
+    Returns:
+        list: A list of data lists, one for each data variable.
+    """
+    bound_data = []
+    
+    for data_var in spec_list(data_vars):
+        # Check to see if the data is already substituted in!
+        if type(data_var) == list:
+            bound_data.append(data_var)
+        else:
+            bound_data.append(data_dict[data_var])
+    
+    return bound_data
+
+def mask_invalid_data(y_dat, mask_sentinel = True):
+    """Convert a data series into a masked array for plotting.
+    
+    Given a list of data values, convert the values into a floating 
+    point NumPy masked array, masking any NaN values. If requested, 
+    invalid (-9999.99) sentinel values are masked as well. The 
+    resulting masked array can be used directly for statistics 
+    (via .mean() and .std(), which ignore masked values), for checking 
+    data availability (via .count()), and for plotting (masked values 
+    are shown as gaps).
+    
+    Args:
+        y_dat (list): List of data values to convert. Values may be
+            Decimal, float, or int.
+        mask_sentinel (bool): Boolean indicating whether to mask the
+            invalid (-9999.99) sentinel values or not. By default, this
+            is set to True.
+    
+    Returns:
+        numpy.ma.MaskedArray: A float masked array with NaN values (and
+        optionally invalid sentinel values) masked out.
+    """
+    y_arr = np.ma.masked_invalid(np.asarray(y_dat, dtype = float))
+    
+    if mask_sentinel:
+        y_arr = np.ma.masked_less_equal(y_arr, -9999)
+    
+    return y_arr
+
+def downsample_minmax(x_axis, y_dat, num_buckets):
+    """Downsample a data series with per-bucket min/max selection.
+    
+    Given the X and Y data for a line, split the data into the given
+    number of buckets (typically, one per pixel column), and keep only
+    the minimum and maximum values within each bucket (in their 
+    original order). This preserves the visual envelope of the line, 
+    including any spikes.
+    
+    Buckets without any valid (unmasked) data are kept as a single 
+    masked point, so that data gaps are still shown as gaps.
+    
+    Args:
+        x_axis (numpy.ndarray): A float array with the X values (e.g. 
+            the numeric time axis).
+        y_dat (numpy.ma.MaskedArray): A float masked array with the Y
+            values, from :py:func:`mask_invalid_data()`.
+        num_buckets (int): The number of buckets to split the data 
+            into.
+    
+    Returns:
+        tuple: A tuple containing the downsampled X values (as a 
+        numpy.ndarray) and the downsampled Y values (as a 
+        numpy.ma.MaskedArray).
+    """
+    bucket_edges = np.linspace(0, len(y_dat), num_buckets + 1).astype(int)
+    keep_idx = []
+    
+    for bucket_id in xrange(0, num_buckets):
+        bucket_start = bucket_edges[bucket_id]
+        bucket_end = bucket_edges[bucket_id + 1]
+        
+        if bucket_end <= bucket_start:
+            continue
+        
+        bucket_dat = y_dat[bucket_start:bucket_end]
+        
+        if bucket_dat.count() == 0:
+            # Keep the gap!
+            keep_idx.append(bucket_start)
+        else:
+            min_idx = bucket_start + bucket_dat.argmin()
+            max_idx = bucket_start + bucket_dat.argmax()
+            
+            keep_idx.append(min(min_idx, max_idx))
+            if min_idx != max_idx:
+                keep_idx.append(max(min_idx, max_idx))
+    
+    keep_idx = np.asarray(keep_idx, dtype = int)
+    
+    return (x_axis[keep_idx], y_dat[keep_idx])
+
+def downsample_lttb(x_axis, y_dat, num_points):
+    """Downsample a data series with Largest-Triangle-Three-Buckets.
+    
+    Given the X and Y data for a line, downsample the data to the 
+    given number of points with the Largest-Triangle-Three-Buckets 
+    (LTTB) algorithm. The first and last points are always kept. The 
+    remaining data is split into buckets, and from each bucket, the 
+    point forming the largest triangle with the previously selected 
+    point and the average of the next bucket is kept. This preserves 
+    the visual shape of the line with far fewer points.
+    
+    Buckets without any valid (unmasked) data are kept as a single 
+    masked point, so that data gaps are still shown as gaps.
+    
+    Args:
+        x_axis (numpy.ndarray): A float array with the X values (e.g. 
+            the numeric time axis).
+        y_dat (numpy.ma.MaskedArray): A float masked array with the Y
+            values, from :py:func:`mask_invalid_data()`.
+        num_points (int): The number of points to downsample to. This 
+            must be at least 3.
+    
+    Returns:
+        tuple: A tuple containing the downsampled X values (as a 
+        numpy.ndarray) and the downsampled Y values (as a 
+        numpy.ma.MaskedArray).
+    """
+    num_dat = len(y_dat)
+    y_valid = ~np.ma.getmaskarray(y_dat)
+    y_vals = y_dat.filled(0.0)
+    
+    # Bucket edges for the points between the first and last points
+    bucket_size = (num_dat - 2.0) / (num_points - 2)
+    bucket_edges = (np.floor(np.arange(0, num_points - 1) * bucket_size) + 1).astype(int)
+    
+    keep_idx = [ 0 ]
+    prev_idx = 0
+    
+    for bucket_id in xrange(0, num_points - 2):
+        bucket_start = bucket_edges[bucket_id]
+        bucket_end = bucket_edges[bucket_id + 1]
+        
+        # The next bucket - for the last bucket, this is the last point
+        if bucket_id + 2 < len(bucket_edges):
+            next_start = bucket_edges[bucket_id + 1]
+            next_end = bucket_edges[bucket_id + 2]
+        else:
+            next_start = num_dat - 1
+            next_end = num_dat
+        
+        bucket_valid = y_valid[bucket_start:bucket_end]
+        
+        if not bucket_valid.any():
+            # Keep the gap!
+            keep_idx.append(bucket_start)
+            prev_idx = bucket_start
+            continue
+        
+        cand_idx = np.arange(bucket_start, bucket_end)[bucket_valid]
+        next_valid = y_valid[next_start:next_end]
+        
+        if y_valid[prev_idx] and next_valid.any():
+            # Average point of the next bucket
+            next_x = x_axis[next_start:next_end][next_valid].mean()
+            next_y = y_vals[next_start:next_end][next_valid].mean()
+            
+            # Triangle areas (times two - only the maximum matters)
+            tri_areas = np.abs((x_axis[prev_idx] - next_x) * (y_vals[cand_idx] - y_vals[prev_idx]) - \
+                               (x_axis[prev_idx] - x_axis[cand_idx]) * (next_y - y_vals[prev_idx]))
+        else:
+            # No valid neighbors (next to a gap) - keep the point
+            # furthest from the bucket average instead.
+            tri_areas = np.abs(y_vals[cand_idx] - y_vals[cand_idx].mean())
+        
+        prev_idx = cand_idx[tri_areas.argmax()]
+        keep_idx.append(prev_idx)
+    
+    keep_idx.append(num_dat - 1)
+    keep_idx = np.asarray(keep_idx, dtype = int)
+    
+    return (x_axis[keep_idx], y_dat[keep_idx])
+
+def downsample_data(x_axis, y_dat, method, width_px):
+    """Downsample a data series for plotting, if needed.
+    
+    Given the X and Y data for a line, downsample the data with the 
+    specified method so that it has roughly as many points as can be 
+    shown in the given width. (Both methods keep up to two points per 
+    pixel column.) If the data already has fewer points than this, or 
+    if the method is "none", the data is returned as-is.
+    
+    Note that downsampling is only used for drawing - statistics 
+    should always be computed from the full data.
+    
+    Args:
+        x_axis (numpy.ndarray): A float array with the X values (e.g. 
+            the numeric time axis).
+        y_dat (numpy.ma.MaskedArray): A float masked array with the Y
+            values, from :py:func:`mask_invalid_data()`.
+        method (str): The downsampling method to use - either "none", 
+            "lttb", or "minmax".
+        width_px (int): The width of the plotting area, in pixels.
+    
+    Returns:
+        tuple: A tuple containing the (possibly downsampled) X values 
+        and Y values.
+    """
+    width_px = max(int(width_px), 2)
+    
+    if (method == "none") or (len(y_dat) <= 2 * width_px) or (len(x_axis) != len(y_dat)):
+        return (x_axis, y_dat)
+    
+    if method == "lttb":
+        return downsample_lttb(x_axis, y_dat, 2 * width_px)
+    elif method == "minmax":
+        return downsample_minmax(x_axis, y_dat, width_px)
+    
+    warn("Unknown downsampling method '%s' - plotting all data." % method)
+    return (x_axis, y_dat)
+
+def make_time_axis(timestamps):
+    """Create a numeric time axis from a list of timestamps.
+    
+    Given a list of :py:class:`datetime.datetime` timestamps, convert 
+    them into a NumPy array of matplotlib date numbers. The resulting 
+    array is marked read-only, allowing it to be computed once and 
+    safely shared across channels, subplots, and worker processes.
+    
+    Args:
+        timestamps (list): List of :py:class:`datetime.datetime` 
+            objects to convert.
+    
+    Returns:
+        numpy.ndarray: A read-only float array with the matplotlib date
+        numbers for each timestamp.
+    """
+    time_axis = np.asarray(mdates.date2num(timestamps), dtype = float)
+    time_axis.flags.writeable = False
+    
+    return time_axis
+
+def check_time_axis(data_dict, time_axis = None):
+    """Check whether the shared time axis fits the data timestamps.
+    
+    The shared time axis should already be checked against the data's
+    timestamps when it's passed in (the wrapper compares the timestamp
+    lists, which is much cheaper than converting them again). As a 
+    safety net, only cheaply check that the length and endpoints match
+    - this is done once per figure, rather than for every subplot.
+    
+    Args:
+        data_dict (dict): The data dictionary containing the 
+            "timestamp" list to check. See :py:func:`.get_data()` help
+            (in data.py) for more information on its format.
+        time_axis (numpy.ndarray): The shared time axis created by 
+            :py:func:`make_time_axis()`. By default, this is set to 
+            None.
+    
+    Returns:
+        numpy.ndarray: The shared time axis, if it matches the data
+        timestamps, or None if it doesn't (or if there is no shared
+        time axis).
+    """
+    if (time_axis is None) or (not isset("timestamp", data_dict)) or \
+        (len(data_dict["timestamp"]) != len(time_axis)) or (len(time_axis) == 0):
+        return None
+    
+    if not np.array_equal(mdates.date2num([ data_dict["timestamp"][0], data_dict["timestamp"][-1] ]), [ time_axis[0], time_axis[-1] ]):
+        return None
+    
+    return time_axis
+
+def resolve_time_axis(x_dat, data_dict, time_axis = None):
+    """Resolve the numeric time axis to use for the given X data.
+    
+    Given the X data for a subplot, determine whether the shared, 
+    precomputed time axis can be used for it. The shared time axis is 
+    only used if the X data is the data timestamps list itself (and not
+    e.g. the result of an X post_processing function). Otherwise, the
+    X data is converted into a numeric time axis locally.
+    
+    Args:
+        x_dat (list): List of X data values (timestamps) to resolve the
+            time axis for.
+        data_dict (dict): The data dictionary containing the 
+            "timestamp" list that the shared time axis was created 
+            from. See :py:func:`.get_data()` help (in data.py) for more
+            information on its format.
+        time_axis (numpy.ndarray): The shared time axis, already checked
+            against the data timestamps with 
+            :py:func:`check_time_axis()`. By default, this is set to 
+            None, in which case the X data is always converted locally.
+    
+    Returns:
+        numpy.ndarray: A float array with the matplotlib date numbers 
+        for each X data value.
+    """
+    if (time_axis is not None) and isset("timestamp", data_dict) and (x_dat is data_dict["timestamp"]):
+        return time_axis
+    
+    return make_time_axis(x_dat)
+
+# Tick locations for each shared time axis, indexed by its endpoints
+time_ticks_cache = {}
+
+def get_time_ticks(time_axis):
+    """Get the date tick locations for a shared time axis.
+    
+    Every subplot plotted against the shared time axis has the same X
+    limits, and so the same date ticks. Find the tick locations once
+    (per process), the same way matplotlib's automatic date locator 
+    does, instead of having every subplot find them again.
+    
+    Args:
+        time_axis (numpy.ndarray): The shared time axis created by 
+            :py:func:`make_time_axis()`.
+    
+    Returns:
+        numpy.ndarray: A read-only float array with the matplotlib date
+        numbers of the tick locations.
+    """
+    time_key = (time_axis[0], time_axis[-1])
+    
+    if not time_key in time_ticks_cache:
+        time_ticks = np.asarray(mdates.AutoDateLocator().tick_values(mdates.num2date(time_axis[0]), mdates.num2date(time_axis[-1])), dtype = float)
+        time_ticks.flags.writeable = False
+        time_ticks_cache[time_key] = time_ticks
+    
+    return time_ticks_cache[time_key]
+
 def title_output_replace(input_title_output, metadata_dict, data_dict, rel_channels_dict, is_title = False, custom_vars = None):
     """Substitute %VAR% variables with provided values and constants.
     
@@ -199,14 +609,17 @@ def title_output_replace(input_title_output, metadata_dict, data_dict, rel_chann
     else:
         input_title_output = input_title_output.replace("%INSTRUMENT_SAT%", metadata_dict["instrument_sat"])
     
-    # Replace data channel variable
-    input_title_output = input_title_output.replace("%CHANNEL%", str(metadata_dict["channel"]))
-    
-    # Reverse the channel map
-    # Original: rel_channel -> actual data channel
-    # Inverted: actual data channel -> rel_channel
-    rel_channels_inv_map = dict(zip(rel_channels_dict.values(), rel_channels_dict.keys()))
-    input_title_output = input_title_output.replace("%RELCHANNEL%", str(rel_channels_inv_map[metadata_dict["channel"]]))
+    # Replace data channel variables... only if we have a channel!
+    # (If we don't, leave them as-is for later replacement.)
+    if "channel" in metadata_dict:
+        # Replace data channel variable
+        input_title_output = input_title_output.replace("%CHANNEL%", str(metadata_dict["channel"]))
+        
+        # Reverse the channel map
+        # Original: rel_channel -> actual data channel
+        # Inverted: actual data channel -> rel_channel
+        rel_channels_inv_map = dict(zip(rel_channels_dict.values(), rel_channels_dict.keys()))
+        input_title_output = input_title_output.replace("%RELCHANNEL%", str(rel_channels_inv_map[metadata_dict["channel"]]))
     
     # Ensure that we have adequate data to determine frequency.
     # If we do, replace the frequency variable!
@@ -230,7 +643,548 @@ def title_output_replace(input_title_output, metadata_dict, data_dict, rel_chann
     
     return input_title_output
 
-def plot(plot_dict, data_dict, metadata_dict, rel_channels_dict, custom_vars = None, make_dirs = False):
+def get_plot_output(plot, metadata_dict, data_dict, rel_channels_dict, custom_vars = None):
+    """Get the output file path for a plot.
+    
+    Given the plot dictionary for a single plot, determine the output 
+    file path for the plot by performing template replacement on the 
+    plot's output path. If no output path is specified, a default 
+    output path is returned instead.
+    
+    Args:
+        plot (dict): The plot dictionary for a single plot. (This is 
+            the dictionary for a single plot ID, not the entire plot 
+            dictionary!) See :py:func:`plot()` help for more 
+            information on its format.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. See :py:func:`plot()` help for more 
+            information on its format.
+        data_dict (dict): The data dictionary to retrieve values from.
+            See :py:func:`.get_data()` help (in data.py) for more
+            information on its format.
+        rel_channels_dict (dict): The relative channels dictionary to 
+            map relative channels to actual data channels. See 
+            :py:func:`plot()` help for more information on its format.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in the output path template. By default, this 
+            is set to None.
+    
+    Returns:
+        str: A string containing the output file path for the plot.
+    """
+    if isset("output", plot):
+        return title_output_replace(plot["output"], metadata_dict, data_dict, rel_channels_dict, False, custom_vars)
+    
+    return "magical_plot_please_specify_output_path_next_time.png"
+
+def check_output_path(plot_output, make_dirs = False):
+    """Check that the directory for an output path exists.
+    
+    Given an output file path, check to see if its directory exists. 
+    If it doesn't, create it if make_dirs is set, or exit with an error
+    otherwise.
+    
+    Args:
+        plot_output (str): The output file path to check.
+        make_dirs (bool): Boolean indicating whether to automatically
+            create output path directories or not. This defaults to 
+            False to ensure that the path specified is correct.
+    """
+    # Check to see if the path exists!
+    # ...but make sure there IS a path to check for!
+    if os.path.dirname(plot_output).strip() != "":
+        if not os.path.exists(os.path.dirname(plot_output)):
+            # Check to see if make_dirs is set, and if so,
+            # create the path directory.
+            if make_dirs:
+                info("Output path %s not found, creating directory." % os.path.dirname(plot_output))
+                mkdir_p(os.path.dirname(plot_output))
+            else:
+                critical("Output path %s not found! If you want PyRadmon to create" % os.path.dirname(plot_output))
+                critical("the directory for you, add --plot-make-dirs or add and set the")
+                critical("make_dirs in the config section of the config file to true.")
+                die("Output path %s not found!" % os.path.dirname(plot_output))
+
+def output_target(plot_output, make_dirs = False, in_memory = False):
+    """Get the target to save a plot output to.
+    
+    Given an output file path, determine where the plot should actually
+    be saved to. Normally, this is the output file path itself (after
+    checking that its directory exists with 
+    :py:func:`check_output_path()`). If in_memory is set, an in-memory 
+    buffer is returned instead, and the output file path is only used
+    as a name (e.g. for an archive member).
+    
+    Args:
+        plot_output (str): The output file path of the plot.
+        make_dirs (bool): Boolean indicating whether to automatically
+            create output path directories or not. This defaults to 
+            False to ensure that the path specified is correct.
+        in_memory (bool): Boolean indicating whether to save the plot 
+            into an in-memory buffer instead of a file. By default, 
+            this is set to False.
+    
+    Returns:
+        str or io.BytesIO: The output file path, or an in-memory 
+        buffer if in_memory is set.
+    """
+    if in_memory:
+        return io.BytesIO()
+    
+    check_output_path(plot_output, make_dirs)
+    return plot_output
+
+def output_result(plot_output, plot_target):
+    """Get the result of a saved plot output.
+    
+    Given the output file path and the target it was saved to (from
+    :py:func:`output_target()`), return the result to report back to
+    the caller.
+    
+    Args:
+        plot_output (str): The output file path of the plot.
+        plot_target (str or io.BytesIO): The target the plot was saved
+            to, from :py:func:`output_target()`.
+    
+    Returns:
+        str or tuple: The output file path if the plot was saved to a
+        file, or a tuple containing the output file path and the saved
+        plot (as a str of bytes) if the plot was saved to an in-memory
+        buffer.
+    """
+    if isinstance(plot_target, io.BytesIO):
+        return (plot_output, plot_target.getvalue())
+    
+    return plot_output
+
+def get_output_format(plot_output):
+    """Get the file format of a plot output.
+    
+    Determine the file format (e.g. "png") from the output file path's
+    extension. This is needed when saving to in-memory buffers, since
+    there is no file name to infer the format from.
+    
+    Args:
+        plot_output (str): The output file path of the plot.
+    
+    Returns:
+        str: The file format, or None if the output file path has no 
+        extension (in which case the default format is used).
+    """
+    output_ext = os.path.splitext(plot_output)[1]
+    
+    if output_ext == "":
+        return None
+    
+    return output_ext[1:].lower()
+
+def save_figure(fig, plot_output, plot, output_format = None):
+    """Save a figure to a file.
+    
+    Save the figure made with :py:func:`make_figure()` to the 
+    specified output file, using the plot's size and DPI settings.
+    
+    Args:
+        fig (matplotlib.figure.Figure): The figure to save.
+        plot_output (str or io.BytesIO): The output file path (or 
+            in-memory buffer) to save the figure to.
+        plot (dict): The plot dictionary for a single plot, used for 
+            its settings. See :py:func:`plot()` help for more 
+            information on its format.
+        output_format (str): The file format to save the figure in. By
+            default, this is set to None, which infers the format from
+            the output file path.
+    """
+    # Pull plot sizing settings
+    plot_dpi = plot["settings"]["dpi"]
+    plot_target_size = plot["settings"]["target_size"]
+    
+    fig.savefig(plot_output, facecolor=fig.get_facecolor(), edgecolor='none', figsize=((plot_target_size[0] + 0.0) / plot_dpi, (plot_target_size[1] + 0.0) / plot_dpi), dpi = plot_dpi, format = output_format)
+
+def make_figure(plot, data_dict, metadata_dict, rel_channels_dict, custom_vars = None, time_axis = None):
+    """Make a figure for a single plot.
+    
+    Given the plot dictionary for a single plot and the data dictionary
+    for a single channel, create the matplotlib figure for the plot, 
+    including its title, subplots, and legends. The figure is NOT 
+    saved or closed - it is up to the caller to save the figure (e.g. 
+    to a PNG file, a page in a multi-page PDF, or a tile in a contact 
+    sheet) and to close it.
+    
+    Args:
+        plot (dict): The plot dictionary for a single plot. (This is 
+            the dictionary for a single plot ID, not the entire plot 
+            dictionary!) See :py:func:`plot()` help for more 
+            information on its format.
+        data_dict (dict): The data dictionary to retrieve the values to
+            plot from. See :py:func:`.get_data()` help (in data.py) for
+            more information on its format.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. See :py:func:`plot()` help for more 
+            information on its format.
+        rel_channels_dict (dict): The relative channels dictionary to 
+            map relative channels to actual data channels. See 
+            :py:func:`plot()` help for more information on its format.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in title templates. By default, this is set to 
+            None.
+        time_axis (numpy.ndarray): A precomputed, read-only numeric 
+            time axis created with :py:func:`make_time_axis()`. By 
+            default, this is set to None.
+    
+    Returns:
+        matplotlib.figure.Figure: The figure for the plot.
+    """
+    # Keep track of the total number of plots
+    total_plots = len(plot["plots"])
+    
+    # Pull plot sizing settings
+    plot_dpi = plot["settings"]["dpi"]
+    plot_target_size = plot["settings"]["target_size"]
+    
+    # Pull the downsampling setting
+    if isset("downsample", plot["settings"]):
+        plot_downsample = plot["settings"]["downsample"]
+    else:
+        plot_downsample = "none"
+    
+    # Only use the shared time axis if it matches this data!
+    time_axis = check_time_axis(data_dict, time_axis)
+    
+    # Solve for correct figsize and set it up
+    fig = plt.figure(figsize=(plot_target_size[0] / plot_dpi, plot_target_size[1] / plot_dpi), dpi = plot_dpi)
+    
+    # Check for a title
+    if isset("title", plot):
+        # Convenience variable
+        plot_title = plot["title"]
+        
+        # Perform title template replace
+        plot_title = title_output_replace(plot_title, metadata_dict, data_dict, rel_channels_dict, True, custom_vars)
+        
+        # Do we have an %ASSIMILATION_STATUS% placeholder?
+        if "%ASSIMILATION_STATUS%" in plot["title"]:
+            # Check for iuse
+            if isset("iuse", data_dict):
+                # Initialize a variable for storing 
+                iuse_state = None
+                
+                # Read iuse and determine if there are any conflicts
+                for prefix in VALID_PREFIX:
+                    if data_dict["iuse"][prefix][-1] == -1:
+                        if iuse_state and iuse_state != -1:
+                            warn("Assimilation state mismatch - last element uses %i instead of %i! (Changing to former value.)" % (data_dict["iuse"][prefix][-1], iuse_state))
+                        iuse_state = -1
+                    else:
+                        if iuse_state and iuse_state == -1:
+                            warn("Assimilation state mismatch - last element uses %i instead of %i! (Changing to former value.)" % (data_dict["iuse"][prefix][-1], iuse_state))
+                        iuse_state = data_dict["iuse"][prefix][-1]
+                
+                # Check to ensure iuse_state has been set!
+                if not iuse_state:
+                    die("Assimilation state could not be updated! (No prefixes found?)")
+                
+                # Now check the last element - if -1, it's not assimilated!
+                if iuse_state == -1:
+                    fig.text(0.67, 0.948, "Not Assimilated", ha="center", va="bottom", size="x-large",color="red")
+                else:
+                    fig.text(0.67, 0.948, "Assimilated", ha="center", va="bottom", size="x-large",color="green")
+            else:
+                # No iuse, so we can't figure out assimilation...
+                warn("Unable to determine assimilation!")
+                fig.text(0.67, 0.948, "Unknown (??)", ha="center", va="bottom", size="x-large",color="orange")
+    
+    # Add the plot title to the plot
+    fig.suptitle(plot_title, fontsize=18)
+    
+    # Adjust spacing so that the plot title has some room!
+    #   hspace - the amount of height reserved for white space
+    #            between subplots
+    #   left - the left side of the subplots of the figure
+    #   top - the top of the subplots of the figure
+    plt.subplots_adjust(hspace = 1.2, left=0.15, top=0.88)
+    
+    # Loop through subplot indexes
+    for subplotIndex in xrange(0, len(plot["plots"])):
+        # Add a subplot - select position of subplot based on index
+        axe = fig.add_subplot(total_plots, 1, subplotIndex + 1)
+        
+        # Grab the correct subplot ID (aka the key)
+        subplotIDKey = fetch_key_from_subplot_dict(plot["plots"][subplotIndex])
+        
+        # Convenience variable
+        subplot = plot["plots"][subplotIndex][subplotIDKey]
+        
+        # Whether this subplot was plotted against the shared time
+        # axis (and so can use its shared ticks)
+        shared_ticks = False
+        
+        # Fetch the colors and labels as lists, without modifying
+        # the plot specification
+        data_colors = []
+        data_labels = []
+        if isset("data", subplot):
+            if isset("colors", subplot["data"]):
+                data_colors = spec_list(subplot["data"]["colors"])
+            if isset("labels", subplot["data"]):
+                data_labels = spec_list(subplot["data"]["labels"])
+        
+        # Do we have axes defined?
+        if isset("axes", subplot):
+            # Do we have an X axis defined?
+            if isset("x", subplot["axes"]):
+                # Note: X axis ticks setting disabled for now - setting
+                # number of ticks for the X axis tends to mess up the
+                # dates!
+                
+                # Check if a label is defined, and if so, make a label!
+                if isset("label", subplot["axes"]["x"]):
+                    axe.xaxis.set_label_text(subplot["axes"]["x"]["label"])
+            
+            # Do we have a Y axis defined?
+            if isset("y", subplot["axes"]):
+                # Check if number of ticks is defined, and if so, change # of ticks accordingly!
+                if isset("ticks", subplot["axes"]["y"]):
+                    axe.yaxis.set_major_locator(matplotlib.ticker.MaxNLocator(subplot["axes"]["y"]["ticks"]))
+                
+                # Check if a label is defined, and if so, make a label!
+                if isset("label", subplot["axes"]["y"]):
+                    axe.yaxis.set_label_text(subplot["axes"]["y"]["label"])
+        
+        # Do we have the plot data defined?
+        if isset("data", subplot):
+            # Is the data for the X axis defined?
+            # Without an X axis, we can't make a plot!
+            if isset("x", subplot["data"]):
+                # Bind the X data from the data dict. The plot
+                # specification itself is never modified - all
+                # bound data is kept local to this plot.
+                x_data = bind_data(subplot["data"]["x"], data_dict)
+                
+                # Is the data for the Y axis defined?
+                if isset("y", subplot["data"]):
+                    # Bind the Y data from the data dict.
+                    y_data = bind_data(subplot["data"]["y"], data_dict)
+                    
+                    # Check for post_processing functions
+                    if isset("post_processing", subplot["data"]):
+                        # Check if there is a post_processing
+                        # function for the X data
+                        if isset("x", subplot["data"]["post_processing"]):
+                            # Apply the lambda function to the data!
+                            x_data[eleID_x] = post_processing_func_x(data_dict, x_data[eleID_x], y_data[eleID_y])
+                            
+                            # Apply the lambda function to the data,
+                            # piece by piece! This takes each
+                            # subarray in the X data array and
+                            # applies the function to it.
+                            for eleID_x in xrange(0, len(x_data)):
+                                for eleID_y in xrange(0, len(y_data)):
+                                    if eleID_x < len(subplot["data"]["post_processing"]["x"]):
+                                        # Define the function...
+                                        exec "post_processing_func_x = lambda data,x,y: %s" % subplot["data"]["post_processing"]["x"]
+                                        # ...and run it!
+                                        x_data[eleID_x] = post_processing_func_x(data_dict, x_data[eleID_x], y_data[eleID_y])
+                                    else:
+                                        warn("WARNING: Not enough post_processing functions for the X data.")
+                        
+                        # Check if there is a post_processing
+                        # function for the Y data
+                        if isset("y", subplot["data"]["post_processing"]):
+                            # Warn about mutliple X
+                            if len(x_data) > 1:
+                                warn("WARNING: Substitution of Y data may be unreliable if you use X due to multiple X.")
+                            
+                            # Apply the lambda function to the data,
+                            # piece by piece! This takes each
+                            # subarray in the Y data array and
+                            # applies the function to it.
+                            for eleID_x in xrange(0, len(x_data)):
+                                for eleID_y in xrange(0, len(y_data)):
+                                    if eleID_y < len(subplot["data"]["post_processing"]["y"]):
+                                        # Define the function...
+                                        exec "post_processing_func_y = lambda data,x,y: %s" % subplot["data"]["post_processing"]["y"]
+                                        # ...and run it!
+                                        y_data[eleID_x] = post_processing_func_y(data_dict, x_data[eleID_x], y_data[eleID_y])
+                                    else:
+                                        warn("WARNING: Not enough post_processing functions for the Y data.")
+                    
+                    # Fetch the numeric time axis for the X
+                    # data, preferring the shared time axis
+                    x_axis = resolve_time_axis(x_data[0], data_dict, time_axis)
+                    
+                    plot_kwargs = {}
+                    y_id = 0
+                    plotted_graphs = 0
+                    debug("y_id and plotted_graphs RESET to zero")
+                    
+                    # Loop through Y data arrays
+                    for y_dat in y_data:
+                        # Validate data length
+                        if len(y_dat) != len(x_data[0]):
+                            warn("WARNING: Data length for X differs from data length for Y!")
+                            warn("(Data length for X: %i; Data length for Y: %i)" % (len(x_data[0]), len(y_dat)))
+                        
+                        # Check if the colors attribute was set!
+                        if isset("colors", subplot["data"]):
+                            # Verify that there are enough colors
+                            # for the data.
+                            if y_id < len(data_colors):
+                                # Grab the color, and toss it into
+                                # the plot kwargs!
+                                l_color = data_colors[y_id]
+                                plot_kwargs["color"] = l_color
+                            else:
+                                if len(data_colors) != len(y_data):
+                                    # Emit a warning...
+                                    warn("WARNING: Not enough colors specified in the colors field for the data!")
+                                    warn("Colors specified vs. amount of Y data: %i vs. %i" % (len(data_colors), len(y_data)))
+                        
+                        # Convert the data into a masked array,
+                        # masking out any invalid data (-9999.99)...
+                        # ...but ensure that "iuse" exists first!
+                        y_dat = mask_invalid_data(y_dat, isset("iuse", data_dict))
+                        
+                        # Do we need to skip graphing (due to all
+                        # of the values being bad)?
+                        skip_graph = False
+                        
+                        # Are they all bad apples?
+                        if isset("iuse", data_dict) and (y_dat.count() == 0):
+                            # Take steps to make an empty plot
+                            axe.xaxis_date()
+                            y_id += 1
+                            
+                            skip_graph = True
+                        
+                        # Check for a labels attribute...
+                        if isset("labels", subplot["data"]):
+                            # Ensure that we have enough labels
+                            # for the data!
+                            if y_id < len(data_labels):
+                                # Grab the label and perform substitution
+                                l_label = data_labels[y_id]
+                                l_label = l_label.replace("%COLOR%", "")
+                                l_label = l_label.replace("%ENDCOLOR%", "")
+                                
+                                # Zero division detection
+                                if y_dat.count() == 0:
+                                    # Set AVG and STDDEV to zero.
+                                    AVG = 0
+                                    STDDEV = 0
+                                else:
+                                    # Perform statistics! Masked
+                                    # (invalid and NaN) values are
+                                    # ignored by the reductions.
+                                    # The float sum is a hair off
+                                    # from the exact (Decimal) one,
+                                    # so trim it to 12 digits before
+                                    # rounding - otherwise averages
+                                    # like 0.3225 round down.
+                                    AVG = round(float("%.12g" % y_dat.mean()), 3)
+                                    STDDEV = y_dat.std()
+                                
+                                # Now perform substitution!
+                                l_label = l_label.replace("%AVERAGE%", str(AVG))
+                                l_label = l_label.replace("%STDDEV%", str(STDDEV))
+                                plot_kwargs["label"] = l_label
+                            else:
+                                if len(data_labels) != len(y_data):
+                                    # Emit a warning...
+                                    warn("WARNING: Not enough labels specified in the colors field for the data!")
+                                    warn("Labels specified vs. amount of Y data: %i vs. %i" % (len(data_labels), len(y_data)))
+                        else:
+                            # Set the label to nothing
+                            l_label = ""
+                        
+                        # Check if skip_graph was set, and if so,
+                        # reset it and skip
+                        if skip_graph:
+                            skip_graph = False
+                            continue
+                        
+                        # Ensure that all X values are displayed
+                        axe.set_xlim(left = x_axis[0], right = x_axis[-1])
+                        
+                        # Downsample the values to what can be
+                        # shown (if enabled), and plot them!
+                        (plot_x, plot_y) = downsample_data(x_axis, y_dat, plot_downsample, axe.get_position().width * plot_target_size[0])
+                        axe.plot(plot_x, plot_y, **plot_kwargs)
+                        axe.xaxis_date()
+                        
+                        if x_axis is time_axis:
+                            shared_ticks = True
+                        
+                        # Increment counters...
+                        y_id += 1
+                        plotted_graphs += 1
+        
+        # Indicate if subplot is empty or not!
+        if plotted_graphs == 0:
+            plt.text(0.5, 0.5, 'Data not available', horizontalalignment='center',
+                    verticalalignment='center', fontsize=24,
+                    transform=axe.transAxes)
+        
+        # Check to see if we have a legend defined...
+        if isset("legend", subplot):
+            legend_kwargs = {}
+            
+            # Make some room for the legend!
+            box = axe.get_position()
+            axe.set_position([box.x0 + box.width * 0.1, box.y0, box.width * 0.9, box.height])
+            
+            # Set up the position to the left side of the plot, and
+            # create the legend!
+            if "title" in subplot["legend"]:
+                legend_kwargs["title"] = subplot["legend"]["title"]
+            # bbox_to_anchor - the "bounding box" where the legend will anchor to
+            # borderaxespad - the pad between the axes and legend border
+            # handlelength - the length of the legend handles
+            legend = axe.legend(loc='center left', bbox_to_anchor=(-0.3, 0.5), borderaxespad=0., handlelength=0, **legend_kwargs)
+            
+            # Make the legend title large!
+            # (But only if the legend actually exists - if there's
+            # no data, it goes *poof*...)
+            if legend:
+                plt.setp(legend.get_title(),fontsize='large')
+            
+            # If there is no data, things tend to be weird... no
+            # legend will be displayed. If that's the case, let's
+            # make a fake legend!
+            if plotted_graphs == 0:
+                rects = []
+                labels = []
+                
+                # Loop through colors and add a Patch object with 
+                # said color!
+                for c in data_colors:
+                    rects.append(matplotlib.patches.Patch(fc=c, ec=c))
+                
+                # Add the labels back in!
+                for l in data_labels:
+                    labels.append(l.replace("%AVERAGE%", "N/A"))
+                    labels.append(l.replace("%STDDEV%", "N/A"))
+                
+                # Finally, add the fake legend to the plot!
+                ext_leg = plt.legend(rects, labels, loc='center left', bbox_to_anchor=(-0.3, 0.5), borderaxespad=0., handlelength=0, **legend_kwargs)
+        
+        # If there's a subplot title, make one!
+        if isset("title", subplot):
+            axe.set_title(subplot["title"], fontsize='large')
+        
+        # Use the shared time axis ticks, if we can!
+        if shared_ticks:
+            axe.xaxis.set_major_locator(matplotlib.ticker.FixedLocator(get_time_ticks(time_axis)))
+        
+        # Set the date format!
+        axe.xaxis.set_major_formatter(mdates.DateFormatter('%d%b\n%Y'))
+    
+    # Change the default gray background to white
+    fig.patch.set_facecolor('white')
+    
+    return fig
+
+def plot(plot_dict, data_dict, metadata_dict, rel_channels_dict, custom_vars = None, make_dirs = False, time_axis = None, in_memory = False):
     """Given plot settings and data/constants, produce a plot.
     
     Given plot settings defined in a special plot dict, and various 
@@ -419,16 +1373,28 @@ def plot(plot_dict, data_dict, metadata_dict, rel_channels_dict, custom_vars = N
         make_dirs (bool): Boolean indicating whether to automatically
             create output path directories or not. This defaults to 
             False to ensure that the path specified is correct.
+        time_axis (numpy.ndarray): A precomputed, read-only numeric 
+            time axis created from the data timestamps with 
+            :py:func:`make_time_axis()`. Since all channels within a 
+            run share the same timestamps, this can be computed once 
+            and shared across all plot() calls. If the X data does not
+            match the time axis, or if this is not specified (None, the
+            default), the X data will be converted locally.
+        in_memory (bool): Boolean indicating whether to render the 
+            plots into in-memory buffers instead of writing them to 
+            files. This is used to write plots into an archive from 
+            worker processes. By default, this is set to False.
     
     Returns:
-        str: A string with %VAR% variables replaced with the 
-        appropriate value or constant. Some %VAR% variables may not be 
-        replaced if they do not exist, or certain conditions are not 
-        met.
+        list: A list of output file paths for the plots that were 
+        generated. If in_memory is set, this is instead a list of 
+        tuples, each containing the output file path and the rendered 
+        plot (as a str of bytes).
     """
-    # Make a working copy for our use.
-    plot_dict_copy = copy.deepcopy(plot_dict)
-    plot_dict = plot_dict_copy
+    # Note that the plot dictionary is treated as read-only - any data
+    # and settings are bound locally below, so no working copy is
+    # needed. (This allows a single plot specification to be shared
+    # across all channels.)
     
     # Check for iuse - if it doesn't exist, warn about the inability
     # to check data assimilation.
@@ -437,397 +1403,305 @@ def plot(plot_dict, data_dict, metadata_dict, rel_channels_dict, custom_vars = N
         warn("Note that to cull any invalid values or display assimilation")
         warn("status, iuse must be part of the data to be read.")
     
+    # Keep track of the plots that we've written
+    plot_outputs = []
+    
     # Loop through the plot IDs
     for plot_id in plot_dict:
-        # Keep track of the total number of plots
-        total_plots = len(plot_dict[plot_id]["plots"])
-        
         # Convenience variable
         plot = plot_dict[plot_id]
         
-        # Pull plot sizing settings
-        plot_dpi = plot["settings"]["dpi"]
-        plot_target_size = plot["settings"]["target_size"]
+        # Make the figure!
+        fig = make_figure(plot, data_dict, metadata_dict, rel_channels_dict, custom_vars, time_axis)
         
-        # Solve for correct figsize and set it up
-        fig = plt.figure(figsize=(plot_target_size[0] / plot_dpi, plot_target_size[1] / plot_dpi), dpi = plot_dpi)
+        # Set the output path for the plot
+        if not isset("output", plot):
+            warn("Output path not specified, will save to 'magical_plot_please_specify_output_path_next_time.png'!")
         
-        # Check for a title
-        if isset("title", plot):
-            # Convenience variable
-            plot_title = plot["title"]
-            
-            # Perform title template replace
-            plot_title = title_output_replace(plot_title, metadata_dict, data_dict, rel_channels_dict, True, custom_vars)
-            
-            # Do we have an %ASSIMILATION_STATUS% placeholder?
-            if "%ASSIMILATION_STATUS%" in plot["title"]:
-                # Check for iuse
-                if isset("iuse", data_dict):
-                    # Initialize a variable for storing 
-                    iuse_state = None
-                    
-                    # Read iuse and determine if there are any conflicts
-                    for prefix in VALID_PREFIX:
-                        if data_dict["iuse"][prefix][-1] == -1:
-                            if iuse_state and iuse_state != -1:
-                                warn("Assimilation state mismatch - last element uses %i instead of %i! (Changing to former value.)" % (data_dict["iuse"][prefix][-1], iuse_state))
-                            iuse_state = -1
-                        else:
-                            if iuse_state and iuse_state == -1:
-                                warn("Assimilation state mismatch - last element uses %i instead of %i! (Changing to former value.)" % (data_dict["iuse"][prefix][-1], iuse_state))
-                            iuse_state = data_dict["iuse"][prefix][-1]
-                    
-                    # Check to ensure iuse_state has been set!
-                    if not iuse_state:
-                        die("Assimilation state could not be updated! (No prefixes found?)")
-                    
-                    # Now check the last element - if -1, it's not assimilated!
-                    if iuse_state == -1:
-                        fig.text(0.67, 0.948, "Not Assimilated", ha="center", va="bottom", size="x-large",color="red")
-                    else:
-                        fig.text(0.67, 0.948, "Assimilated", ha="center", va="bottom", size="x-large",color="green")
-                else:
-                    # No iuse, so we can't figure out assimilation...
-                    warn("Unable to determine assimilation!")
-                    fig.text(0.67, 0.948, "Unknown (??)", ha="center", va="bottom", size="x-large",color="orange")
+        # Perform substitution on the plot output path, and check to
+        # see if the path exists!
+        plot_output = get_plot_output(plot, metadata_dict, data_dict, rel_channels_dict, custom_vars)
+        plot_target = output_target(plot_output, make_dirs, in_memory)
         
-        # Add the plot title to the plot
-        fig.suptitle(plot_title, fontsize=18)
+        # Make and save the plot!
+        save_figure(fig, plot_target, plot, get_output_format(plot_output))
         
-        # Adjust spacing so that the plot title has some room!
-        #   hspace - the amount of height reserved for white space
-        #            between subplots
-        #   left - the left side of the subplots of the figure
-        #   top - the top of the subplots of the figure
-        plt.subplots_adjust(hspace = 1.2, left=0.15, top=0.88)
+        # Free it all!
+        plt.close(fig)
         
-        # Loop through subplot indexes
-        for subplotIndex in xrange(0, len(plot["plots"])):
-            # Add a subplot - select position of subplot based on index
-            axe = fig.add_subplot(total_plots, 1, subplotIndex + 1)
-            
-            # Grab the correct subplot ID (aka the key)
-            subplotIDKey = fetch_key_from_subplot_dict(plot["plots"][subplotIndex])
-            
-            # Convenience variable
-            subplot = plot["plots"][subplotIndex][subplotIDKey]
-            
-            # Do we have axes defined?
-            if isset("axes", subplot):
-                # Do we have an X axis defined?
-                if isset("x", subplot["axes"]):
-                    # Note: X axis ticks setting disabled for now - setting
-                    # number of ticks for the X axis tends to mess up the
-                    # dates!
-                    
-                    # Check if a label is defined, and if so, make a label!
-                    if isset("label", subplot["axes"]["x"]):
-                        axe.xaxis.set_label_text(subplot["axes"]["x"]["label"])
-                
-                # Do we have a Y axis defined?
-                if isset("y", subplot["axes"]):
-                    # Check if number of ticks is defined, and if so, change # of ticks accordingly!
-                    if isset("ticks", subplot["axes"]["y"]):
-                        axe.yaxis.set_major_locator(matplotlib.ticker.MaxNLocator(subplot["axes"]["y"]["ticks"]))
-                    
-                    # Check if a label is defined, and if so, make a label!
-                    if isset("label", subplot["axes"]["y"]):
-                        axe.yaxis.set_label_text(subplot["axes"]["y"]["label"])
-            
-            # Do we have the plot data defined?
-            if isset("data", subplot):
-                # Is the data for the X axis defined?
-                # Without an X axis, we can't make a plot!
-                if isset("x", subplot["data"]):
-                    # Check to make sure the data is substituted!
-                    # Validate by ensuring that the element is a list!
-                    verify_x_data = True
-                    
-                    for eleID in xrange(0, len(subplot["data"]["x"])):
-                        if (type(subplot["data"]["x"][eleID]) != list):
-                            verify_x_data = False
-                            break
-                    
-                    # If there's no data substituted in, substitute it
-                    # in now.
-                    if not verify_x_data:
-                        plot_dict = subst_data(plot_dict, data_dict)
-                        plot = plot_dict[plot_id]
-                        subplot = plot["plots"][subplotIndex][subplotIDKey]
-                    
-                    # Is the data for the Y axis defined?
-                    if isset("y", subplot["data"]):
-                        # Check to make sure data has been substituted!
-                        # Validate by ensuring that the element is a list!
-                        verify_y_data = True
-                        for eleID in xrange(0, len(subplot["data"]["y"])):
-                            if (type(subplot["data"]["y"][eleID]) != list):
-                                verify_y_data = False
-                                break
-                        
-                        # If there's no data substituted in, substitute
-                        # it in now.
-                        if not verify_y_data:
-                            plot_dict = subst_data(plot_dict, data_dict)
-                            plot = plot_dict[plot_id]
-                            subplot = plot["plots"][subplotIndex][subplotIDKey]
-                        
-                        # Check for post_processing functions
-                        if isset("post_processing", subplot["data"]):
-                            # Check if there is a post_processing
-                            # function for the X data
-                            if isset("x", subplot["data"]["post_processing"]):
-                                # Apply the lambda function to the data!
-                                subplot["data"]["x"][eleID_x] = post_processing_func_x(data_dict, subplot["data"]["x"][eleID_x], subplot["data"]["y"][eleID_y])
-                                
-                                # Apply the lambda function to the data,
-                                # piece by piece! This takes each
-                                # subarray in the X data array and
-                                # applies the function to it.
-                                for eleID_x in xrange(0, len(subplot["data"]["x"])):
-                                    for eleID_y in xrange(0, len(subplot["data"]["y"])):
-                                        if eleID_x < len(subplot["data"]["post_processing"]["x"]):
-                                            # Define the function...
-                                            exec "post_processing_func_x = lambda data,x,y: %s" % subplot["data"]["post_processing"]["x"]
-                                            # ...and run it!
-                                            subplot["data"]["x"][eleID_x] = post_processing_func_x(data_dict, subplot["data"]["x"][eleID_x], subplot["data"]["y"][eleID_y])
-                                        else:
-                                            warn("WARNING: Not enough post_processing functions for the X data.")
-                            
-                            # Check if there is a post_processing
-                            # function for the Y data
-                            if isset("y", subplot["data"]["post_processing"]):
-                                # Warn about mutliple X
-                                if len(subplot["data"]["x"]) > 1:
-                                    warn("WARNING: Substitution of Y data may be unreliable if you use X due to multiple X.")
-                                
-                                # Apply the lambda function to the data,
-                                # piece by piece! This takes each
-                                # subarray in the Y data array and
-                                # applies the function to it.
-                                for eleID_x in xrange(0, len(subplot["data"]["x"])):
-                                    for eleID_y in xrange(0, len(subplot["data"]["y"])):
-                                        if eleID_y < len(subplot["data"]["post_processing"]["y"]):
-                                            # Define the function...
-                                            exec "post_processing_func_y = lambda data,x,y: %s" % subplot["data"]["post_processing"]["y"]
-                                            # ...and run it!
-                                            subplot["data"]["y"][eleID_x] = post_processing_func_y(data_dict, subplot["data"]["x"][eleID_x], subplot["data"]["y"][eleID_y])
-                                        else:
-                                            warn("WARNING: Not enough post_processing functions for the Y data.")
-                        
-                        plot_kwargs = {}
-                        y_id = 0
-                        plotted_graphs = 0
-                        debug("y_id and plotted_graphs RESET to zero")
-                        
-                        # Loop through Y data arrays
-                        for y_dat in subplot["data"]["y"]:
-                            # Validate data length
-                            if len(y_dat) != len(subplot["data"]["x"][0]):
-                                warn("WARNING: Data length for X differs from data length for Y!")
-                                warn("(Data length for X: %i; Data length for Y: %i)" % (len(subplot["data"]["x"][0]), len(y_dat)))
-                            
-                            # Check if the colors attribute was set!
-                            if isset("colors", subplot["data"]):
-                                # If the color is a string, make it into
-                                # a list.
-                                if type(subplot["data"]["colors"]) == str:
-                                    subplot["data"]["colors"] = [ subplot["data"]["colors"] ]
-                                
-                                # Verify that there are enough colors
-                                # for the data.
-                                if y_id < len(subplot["data"]["colors"]):
-                                    # Grab the color, and toss it into
-                                    # the plot kwargs!
-                                    l_color = subplot["data"]["colors"][y_id]
-                                    plot_kwargs["color"] = l_color
-                                else:
-                                    if len(subplot["data"]["colors"]) != len(subplot["data"]["y"]):
-                                        # Emit a warning...
-                                        warn("WARNING: Not enough colors specified in the colors field for the data!")
-                                        warn("Colors specified vs. amount of Y data: %i vs. %i" % (len(subplot["data"]["colors"]), len(subplot["data"]["y"])))
-                            
-                            # Filter out any invalid data (-9999.99)...
-                            # ...but ensure that "iuse" exists first!
-                            if isset("iuse", data_dict):
-                                # Do we need to skip graphing (due to
-                                # all of the values being bad)?
-                                skip_graph = False
-                                
-                                # Loop through prefixes...
-                                for prefix in VALID_PREFIX:
-                                    # Check for negative iuses
-                                    # ...then again, don't! We may have
-                                    # -9999 values anyway.
-                                    
-                                    #if any(iuse < 0 for iuse in data_dict["iuse"][prefix]):
-                                        #debug("Detected -1 in iuse field!")
-                                        
-                                    # Check to see if all of the
-                                    # values are bad
-                                    bad_vals = [ y for y in y_dat if (y <= -9999) ]
-                                    
-                                    # Are they all bad apples?
-                                    if len(bad_vals) == len(y_dat):
-                                        # Take steps to make an
-                                        # empty plot
-                                        axe.xaxis_date()
-                                        y_id += 1
-                                        
-                                        skip_graph = True
-                                        break
-                                    
-                                    # Otherwise, just filter the data!
-                                    replaced_y = [ np.nan if y <= -9999 else y for y in y_dat ]
-                                    y_dat = replaced_y
-                                    #break
-                            
-                            # Check for a labels attribute...
-                            if isset("labels", subplot["data"]):
-                                # If the label is a string, convert it
-                                # into a list!
-                                if type(subplot["data"]["labels"]) == str:
-                                    subplot["data"]["labels"] = [ subplot["data"]["labels"] ]
-                                
-                                # Ensure that we have enough labels
-                                # for the data!
-                                if y_id < len(subplot["data"]["labels"]):
-                                    # Grab the label and perform substitution
-                                    l_label = subplot["data"]["labels"][y_id]
-                                    l_label = l_label.replace("%COLOR%", "")
-                                    l_label = l_label.replace("%ENDCOLOR%", "")
-                                    
-                                    # Zero division detection
-                                    if len(y_dat) == 0:
-                                        # Set AVG and STDDEV to zero.
-                                        AVG = 0
-                                        STDDEV = 0
-                                    else:
-                                        # Filter out NaNs from the Y data...
-                                        y_dat_no_nan = [value for value in y_dat if not math.isnan(value)]
-                                        
-                                        # Then perform statistics!
-                                        AVG = round(sum(y_dat_no_nan) / len(y_dat_no_nan), 3)
-                                        STDDEV = np.std([float(val) for val in y_dat_no_nan])
-                                    
-                                    # Now perform substitution!
-                                    l_label = l_label.replace("%AVERAGE%", str(AVG))
-                                    l_label = l_label.replace("%STDDEV%", str(STDDEV))
-                                    plot_kwargs["label"] = l_label
-                                else:
-                                    if len(subplot["data"]["labels"]) != len(subplot["data"]["y"]):
-                                        # Emit a warning...
-                                        warn("WARNING: Not enough labels specified in the colors field for the data!")
-                                        warn("Labels specified vs. amount of Y data: %i vs. %i" % (len(subplot["data"]["labels"]), len(subplot["data"]["y"])))
-                            else:
-                                # Set the label to nothing
-                                l_label = ""
-                            
-                            # Check if skip_graph was set, and if so,
-                            # reset it and skip
-                            if skip_graph:
-                                skip_graph = False
-                                continue
-                            
-                            # Ensure that all X values are displayed
-                            axe.set_xlim(left = mdates.date2num(subplot["data"]["x"][0][0]), right = mdates.date2num(subplot["data"]["x"][0][-1]))
-                            
-                            # Plot the values!
-                            plt.plot(np.array(subplot["data"]["x"][0]), np.array(y_dat), **plot_kwargs)
-                            
-                            # Increment counters...
-                            y_id += 1
-                            plotted_graphs += 1
-            
-            # Indicate if subplot is empty or not!
-            if plotted_graphs == 0:
-                plt.text(0.5, 0.5, 'Data not available', horizontalalignment='center',
-                        verticalalignment='center', fontsize=24,
-                        transform=axe.transAxes)
-            
-            # Check to see if we have a legend defined...
-            if isset("legend", subplot):
-                legend_kwargs = {}
-                
-                # Make some room for the legend!
-                box = axe.get_position()
-                axe.set_position([box.x0 + box.width * 0.1, box.y0, box.width * 0.9, box.height])
-                
-                # Set up the position to the left side of the plot, and
-                # create the legend!
-                if "title" in subplot["legend"]:
-                    legend_kwargs["title"] = subplot["legend"]["title"]
-                # bbox_to_anchor - the "bounding box" where the legend will anchor to
-                # borderaxespad - the pad between the axes and legend border
-                # handlelength - the length of the legend handles
-                legend = axe.legend(loc='center left', bbox_to_anchor=(-0.3, 0.5), borderaxespad=0., handlelength=0, **legend_kwargs)
+        # Keep track of the output!
+        plot_outputs.append(output_result(plot_output, plot_target))
+    
+    return plot_outputs
+
+def channel_range(channels):
+    """Make a channel range string from a list of channels.
+    
+    Given a list of channels, create a string describing the range of
+    channels, for use in output file paths.
+    
+    Args:
+        channels (list): A sorted list of channels.
+    
+    Returns:
+        str: A string with the channel range, in the format "FIRST-LAST"
+        (or just "CHANNEL" if there is only a single channel).
+    """
+    if len(channels) == 1:
+        return str(channels[0])
+    
+    return "%s-%s" % (str(channels[0]), str(channels[-1]))
+
+def get_group_output(plot, metadata_dict, channels, rel_channels_dict, custom_vars = None, output_ext = None):
+    """Get the output file path for a plot covering multiple channels.
+    
+    Given the plot dictionary for a single plot and a list of channels,
+    determine the output file path for the plot when multiple channels
+    are written to a single file (a multi-page PDF, or a tiled sheet).
+    The %CHANNEL% and %RELCHANNEL% variables are replaced with the 
+    range of channels (e.g. "1-15"). If the output path doesn't contain
+    any channel variables, the channel range is added to the file name
+    to keep each group's output unique.
+    
+    Args:
+        plot (dict): The plot dictionary for a single plot. See 
+            :py:func:`plot()` help for more information on its format.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. See :py:func:`plot()` help for more 
+            information on its format.
+        channels (list): A sorted list of the data channels included in
+            the output.
+        rel_channels_dict (dict): The relative channels dictionary to 
+            map relative channels to actual data channels. See 
+            :py:func:`plot()` help for more information on its format.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in the output path template. By default, this 
+            is set to None.
+        output_ext (str): If specified, replace the output file 
+            extension with this extension (e.g. ".pdf"). By default, 
+            this is set to None, keeping the original extension.
+    
+    Returns:
+        str: A string containing the output file path for the plot.
+    """
+    # Remove the channel, so that channel variables are left alone
+    group_metadata_dict = dict(metadata_dict)
+    group_metadata_dict.pop("channel", None)
+    
+    plot_output = get_plot_output(plot, group_metadata_dict, None, rel_channels_dict, custom_vars)
+    
+    # Reverse the channel map
+    # Original: rel_channel -> actual data channel
+    # Inverted: actual data channel -> rel_channel
+    rel_channels_inv_map = dict(zip(rel_channels_dict.values(), rel_channels_dict.keys()))
+    rel_channels = [ rel_channels_inv_map[channel] for channel in channels ]
+    
+    (plot_output_base, plot_output_ext) = os.path.splitext(plot_output)
+    
+    # If there are no channel variables, add the channel range to keep
+    # the output file path unique.
+    if not (("%CHANNEL%" in plot_output_base) or ("%RELCHANNEL%" in plot_output_base)):
+        plot_output_base += "_ch%CHANNEL%"
+    
+    plot_output_base = plot_output_base.replace("%CHANNEL%", channel_range(channels))
+    plot_output_base = plot_output_base.replace("%RELCHANNEL%", channel_range(rel_channels))
+    
+    if output_ext:
+        plot_output_ext = output_ext
+    
+    return plot_output_base + plot_output_ext
+
+def figure_to_array(fig):
+    """Render a figure into an RGB image array.
+    
+    Given a figure, draw it and return its pixels as a NumPy array.
+    
+    Args:
+        fig (matplotlib.figure.Figure): The figure to render.
+    
+    Returns:
+        numpy.ndarray: A uint8 array with shape (height, width, 3) 
+        containing the RGB pixels of the rendered figure.
+    """
+    fig.canvas.draw()
+    (width, height) = fig.canvas.get_width_height()
+    
+    return np.frombuffer(fig.canvas.tostring_rgb(), dtype = np.uint8).reshape(height, width, 3)
+
+def plot_pdf(plot_dict, channel_data_dict, metadata_dict, rel_channels_dict, custom_vars = None, make_dirs = False, time_axis = None, in_memory = False):
+    """Create multi-page PDF plots covering multiple channels.
+    
+    Create the plots specified in the plot dictionary, writing all of 
+    the channels for each plot into a single multi-page PDF file (one
+    page per channel). The PDF file is opened once, and each page is 
+    appended to it as it is rendered.
+    
+    Output file paths are determined with :py:func:`get_group_output()`
+    - the extension is replaced with ".pdf", and the channel variables
+    are replaced with the channel range.
+    
+    Args:
+        plot_dict (dict): The plot dictionary with information on how 
+            to make the plots. See :py:func:`plot()` help for more 
+            information on its format.
+        channel_data_dict (dict): A dictionary with data channels as 
+            keys, and data dictionaries (from :py:func:`.get_data()`, 
+            in data.py) as values.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. See :py:func:`plot()` help for more 
+            information on its format.
+        rel_channels_dict (dict): The relative channels dictionary to 
+            map relative channels to actual data channels. See 
+            :py:func:`plot()` help for more information on its format.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in title and output path templates. By 
+            default, this is set to None.
+        make_dirs (bool): Boolean indicating whether to automatically
+            create output path directories or not. This defaults to 
+            False to ensure that the path specified is correct.
+        time_axis (numpy.ndarray): A precomputed, read-only numeric 
+            time axis created with :py:func:`make_time_axis()`. By 
+            default, this is set to None.
+        in_memory (bool): Boolean indicating whether to render the 
+            plots into in-memory buffers instead of writing them to 
+            files. See :py:func:`plot()` help for more information. By
+            default, this is set to False.
+    
+    Returns:
+        list: A list of output file paths for the PDF files that were 
+        generated. If in_memory is set, this is instead a list of 
+        tuples, each containing the output file path and the rendered 
+        PDF (as a str of bytes).
+    """
+    # Keep track of the plots that we've written
+    plot_outputs = []
+    
+    channels = sorted(channel_data_dict.keys())
+    
+    # Loop through the plot IDs
+    for plot_id in plot_dict:
+        # Convenience variable
+        plot = plot_dict[plot_id]
+        
+        # Figure out the output path, and check to see if it exists!
+        plot_output = get_group_output(plot, metadata_dict, channels, rel_channels_dict, custom_vars, ".pdf")
+        plot_target = output_target(plot_output, make_dirs, in_memory)
+        
+        # Open the PDF once, and append each channel as a page
+        pdf = PdfPages(plot_target)
+        
+        try:
+            for channel in channels:
+                channel_metadata_dict = dict(metadata_dict)
+                channel_metadata_dict["channel"] = channel
                 
-                # Make the legend title large!
-                # (But only if the legend actually exists - if there's
-                # no data, it goes *poof*...)
-                if legend:
-                    plt.setp(legend.get_title(),fontsize='large')
+                fig = make_figure(plot, channel_data_dict[channel], channel_metadata_dict, rel_channels_dict, custom_vars, time_axis)
+                pdf.savefig(fig, facecolor=fig.get_facecolor(), edgecolor='none')
                 
-                # If there is no data, things tend to be weird... no
-                # legend will be displayed. If that's the case, let's
-                # make a fake legend!
-                if plotted_graphs == 0:
-                    rects = []
-                    labels = []
-                    
-                    # Loop through colors and add a Patch object with 
-                    # said color!
-                    for c in subplot["data"]["colors"]:
-                        rects.append(matplotlib.patches.Patch(fc=c, ec=c))
-                    
-                    # Add the labels back in!
-                    for l in subplot["data"]["labels"]:
-                        labels.append(l.replace("%AVERAGE%", "N/A"))
-                        labels.append(l.replace("%STDDEV%", "N/A"))
-                    
-                    # Finally, add the fake legend to the plot!
-                    ext_leg = plt.legend(rects, labels, loc='center left', bbox_to_anchor=(-0.3, 0.5), borderaxespad=0., handlelength=0, **legend_kwargs)
-            
-            # If there's a subplot title, make one!
-            if isset("title", subplot):
-                axe.set_title(subplot["title"], fontsize='large')
-            
-            # Set the date format!
-            axe.xaxis.set_major_formatter(mdates.DateFormatter('%d%b\n%Y'))
+                # Free it all!
+                plt.close(fig)
+        finally:
+            pdf.close()
+        
+        # Keep track of the output!
+        plot_outputs.append(output_result(plot_output, plot_target))
+    
+    return plot_outputs
+
+def plot_sheet(plot_dict, channel_data_dict, metadata_dict, rel_channels_dict, custom_vars = None, make_dirs = False, time_axis = None, in_memory = False):
+    """Create tiled contact sheet plots covering multiple channels.
+    
+    Create the plots specified in the plot dictionary, tiling all of 
+    the channels for each plot into a single image (a contact sheet).
+    Channels are tiled in a grid, left to right and top to bottom, with
+    the number of columns set to the square root of the number of 
+    channels (rounded up).
+    
+    Output file paths are determined with :py:func:`get_group_output()`
+    - the channel variables are replaced with the channel range.
+    
+    Args:
+        plot_dict (dict): The plot dictionary with information on how 
+            to make the plots. See :py:func:`plot()` help for more 
+            information on its format.
+        channel_data_dict (dict): A dictionary with data channels as 
+            keys, and data dictionaries (from :py:func:`.get_data()`, 
+            in data.py) as values. All of these channels are tiled
+            into a single sheet.
+        metadata_dict (dict): The metadata dictionary containing data
+            source information. See :py:func:`plot()` help for more 
+            information on its format.
+        rel_channels_dict (dict): The relative channels dictionary to 
+            map relative channels to actual data channels. See 
+            :py:func:`plot()` help for more information on its format.
+        custom_vars (dict): Dictionary containing custom variables to
+            be replaced in title and output path templates. By 
+            default, this is set to None.
+        make_dirs (bool): Boolean indicating whether to automatically
+            create output path directories or not. This defaults to 
+            False to ensure that the path specified is correct.
+        time_axis (numpy.ndarray): A precomputed, read-only numeric 
+            time axis created with :py:func:`make_time_axis()`. By 
+            default, this is set to None.
+        in_memory (bool): Boolean indicating whether to render the 
+            plots into in-memory buffers instead of writing them to 
+            files. See :py:func:`plot()` help for more information. By
+            default, this is set to False.
+    
+    Returns:
+        list: A list of output file paths for the sheets that were 
+        generated. If in_memory is set, this is instead a list of 
+        tuples, each containing the output file path and the rendered
+        sheet (as a str of bytes).
+    """
+    # Keep track of the plots that we've written
+    plot_outputs = []
+    
+    channels = sorted(channel_data_dict.keys())
+    
+    # Figure out the grid size
+    sheet_cols = int(math.ceil(math.sqrt(len(channels))))
+    sheet_rows = int(math.ceil(len(channels) / (sheet_cols + 0.0)))
+    
+    # Loop through the plot IDs
+    for plot_id in plot_dict:
+        # Convenience variable
+        plot = plot_dict[plot_id]
         
-        # Change the default gray background to white
-        fig.patch.set_facecolor('white')
+        # Figure out the output path, and check to see if it exists!
+        plot_output = get_group_output(plot, metadata_dict, channels, rel_channels_dict, custom_vars)
+        plot_target = output_target(plot_output, make_dirs, in_memory)
         
-        # Set the output path for the plot
-        if isset("output", plot):
-            # Perform substitution on the plot output path
-            plot_output = plot["output"]
-            plot_output = title_output_replace(plot_output, metadata_dict, data_dict, rel_channels_dict, False, custom_vars)
+        sheet = None
+        
+        for chan_idx in xrange(0, len(channels)):
+            channel_metadata_dict = dict(metadata_dict)
+            channel_metadata_dict["channel"] = channels[chan_idx]
             
-            # Check to see if the path exists!
-            # ...but make sure there IS a path to check for!
-            if os.path.dirname(plot_output).strip() != "":
-                if not os.path.exists(os.path.dirname(plot_output)):
-                    # Check to see if make_dirs is set, and if so,
-                    # create the path directory.
-                    if make_dirs:
-                        info("Output path %s not found, creating directory." % os.path.dirname(plot_output))
-                        mkdir_p(os.path.dirname(plot_output))
-                    else:
-                        critical("Output path %s not found! If you want PyRadmon to create" % os.path.dirname(plot_output))
-                        critical("the directory for you, add --plot-make-dirs or add and set the")
-                        critical("make_dirs in the config section of the config file to true.")
-                        die("Output path %s not found!" % os.path.dirname(plot_output))
-        else:
-            warn("Output path not specified, will save to 'magical_plot_please_specify_output_path_next_time.png'!")
-            plot_output = "magical_plot_please_specify_output_path_next_time.png"
+            fig = make_figure(plot, channel_data_dict[channels[chan_idx]], channel_metadata_dict, rel_channels_dict, custom_vars, time_axis)
+            tile = figure_to_array(fig)
+            
+            # Free it all!
+            plt.close(fig)
+            
+            # Set up the (white) sheet, now that we know the tile size
+            if sheet is None:
+                (tile_height, tile_width) = tile.shape[:2]
+                sheet = np.empty((sheet_rows * tile_height, sheet_cols * tile_width, 3), dtype = np.uint8)
+                sheet.fill(255)
+            
+            # Place the tile
+            tile_y = (chan_idx // sheet_cols) * tile_height
+            tile_x = (chan_idx % sheet_cols) * tile_width
+            sheet[tile_y:tile_y + tile.shape[0], tile_x:tile_x + tile.shape[1]] = tile[:tile_height, :tile_width]
         
-        # Make and save the plot!
-        plt.savefig(plot_output, facecolor=fig.get_facecolor(), edgecolor='none', figsize=((plot_target_size[0] + 0.0) / plot_dpi, (plot_target_size[1] + 0.0) / plot_dpi), dpi = plot_dpi)
+        # Make and save the sheet!
+        plt.imsave(plot_target, sheet, dpi = plot["settings"]["dpi"], format = get_output_format(plot_output))
         
-        # Free it all!
-        plt.close()
+        # Keep track of the output!
+        plot_outputs.append(output_result(plot_output, plot_target))
+    
+    return plot_outputs
 
 if __name__ == "__main__":
     # Use test data
@@ -0,0 +1,647 @@
+#!/usr/bin/env python
+# PyRadmon - Python Radiance Monitoring Tool
+# Copyright 2014 Albert Huang.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#   http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+# 
+# Server Library -
+#   library for serving plot and dump requests from a resident,
+#   warmed up PyRadmon process
+# 
+
+from core import *
+import config
+import incremental
+import enumerate as enum
+from config import gen_channel_list
+from data import get_data, get_data_columns
+from _version import __version__
+import wrapper
+import dummymp
+
+import os
+import stat
+import time
+import copy
+import json
+import errno
+import base64
+import signal
+import socket
+import decimal
+import datetime
+
+import SocketServer
+import BaseHTTPServer
+
+# Default UNIX socket to serve requests on, if no TCP address is given
+SERVE_SOCKET = "pyradmon.sock"
+
+# Configuration settings that requests may override. Anything else
+# (data paths, plot outputs, archives, etc.) may only be set by the
+# server's configuration, since requests aren't trusted.
+REQUEST_CONFIG_VARS = [
+                        "experiment_id",
+                        "data_instrument_sat",
+                        "data_start_date",
+                        "data_end_date",
+                        "data_step",
+                        "data_time_delta",
+                        "data_columns",
+                        "data_channels",
+                        "data_all_channels",
+                        "data_assim_only",
+                        "data_suppress_warnings",
+                      ]
+
+# Default number of seconds to keep enumeration and header results
+# before checking the data files again
+SERVE_CACHE_TTL = 60
+
+# Maximum request body size, in bytes
+SERVE_MAX_REQUEST_SIZE = 1 << 20
+
+# Number of seconds to wait for requests before checking whether the
+# server should stop
+SERVE_POLL_INTERVAL = 1.0
+
+# Server state - caches, shared settings, and counters
+global server_state
+server_state = None
+
+class RequestError(Exception):
+    """Error caused by an invalid request."""
+    pass
+
+class TaskError(Exception):
+    """Error caused by plot tasks that failed while handling a request."""
+    pass
+
+class UnixHTTPServer(SocketServer.UnixStreamServer):
+    """HTTP server listening on a UNIX socket.
+    
+    :py:class:`BaseHTTPServer.HTTPServer` assumes a TCP socket, so
+    this serves the same request handler on a UNIX socket instead.
+    """
+    def get_request(self):
+        # UNIX socket clients don't have an address - give them one
+        # that the request handler can log.
+        (request, client_address) = SocketServer.UnixStreamServer.get_request(self)
+        return (request, ("local", 0))
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """HTTP request handler for PyRadmon requests.
+    
+    Requests are POSTed as JSON to /plot or /dump, and answered with
+    JSON. GET /status returns the server status.
+    """
+    server_version = "PyRadmon/" + __version__
+    
+    def send_json(self, code, response):
+        response_data = json.dumps(response, default = json_default)
+        
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_data)))
+        self.end_headers()
+        self.wfile.write(response_data)
+    
+    def do_GET(self):
+        if self.path.split("?")[0] == "/status":
+            self.send_json(200, get_status())
+        else:
+            self.send_json(404, { "error" : "Unknown path %s!" % self.path })
+    
+    def do_POST(self):
+        request_path = self.path.split("?")[0]
+        
+        if not request_path in REQUEST_HANDLERS:
+            self.send_json(404, { "error" : "Unknown path %s!" % self.path })
+            return
+        
+        try:
+            request_size = int(self.headers.getheader("Content-Length", 0))
+        except ValueError:
+            request_size = -1
+        
+        if (request_size < 0) or (request_size > SERVE_MAX_REQUEST_SIZE):
+            self.send_json(413, { "error" : "Request is too large!" })
+            return
+        
+        try:
+            request = json.loads(self.rfile.read(request_size) or "{}")
+        except ValueError:
+            request = None
+        
+        if type(request) != dict:
+            self.send_json(400, { "error" : "Request must be a JSON object!" })
+            return
+        
+        (code, response) = handle_request(REQUEST_HANDLERS[request_path], request)
+        self.send_json(code, response)
+    
+    def log_message(self, format, *args):
+        debug("Server: %s - %s" % (self.client_address[0], format % args))
+
+def json_default(obj):
+    """Convert an object that JSON doesn't support.
+    
+    Args:
+        obj (object): The object to convert - a
+            :py:class:`decimal.Decimal`, :py:class:`datetime.datetime`,
+            or anything else (which is converted to a string).
+    
+    Returns:
+        object: The converted object.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    return str(obj)
+
+def check_caches():
+    """Expire the enumeration and header caches, if they're too old.
+    
+    Data files may be added or changed while the server is running, so
+    the enumeration and header results are only kept for the cache
+    time to live (TTL).
+    """
+    if time.time() - server_state["cache_time"] > server_state["cache_ttl"]:
+        server_state["enum_cache"] = {}
+        server_state["header_cache"] = {}
+        server_state["cache_time"] = time.time()
+
+def load_config_cached(config_file):
+    """Load a configuration file, using the cached copy if possible.
+    
+    Configuration files are only loaded (and validated) once, and
+    reloaded when they're modified. Only configuration files within
+    the server's configuration directory may be loaded.
+    
+    Args:
+        config_file (str): The path of the configuration file,
+            relative to the server's configuration directory.
+    
+    Returns:
+        tuple: A tuple with a copy of the PyRadmon configuration dict
+        and the plot dict.
+    """
+    if server_state["config_dir"] == None:
+        raise RequestError("Configuration files may not be specified - the server has no configuration directory!")
+    
+    config_dir = os.path.realpath(server_state["config_dir"])
+    config_file = os.path.realpath(os.path.join(config_dir, config_file))
+    
+    if not config_file.startswith(config_dir + os.sep):
+        raise RequestError("Configuration file %s is not in the server's configuration directory!" % config_file)
+    
+    try:
+        config_mtime = os.path.getmtime(config_file)
+    except OSError:
+        raise RequestError("Configuration file %s does not exist!" % config_file)
+    
+    cached = server_state["config_cache"].get(config_file, None)
+    
+    if (cached == None) or (cached[0] != config_mtime):
+        res = config.load(config_file)
+        
+        if res == None:
+            raise RequestError("Could not load configuration file %s!" % config_file)
+        
+        (pyradmon_config, plot_dict) = (res[0] or {}, res[1] or {})
+        validate_request_config(pyradmon_config, plot_dict)
+        
+        cached = (config_mtime, pyradmon_config, plot_dict)
+        server_state["config_cache"][config_file] = cached
+    
+    return (copy.deepcopy(cached[1]), copy.deepcopy(cached[2]))
+
+def validate_request_config(pyradmon_config, plot_dict = None):
+    """Validate the configuration for a request.
+    
+    Invalid settings are the request's fault, so they're reported as a
+    :py:class:`RequestError`, instead of the exception raised by the
+    validation. (The validation logs the error itself.)
+    
+    Args:
+        pyradmon_config (dict): The PyRadmon configuration dict.
+        plot_dict (dict): The plot dict. By default, this is set to
+            None, which skips validating the plots.
+    """
+    try:
+        config.validate_config(pyradmon_config)
+        
+        if plot_dict != None:
+            config.validate_plot(plot_dict)
+    except Exception as e:
+        raise RequestError(str(e))
+
+def get_request_config(request, validate_plots = True):
+    """Build the configuration for a request.
+    
+    Start with the request's configuration file (or the server's),
+    then apply the request's config settings, and select the request's
+    plots, if any. Requests may only override the settings in
+    REQUEST_CONFIG_VARS (without any paths in them), and may only
+    select plots defined in the configuration, since requests aren't
+    trusted. The server's multiprocessing (mp) settings replace any in
+    the configuration. The resulting configuration is validated.
+    
+    Args:
+        request (dict): The request.
+        validate_plots (bool): Boolean indicating whether to validate
+            the plots, too. By default, this is set to True.
+    
+    Returns:
+        tuple: A tuple with the PyRadmon configuration dict and the
+        plot dict for the request.
+    """
+    if "config_file" in request:
+        (pyradmon_config, plot_dict) = load_config_cached(str(request["config_file"]))
+    else:
+        pyradmon_config = copy.deepcopy(server_state["base_config"])
+        plot_dict = copy.deepcopy(server_state["base_plot_dict"])
+    
+    if "config" in request:
+        if type(request["config"]) != dict:
+            raise RequestError("Request config must be a JSON object!")
+        
+        for config_var in request["config"]:
+            if not config_var in REQUEST_CONFIG_VARS:
+                raise RequestError("Config setting '%s' may not be set by requests! Valid settings: %s" % (config_var, ", ".join(REQUEST_CONFIG_VARS)))
+            
+            # Settings end up in data and plot output paths, so make
+            # sure they can't point anywhere else!
+            config_values = request["config"][config_var]
+            if type(config_values) != list:
+                config_values = [ config_values ]
+            
+            for config_value in config_values:
+                if isinstance(config_value, basestring) and (("/" in config_value) or (".." in config_value)):
+                    raise RequestError("Config setting '%s' may not contain paths!" % config_var)
+        
+        pyradmon_config.update(request["config"])
+    
+    if "plots" in request:
+        if (type(request["plots"]) != list) or (len(request["plots"]) == 0):
+            raise RequestError("Request plots must be a list of plot IDs!")
+        
+        for plot_id in request["plots"]:
+            if not plot_id in plot_dict:
+                raise RequestError("Plot '%s' is not defined in the configuration!" % plot_id)
+        
+        plot_dict = dict([ (plot_id, plot_dict[plot_id]) for plot_id in request["plots"] ])
+    
+    wrapper.use_shared_mp_config(pyradmon_config, server_state["mp_config"])
+    
+    # JSON strings are unicode, but the configuration (and its
+    # validation) expects str!
+    pyradmon_config = unicode_to_str(pyradmon_config)
+    plot_dict = unicode_to_str(plot_dict)
+    
+    validate_request_config(pyradmon_config, plot_dict if validate_plots else None)
+    
+    return (pyradmon_config, plot_dict)
+
+def unicode_to_str(obj):
+    """Convert unicode strings (e.g. from JSON) into str, recursively.
+    
+    Args:
+        obj (object): The object to convert.
+    
+    Returns:
+        object: The converted object.
+    """
+    if isinstance(obj, unicode):
+        return obj.encode("utf-8")
+    if isinstance(obj, dict):
+        return dict([ (unicode_to_str(k), unicode_to_str(v)) for (k, v) in obj.items() ])
+    if isinstance(obj, list):
+        return [ unicode_to_str(v) for v in obj ]
+    return obj
+
+def handle_plot(request):
+    """Handle a plot request.
+    
+    Make the plots for the request, using the warm worker pool.
+    
+    Args:
+        request (dict): The request. Besides the configuration (see
+            :py:func:`get_request_config()`), "return" may be set to
+            "paths" (the default) to return the plot output paths, or
+            "bytes" to return the rendered plots (base64 encoded)
+            without writing them to disk.
+    
+    Returns:
+        dict: The response, with the plot outputs in "outputs".
+    """
+    return_type = request.get("return", "paths")
+    
+    if not return_type in [ "paths", "bytes" ]:
+        raise RequestError("Invalid return type '%s'! Must be 'paths' or 'bytes'." % return_type)
+    
+    (pyradmon_config, plot_dict) = get_request_config(request)
+    
+    plot_outputs = wrapper.run_verb("plot", pyradmon_config, plot_dict, server_state["enum_cache"], True, return_type == "bytes")
+    
+    # The worker logs the error itself - just report which tasks failed
+    if len(wrapper.failed_tasks) > 0:
+        raise TaskError("%i plot task(s) failed: %s. See the server log for more information." % (len(wrapper.failed_tasks), ", ".join(wrapper.failed_tasks)))
+    
+    if return_type == "bytes":
+        return { "outputs" : [ { "name" : plot_name, "data" : base64.b64encode(plot_data) } for (plot_name, plot_data) in plot_outputs ] }
+    
+    return { "outputs" : plot_outputs }
+
+def handle_dump(request):
+    """Handle a dump request.
+    
+    Read the data for the request's channels, and return it.
+    
+    Args:
+        request (dict): The request. See :py:func:`get_request_config()`
+            for the configuration. If data_columns is set, only those
+            columns are returned.
+    
+    Returns:
+        dict: The response, with the data (indexed by channel, then by
+        data variable) in "data".
+    """
+    (pyradmon_config, plot_dict) = get_request_config(request, False)
+    
+    enum_opts_dict = config.postprocess_config(pyradmon_config)
+    (en, stats) = enum.enumerate_cached(server_state["enum_cache"], **enum_opts_dict)
+    
+    if stats["criteria_total_files"] == 0:
+        raise RequestError("No data found for specified criteria!")
+    
+    if not "data_path_format" in enum_opts_dict:
+        enum_opts_dict["data_path_format"] = enum.DATA_PATH_FORMAT
+    
+    if "data_columns" in enum_opts_dict:
+        data_var_list = enum_opts_dict["data_columns"]
+    else:
+        # Reading the column headers means reading every file, so
+        # keep them around for as long as the files don't change.
+        input_fp = incremental.input_fingerprint(en)
+        
+        if not input_fp in server_state["header_cache"]:
+            server_state["header_cache"][input_fp] = get_data_columns(en, enum_opts_dict["data_path_format"],
+                ("data_suppress_warnings" in pyradmon_config) and (pyradmon_config["data_suppress_warnings"]))
+        
+        data_var_list = wrapper.dump_columns(server_state["header_cache"][input_fp], enum_opts_dict)
+    
+    all_channels = ("data_all_channels" in pyradmon_config) and (pyradmon_config["data_all_channels"])
+    
+    if all_channels:
+        chans = ""
+    elif "data_channels" in enum_opts_dict:
+        chans = enum_opts_dict["data_channels"]
+    else:
+        raise RequestError("Data channels were not specified!")
+    
+    dat = get_data(en, data_var_list, gen_channel_list(chans), enum_opts_dict["data_path_format"], all_channels,
+        ("data_assim_only" in pyradmon_config) and (pyradmon_config["data_assim_only"]),
+        ("data_suppress_warnings" in pyradmon_config) and (pyradmon_config["data_suppress_warnings"]))
+    
+    # Single channel data isn't indexed by channel - index it anyway!
+    # (See the multichannel/single channel hack in wrapper.py.)
+    if (len(dat) > 0) and (type(dat.keys()[0]) != int):
+        dat = { gen_channel_list(chans)[0] : dat }
+    
+    # Only keep the requested channels - get_data() returns (empty)
+    # data for the other channels in the files, too.
+    if not all_channels:
+        dat = dict([ (channel, dat[channel]) for channel in gen_channel_list(chans) if channel in dat ])
+    
+    return { "data" : dat }
+
+# Request handlers, indexed by request path
+REQUEST_HANDLERS = {
+                     "/plot" : handle_plot,
+                     "/dump" : handle_dump,
+                   }
+
+def handle_request(request_handler, request):
+    """Handle a request, and clean up after it.
+    
+    Args:
+        request_handler (function): The request handler to use.
+        request (dict): The request.
+    
+    Returns:
+        tuple: A tuple with the HTTP status code and the response.
+    """
+    server_state["requests"] += 1
+    request_start = time.time()
+    request_ok = False
+    
+    check_caches()
+    
+    try:
+        response = request_handler(request)
+        (code, request_ok) = (200, True)
+    except RequestError as e:
+        (code, response) = (400, { "error" : str(e) })
+    except TaskError as e:
+        error(str(e))
+        (code, response) = (500, { "error" : str(e) })
+    except SystemExit as e:
+        if e.code in [ None, 0 ]:
+            (code, response, request_ok) = (200, { "outputs" : [] }, True)
+        else:
+            (code, response) = (500, { "error" : "Request failed! See the server log for more information." })
+    except Exception as e:
+        critical("An error occurred while handling a request! Error follows:")
+        critical(traceback.format_exc())
+        (code, response) = (500, { "error" : str(e) })
+    
+    if not request_ok:
+        server_state["failed_requests"] += 1
+        
+        # Stop anything the request left running, and start over with
+        # fresh workers.
+        if server_state["mp_enabled"]:
+            dummymp.killall()
+            dummymp.release_shared()
+            wrapper.start_mp_workers(server_state["mp_config"])
+        dummymp.close_journal()
+    
+    # Drop the task returns and stats, so that they don't pile up
+    dummymp.get_returns().clear()
+    dummymp.get_stats().clear()
+    
+    info("Server: request %i done in %.2fs (HTTP %i)." % (server_state["requests"], time.time() - request_start, code))
+    
+    return (code, response)
+
+def get_status():
+    """Get the server status.
+    
+    Returns:
+        dict: The server status.
+    """
+    return {
+             "version"         : __version__,
+             "uptime"          : time.time() - server_state["start_time"],
+             "requests"        : server_state["requests"],
+             "failed_requests" : server_state["failed_requests"],
+             "pool"            : dummymp.pool_active(),
+             "cached_configs"  : len(server_state["config_cache"]),
+             "cached_headers"  : len(server_state["header_cache"]),
+           }
+
+def make_server(serve_socket = None, serve_address = None):
+    """Make the HTTP server, on a UNIX socket or a TCP address.
+    
+    The UNIX socket is only accessible by the user running the server.
+    A TCP address has no access control at all!
+    
+    Args:
+        serve_socket (str): The path of the UNIX socket to listen on.
+            By default, this is set to None, which listens on the TCP
+            address instead.
+        serve_address (str): The TCP address to listen on, in
+            HOST:PORT format. Only used if no UNIX socket is given.
+    
+    Returns:
+        object: The HTTP server.
+    """
+    if serve_socket:
+        # Remove a stale socket left behind by a server that died -
+        # but not one that's still being served!
+        if os.path.exists(serve_socket) and stat.S_ISSOCK(os.stat(serve_socket).st_mode):
+            test_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                test_sock.connect(serve_socket)
+                die("ERROR: Another server is already listening on %s!" % serve_socket)
+            except socket.error as e:
+                if e.errno != errno.ECONNREFUSED:
+                    raise
+                os.unlink(serve_socket)
+            finally:
+                test_sock.close()
+        
+        # Only the user running the server may connect!
+        old_umask = os.umask(0177)
+        try:
+            return UnixHTTPServer(serve_socket, RequestHandler)
+        finally:
+            os.umask(old_umask)
+    
+    (serve_host, serve_port) = serve_address.rsplit(":", 1)
+    
+    return BaseHTTPServer.HTTPServer((serve_host, int(serve_port)), RequestHandler)
+
+def _stop_server(signum, frame):
+    # Stop the server after the current request. Processes forked by
+    # the server (which inherit this handler) just die, as usual.
+    if os.getpid() != server_state["pid"]:
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+        return
+    
+    server_state["stopping"] = True
+
+def serve(pyradmon_config, plot_dict, serve_socket = None, serve_address = None, cache_ttl = SERVE_CACHE_TTL, config_dir = None):
+    """Serve plot and dump requests until stopped.
+    
+    Keep a warm PyRadmon process - with everything imported, the
+    worker pool forked, and configurations, enumeration results, and
+    data file headers cached - and serve requests over HTTP, on a UNIX
+    socket (by default) or a TCP address. Requests are handled one at a
+    time, with each request's plots made in parallel by the worker
+    pool. The server stops on SIGINT or SIGTERM.
+    
+    Args:
+        pyradmon_config (dict): The server's PyRadmon configuration -
+            used as the default configuration for requests, and for
+            the multiprocessing (mp) settings shared by all requests.
+        plot_dict (dict): The default plot dict for requests.
+        serve_socket (str): The path of the UNIX socket to listen on.
+            By default, this is set to None, which uses SERVE_SOCKET
+            (unless a TCP address is given).
+        serve_address (str): The TCP address to listen on, in
+            HOST:PORT format. By default, this is set to None, which
+            listens on the UNIX socket instead.
+        cache_ttl (int): The number of seconds to keep enumeration and
+            header results for.
+        config_dir (str): The directory that requests may load
+            configuration files from. By default, this is set to None,
+            which doesn't allow requests to load configuration files.
+    """
+    global server_state
+    
+    if (not serve_socket) and (not serve_address):
+        serve_socket = SERVE_SOCKET
+    
+    mp_config = dict([ (config_var, pyradmon_config[config_var]) for config_var in pyradmon_config if config_var.startswith("mp_") ])
+    mp_enabled = not (("mp_disable" in mp_config) and (mp_config["mp_disable"]))
+    
+    # The whole point is to keep warm workers around!
+    if mp_enabled:
+        mp_config["mp_pool"] = True
+    
+    server_state = {
+                     "pid"             : os.getpid(),
+                     "base_config"     : dict([ (k, v) for (k, v) in pyradmon_config.items() if not k.startswith("mp_") ]),
+                     "base_plot_dict"  : plot_dict,
+                     "mp_config"       : mp_config,
+                     "mp_enabled"      : mp_enabled,
+                     "config_cache"    : {},
+                     "enum_cache"      : {},
+                     "header_cache"    : {},
+                     "cache_ttl"       : cache_ttl,
+                     "config_dir"      : config_dir,
+                     "cache_time"      : time.time(),
+                     "start_time"      : time.time(),
+                     "requests"        : 0,
+                     "failed_requests" : 0,
+                     "stopping"        : False,
+                   }
+    
+    httpd = make_server(serve_socket, serve_address)
+    httpd.timeout = SERVE_POLL_INTERVAL
+    
+    if mp_enabled:
+        wrapper.setup_mp(mp_config)
+        wrapper.start_mp_workers(mp_config)
+    else:
+        info("Multiprocessing (mp) is disabled, requests will be processed in order...")
+    
+    signal.signal(signal.SIGINT, _stop_server)
+    signal.signal(signal.SIGTERM, _stop_server)
+    
+    if serve_socket:
+        info(" ** Serving requests on UNIX socket %s..." % serve_socket)
+    else:
+        warn("Serving requests on a TCP address - anyone who can connect can make plots as this user!")
+        info(" ** Serving requests on http://%s/..." % serve_address)
+    
+    try:
+        while not server_state["stopping"]:
+            httpd.handle_request()
+    finally:
+        info(" ** Stopping server...")
+        
+        httpd.server_close()
+        
+        if serve_socket and os.path.exists(serve_socket):
+            os.unlink(serve_socket)
+        
+        if mp_enabled:
+            dummymp.stop_pool()
+            dummymp.disconnect_agents()
+    
+    info("Served %i requests (%i failed)." % (server_state["requests"], server_state["failed_requests"]))
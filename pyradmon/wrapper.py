@@ -28,10 +28,16 @@ import enumerate as enum
 from config import *
 
 from enumerate import enumerate
-from data import get_data, get_data_columns, post_data_columns, rel_channels, SPECIAL_FIELDS
-from plot import plot, subst_data
+from data import get_data, get_data_columns, get_data_channels, post_data_columns, rel_channels, SPECIAL_FIELDS
+from plot import plot, plot_pdf, plot_sheet, plot_spec, make_time_axis, mask_invalid_data, spec_list, fetch_key_from_subplot_dict, get_plot_output, get_group_output, channel_range, title_output_replace, check_output_path
+import incremental
+import bundle
+import archive
+import batch
 import dummymp
 
+import numpy as np
+
 try:
     # Should be embedded
     from prettytable import PrettyTable
@@ -41,39 +47,311 @@ except:
 global old_avail
 old_avail = 0
 
-def report_status(total_completed, total_running, total_procs):
+# Default plot journal file path (for --plot-resume)
+PLOT_JOURNAL_FILE = "pyradmon_journal.json"
+
+# Plot archive state, and the internal process IDs of plot tasks whose
+# rendered plots still need to be added to the archive
+global plot_archive, archive_pids
+plot_archive = None
+archive_pids = []
+
+# Plot tasks (descriptions) that failed in the last run
+global failed_tasks
+failed_tasks = []
+
+# Number of slowest plot tasks to show at the end of the run
+SLOW_TASKS_SHOWN = 10
+
+def archive_returns():
+    global plot_archive, archive_pids
+    plot_rets = dummymp.get_returns()
+    
+    # Move any rendered plots into the archive, and drop them from the
+    # returns so that they don't pile up in memory
+    for int_pid in list(archive_pids):
+        if int_pid in plot_rets:
+            for (member_name, member_data) in (plot_rets.pop(int_pid) or []):
+                archive.add_to_archive(plot_archive, member_name, member_data)
+            archive_pids.remove(int_pid)
+
+def share_data(data_dict):
+    # Move the data series for a channel into shared memory, so that
+    # only small descriptors are passed to each plot task. Non-numeric
+    # fields (timestamps, frequency) are passed as-is.
+    shared_dict = {}
+    
+    for data_var in data_dict:
+        if data_var == "iuse":
+            shared_dict["iuse"] = {}
+            for prefix in data_dict["iuse"]:
+                shared_dict["iuse"][prefix] = dummymp.share_array(np.asarray(data_dict["iuse"][prefix], dtype = int))
+        elif (data_var in SPECIAL_FIELDS) or (type(data_dict[data_var]) != list):
+            shared_dict[data_var] = data_dict[data_var]
+        else:
+            try:
+                shared_dict[data_var] = dummymp.share_array(np.asarray(data_dict[data_var], dtype = float))
+            except (TypeError, ValueError):
+                shared_dict[data_var] = data_dict[data_var]
+    
+    return shared_dict
+
+def plot_cost(plot_dict, channel_data_dict, channels, valid_counts):
+    # Estimate the relative cost of making the plots for the given
+    # channels for scheduling - each subplot costs its number of time
+    # steps (for the axes), plus the number of valid points in each Y
+    # series it draws. Channels with little (or no) valid data are
+    # cheap to plot! The data must be the original data (indexed by
+    # channel), not the shared memory copy. Valid point counts are 
+    # cached in valid_counts, so that each series is only counted once.
+    cost = 0
+    for channel in channels:
+        channel_dict = channel_data_dict[channel]
+        
+        if not "timestamp" in channel_dict:
+            continue
+        
+        for plot_id in plot_dict:
+            for subplot_dict in plot_dict[plot_id]["plots"]:
+                subplot = subplot_dict[fetch_key_from_subplot_dict(subplot_dict)]
+                cost += len(channel_dict["timestamp"])
+                
+                if isset("data", subplot) and isset("y", subplot["data"]):
+                    for y_var in spec_list(subplot["data"]["y"]):
+                        if (type(y_var) == str) and (y_var in channel_dict):
+                            if not (channel, y_var) in valid_counts:
+                                valid_counts[(channel, y_var)] = mask_invalid_data(channel_dict[y_var]).count()
+                            cost += valid_counts[(channel, y_var)]
+    
+    return cost
+
+def split_channel_groups(channel_list, num_groups, group_multiple = 1):
+    # Split the channels into (up to) num_groups groups of consecutive
+    # channels for pipelined plotting. Each group is a multiple of
+    # group_multiple channels, so that plot sheets aren't split across
+    # groups, and has at least two channels, so that get_data() 
+    # returns its data indexed by channel.
+    group_size = max((len(channel_list) + num_groups - 1) // num_groups, 2)
+    group_size = ((group_size + group_multiple - 1) // group_multiple) * group_multiple
+    
+    channel_groups = [ channel_list[i:i + group_size] for i in xrange(0, len(channel_list), group_size) ]
+    
+    # Don't leave a channel on its own at the end!
+    if (len(channel_groups) > 1) and (len(channel_groups[-1]) < 2):
+        tail_group = channel_groups.pop()
+        channel_groups[-1] += tail_group
+    
+    return channel_groups
+
+def read_channel_groups(en, data_var_list, channel_groups, data_path_format, data_assim_only, data_suppress_warnings):
+    # Read the data for each channel group in parallel, and yield each
+    # group's data (indexed by channel) as soon as it has been read.
+    # Plot tasks started in the meantime keep running while we wait.
+    read_executor = dummymp.DummyMPExecutor()
+    read_futures = {}
+    
+    for channel_group in channel_groups:
+        # Read the data before plotting anything else - the plots are
+        # waiting on it!
+        read_future = read_executor.submit(get_data, en, data_var_list, channel_group, data_path_format, False, data_assim_only, data_suppress_warnings, dummymp_cost = float("inf"))
+        read_futures[read_future] = channel_group
+    
+    for read_future in read_executor.as_completed(read_futures.keys()):
+        try:
+            group_data = read_future.result()
+        except:
+            critical("An error occurred while reading data for channels %s! Error follows:" % channel_range(read_futures[read_future]))
+            critical(traceback.format_exc())
+            critical("Exiting.")
+            sys.exit(1)
+        
+        debug("Read data for channels %s." % channel_range(read_futures[read_future]))
+        
+        # Only keep the channels in the group - get_data() returns
+        # (empty) data for the other channels in the files, too.
+        yield dict([ (channel, group_data[channel]) for channel in read_futures[read_future] if channel in group_data ])
+    
+    read_executor.shutdown()
+
+def report_status(total_completed, total_running, total_procs, task_stats = None):
     global old_avail
     info("[%.2f%%] %i/%i completed (%i running)" % ((total_completed / (total_procs + 0.0)) * 100, total_completed, total_procs, total_running))
+    if task_stats and (task_stats["wall"] != None):
+        debug("Task took %.2fs (%.2fs user, %.2fs sys), after waiting %.2fs." % (task_stats["wall"], task_stats["user"] or 0.0, task_stats["sys"] or 0.0, task_stats["queued"]))
     if old_avail != dummymp.config.CPU_AVAIL:
-        info("CPU availability changed to %i/%i CPUs!" % (dummymp.config.CPU_AVAIL, dummymp.getTotalCPUs()))
+        info("CPU availability changed to %i/%i CPUs!" % (dummymp.config.CPU_AVAIL, dummymp.getCPULimit()))
         old_avail = dummymp.config.CPU_AVAIL
+    if plot_archive:
+        archive_returns()
 
-def main():
-    parser = args.make_argparser()
-    parse = parser.parse_args()
-    (pyradmon_config, plot_dict, parse_data) = args.parse_to_config(parse)
+def report_slow_tasks(task_descs):
+    # Show a table of the slowest plot tasks, along with their queue
+    # wait and resource usage, to help spot pathological channels.
+    task_stats = dummymp.get_stats()
     
-    if not pyradmon_config:
-        sys.exit(1)
+    timed_pids = [ int_pid for int_pid in task_descs if (int_pid in task_stats) and (task_stats[int_pid]["wall"] != None) ]
+    timed_pids.sort(key = lambda int_pid: task_stats[int_pid]["wall"], reverse = True)
     
-    ###################################################################
-    ## VERB ACTION CODE
-    ###################################################################
+    if len(timed_pids) == 0:
+        return
     
-    ## Config verb + Config args, part 2
-    if parse.verb == "config":
-        if isset_obj("config_display", parse) and parse.config_display:
-            # Print configuration
-            config_printer.display(pyradmon_config, plot_dict)
-        if isset_obj("config_save", parse):
-            # Print configuration
-            config.save(parse.config_save, pyradmon_config, plot_dict)
-        # That's it! Exit...
-        sys.exit(0)
+    def fmt_stat(value, scale = 1.0):
+        if value == None:
+            return "-"
+        return "%.2f" % (value / scale)
+    
+    table = PrettyTable([ "Task", "Wall (s)", "Queued (s)", "User (s)", "Sys (s)", "Peak RSS (MB)" ])
+    table.align["Task"] = "l"
+    table.padding_width = 1
+    
+    for int_pid in timed_pids[:SLOW_TASKS_SHOWN]:
+        stats = task_stats[int_pid]
+        table.add_row([ task_descs[int_pid], fmt_stat(stats["wall"]), fmt_stat(stats["queued"]),
+            fmt_stat(stats["user"]), fmt_stat(stats["sys"]), fmt_stat(stats["max_rss"], 1024.0 * 1024.0) ])
+    
+    info(" ** Slowest plot tasks:")
+    for table_line in table.get_string().splitlines():
+        info(table_line)
+
+def dump_columns(data_columns, enum_opts_dict):
+    # Build the list of data variables to dump from the data columns
+    # in the data files (from get_data_columns()), with each data type
+    # prefix.
+    columns = post_data_columns(data_columns)
+    new_columns = []
+    
+    if "data_type" in enum_opts_dict:
+        for prefix in enum_opts_dict['data_type'].split("|"):
+            for column in columns:
+                if column in SPECIAL_FIELDS:
+                    if column not in new_columns:
+                        new_columns.append(column)
+                else:
+                    new_columns.append(prefix + "|" + column)
+        columns = new_columns
+    else:
+        warn("No data type specified - will use ges by default.")
+        for column in columns:
+            if column in SPECIAL_FIELDS:
+                new_columns.append(column)
+            else:
+                new_columns.append("ges|" + column)
+    
+    return columns
+
+def use_shared_mp_config(job_config, mp_config):
+    # Replace the multiprocessing (mp) settings in a batch job's (or
+    # server request's) configuration with the shared mp settings.
+    for config_var in job_config.keys():
+        if config_var.startswith("mp_"):
+            job_config.pop(config_var)
+    
+    job_config.update(mp_config)
+
+def setup_mp(pyradmon_config):
+    # Apply the multiprocessing (mp) settings to DummyMP.
+    
+    # Disable deepcopy - we'll handle it ourselves!
+    dummymp.set_args_deepcopy(False)
+    if "mp_priority_mode" in pyradmon_config:
+        if pyradmon_config["mp_priority_mode"] == "GENEROUS":
+            info("Multiprocessing (mp) priority mode set to GENEROUS.")
+            dummymp.set_priority_mode(dummymp.DUMMYMP_GENEROUS)
+        elif pyradmon_config["mp_priority_mode"] == "NORMAL":
+            info("Multiprocessing (mp) priority mode set to NORMAL.")
+            dummymp.set_priority_mode(dummymp.DUMMYMP_NORMAL)
+        elif pyradmon_config["mp_priority_mode"] == "AGGRESSIVE":
+            info("Multiprocessing (mp) priority mode set to AGGRESSIVE.")
+            dummymp.set_priority_mode(dummymp.DUMMYMP_AGGRESSIVE)
+        elif pyradmon_config["mp_priority_mode"] == "EXTREME":
+            info("Multiprocessing (mp) priority mode set to EXTREME.")
+            dummymp.set_priority_mode(dummymp.DUMMYMP_EXTREME)
+        elif pyradmon_config["mp_priority_mode"] == "NUCLEAR":
+            info("Multiprocessing (mp) priority mode set to NUCLEAR.")
+            dummymp.set_priority_mode(dummymp.DUMMYMP_NUCLEAR)
+        else:
+            die("ERROR: Invalid multiprocesing (mp) priority mode detected - this may be a bug!")
+    
+    if "mp_cpu_source" in pyradmon_config:
+        if pyradmon_config["mp_cpu_source"] == "PROCESS":
+            info("Multiprocessing (mp) CPU source set to PROCESS.")
+            dummymp.set_cpu_source(dummymp.DUMMYMP_CPU_PROCESS)
+        elif pyradmon_config["mp_cpu_source"] == "SYSTEM":
+            info("Multiprocessing (mp) CPU source set to SYSTEM.")
+            dummymp.set_cpu_source(dummymp.DUMMYMP_CPU_SYSTEM)
+        else:
+            die("ERROR: Invalid multiprocesing (mp) CPU source detected - this may be a bug!")
+    
+    if "mp_cpu_limit" in pyradmon_config:
+        info("Multiprocessing (mp) maximum CPU limit set to %i CPUs." % pyradmon_config["mp_cpu_limit"])
+        if pyradmon_config["mp_cpu_limit"] == 1:
+            info("(We noticed that you limited it to 1 CPU... we recommend")
+            info("using --mp-disable or 'mp_disable: true' instead.)")
+        dummymp.set_max_processes(pyradmon_config["mp_cpu_limit"])
+    
+    if "mp_memory_limit" in pyradmon_config:
+        info("Multiprocessing (mp) memory limit set to %i MB." % (pyradmon_config["mp_memory_limit"] >> 20))
+        dummymp.set_memory_budget(pyradmon_config["mp_memory_limit"])
+    
+    if ("mp_shared_memory" in pyradmon_config) and (pyradmon_config["mp_shared_memory"]):
+        if dummymp.shared_available():
+            info("Multiprocessing (mp) shared memory enabled, plot data will be shared with workers.")
+        else:
+            warn("Multiprocessing (mp) shared memory is not available, plot data will be copied to workers.")
+    
+    if ("mp_pool" in pyradmon_config) and (pyradmon_config["mp_pool"]):
+        info("Multiprocessing (mp) worker pool enabled, plots will be made by long-lived workers.")
+    
+    if "mp_batch_max" in pyradmon_config:
+        info("Multiprocessing (mp) batching enabled, up to %i plot tasks will be run per process." % pyradmon_config["mp_batch_max"])
+        dummymp.set_batch_size(pyradmon_config["mp_batch_max"])
+    
+    if "mp_node_slots" in pyradmon_config:
+        info("Multiprocessing (mp) node slots set to %i, shared with other instances on this node." % pyradmon_config["mp_node_slots"])
+        dummymp.set_node_slots(pyradmon_config["mp_node_slots"])
+    
+    if "mp_agents" in pyradmon_config:
+        info("Multiprocessing (mp) remote agents enabled, plots will be made on %i agents." % len(pyradmon_config["mp_agents"]))
+
+def start_mp_workers(pyradmon_config):
+    # Start the worker pool, if enabled. The workers are forked
+    # here, after all of the heavy imports are done, so that each
+    # task doesn't have to do them again.
+    if not (("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"])) and \
+        ("mp_pool" in pyradmon_config) and (pyradmon_config["mp_pool"]):
+        dummymp.start_pool()
+    
+    # Connect to the remote agents, if any. (If none can be 
+    # connected to, plots are made locally instead.)
+    if not (("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"])) and \
+        ("mp_agents" in pyradmon_config):
+        try:
+            num_agents = dummymp.connect_agents(pyradmon_config["mp_agents"])
+        except ValueError, e:
+            die("ERROR: %s" % str(e))
+        
+        if num_agents == 0:
+            warn("Could not connect to any multiprocessing (mp) remote agents, plots will be made locally.")
+
+def run_verb(verb, pyradmon_config, plot_dict, enum_cache = None, shared_mp = False, in_memory = False):
+    # Run the list, dump, or plot verb with the given configuration.
+    # For batches (and the server), enumeration results are reused 
+    # through enum_cache, and the multiprocessing (mp) settings, worker
+    # pool, and remote agents are set up once for all jobs (shared_mp).
+    # For the plot verb, the plot outputs are returned - or, with 
+    # in_memory, the rendered plots, as (name, data) pairs. Plot tasks
+    # that failed are listed in failed_tasks afterwards.
+    global plot_archive, archive_pids, failed_tasks
+    
+    # Start over with no plot archive (for batches, the previous job
+    # may have had one), and no failed tasks
+    plot_archive = None
+    archive_pids = []
+    failed_tasks = []
     
     # Everything else gets pretty involved!
-    if parse.verb == "plot" or parse.verb == "dump" or parse.verb == "list":
-        if parse.verb == "dump" or parse.verb == "list":
+    if verb == "plot" or verb == "dump" or verb == "list":
+        if verb == "dump" or verb == "list":
             enum_opts_dict = config.postprocess_config(pyradmon_config)
             if "data_columns" in enum_opts_dict:
                 data_var_list = enum_opts_dict["data_columns"]
@@ -94,7 +372,10 @@ def main():
             make_dirs = False
         
         info(" ** Enumerating data files...")
-        (en, stats) = enumerate(**enum_opts_dict)
+        if enum_cache != None:
+            (en, stats) = enum.enumerate_cached(enum_cache, **enum_opts_dict)
+        else:
+            (en, stats) = enumerate(**enum_opts_dict)
         
         if not "data_path_format" in enum_opts_dict:
             warn("No data_path_format specified in configuration. Will use preset default instead.")
@@ -106,7 +387,7 @@ def main():
             sys.exit(1)
         
     #pprinter(en)
-    if parse.verb == "plot" or parse.verb == "dump":
+    if verb == "plot" or verb == "dump":
         if "data_all_channels" in pyradmon_config and pyradmon_config["data_all_channels"]:
             info(" ** Fetching data for ALL channels...")
             all_channels = True
@@ -133,38 +414,52 @@ def main():
         else:
             data_suppress_warnings = False
         
-        if parse.verb == "dump":
-            tmp_columns = get_data_columns(en)
-            columns = post_data_columns(tmp_columns)
-            new_columns = []
-            
-            if "data_type" in enum_opts_dict:
-                for prefix in enum_opts_dict['data_type'].split("|"):
-                    for column in columns:
-                        if column in SPECIAL_FIELDS:
-                            if column not in new_columns:
-                                new_columns.append(column)
-                        else:
-                            new_columns.append(prefix + "|" + column)
-                columns = new_columns
-            else:
-                warn("No data type specified - will use ges by default.")
-                for column in columns:
-                    if column in SPECIAL_FIELDS:
-                        new_columns.append(column)
-                    else:
-                        new_columns.append("ges|" + column)
-            
-            data_var_list = columns
+        # Check if we're pipelining - reading the data one channel
+        # group at a time, and plotting each group as soon as it's
+        # read. Data bundles and PDFs need all of the data at once, so
+        # they can't be pipelined.
+        plot_pipeline = (verb == "plot") and ("plot_pipeline" in pyradmon_config)
+        
+        if plot_pipeline:
+            if ("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"]):
+                warn("Pipelined plotting requires multiprocessing (mp), so it will be disabled.")
+                plot_pipeline = False
+            elif isset("plot_bundle", pyradmon_config):
+                warn("Pipelined plotting is not supported when writing a data bundle, so it will be disabled.")
+                plot_pipeline = False
+            elif ("plot_layout" in pyradmon_config) and (pyradmon_config["plot_layout"] == "pdf"):
+                warn("Pipelined plotting is not supported with the pdf plot layout, so it will be disabled.")
+                plot_pipeline = False
+        
+        if verb == "dump":
+            data_var_list = dump_columns(get_data_columns(en, enum_opts_dict["data_path_format"], data_suppress_warnings), enum_opts_dict)
             dat = get_data(en, data_var_list, gen_channel_list(chans), enum_opts_dict["data_path_format"], all_channels, data_assim_only, data_suppress_warnings)
         else:
-            dat = get_data(en, data_var_list, gen_channel_list(chans), enum_opts_dict["data_path_format"], all_channels, data_assim_only, data_suppress_warnings)
+            # If we're pipelining, just find the channels to read for 
+            # now - the data is read later, alongside the plots.
+            if plot_pipeline:
+                if all_channels:
+                    pipeline_channels = get_data_channels(en)
+                else:
+                    pipeline_channels = sorted(set(gen_channel_list(chans)))
+                
+                if len(pipeline_channels) < 2:
+                    info("Only one channel to plot, pipelined plotting will be disabled.")
+                    plot_pipeline = False
+            
+            if plot_pipeline:
+                dat = None
+            else:
+                dat = get_data(en, data_var_list, gen_channel_list(chans), enum_opts_dict["data_path_format"], all_channels, data_assim_only, data_suppress_warnings)
         
         # If we're reading all channels, set the channel list.
         if all_channels:
-            chans = [str(k) for k in dat.keys()]
+            if plot_pipeline:
+                chans = [str(k) for k in pipeline_channels]
+            else:
+                chans = [str(k) for k in dat.keys()]
     
-    if parse.verb == "list":
+    if verb == "list":
         #pprinter(stats)
         start_date_str = "%s%s%s_%sz" % (str(stats["start_year"]).zfill(4), \
                                         str(stats["start_month"]).zfill(2), \
@@ -213,7 +508,7 @@ def main():
         
         sys.exit(0)
     
-    if parse.verb == "dump":
+    if verb == "dump":
         #pprinter(dat)
         
         # DIRTY HACK ALERT! DIRTY HACK ALERT!
@@ -304,73 +599,331 @@ def main():
             
         sys.exit(0)
     
-    if parse.verb == "plot":
+    if verb == "plot":
         if ("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"]):
             info("Multiprocessing (mp) is disabled, processing in order...")
+        elif not shared_mp:
+            setup_mp(pyradmon_config)
+        
+        # Make relative channel mapping!
+        rel_channels_dict = rel_channels(list(gen_channel_list(chans)))
+        
+        # Parse the plot specification once! The specification is
+        # shared (read-only) across all channels - each channel only
+        # binds its own data and metadata.
+        plot_dict_spec = plot_spec(plot_dict)
+        
+        # Map each channel to its data! If we're pipelining, nothing
+        # has been read yet - the data is read (and plotted) one 
+        # channel group at a time, below.
+        # (HACK - see above for multichannel/single channel hack)
+        if plot_pipeline:
+            channel_data_dict = None
+        elif type(dat.keys()[0]) == int:
+            channel_data_dict = dat
+        else:
+            channel_data_dict = { gen_channel_list(chans)[0] : dat }
+        
+        # Write the data bundle, if requested!
+        if isset("plot_bundle", pyradmon_config):
+            bundle_output = title_output_replace(pyradmon_config["plot_bundle"], enum_opts_dict, None, rel_channels_dict, False, custom_vars)
+            
+            info(" ** Writing data bundle to %s..." % bundle_output)
+            bundle.write_bundle(bundle.make_bundle(plot_dict_spec, channel_data_dict, enum_opts_dict, rel_channels_dict, custom_vars), bundle_output, make_dirs)
+            
+            if ("plot_bundle_only" in pyradmon_config) and (pyradmon_config["plot_bundle_only"]):
+                info("Data bundle only mode enabled, skipping plot generation.")
+                info("Done!")
+                sys.exit(0)
+        
+        # Open the plot archive, if requested! Plots are rendered into
+        # memory and written into the archive, instead of to individual
+        # files.
+        if isset("plot_archive", pyradmon_config):
+            archive_output = title_output_replace(pyradmon_config["plot_archive"], enum_opts_dict, None, rel_channels_dict, False, custom_vars)
+            
+            info(" ** Writing plots to archive %s..." % archive_output)
+            plot_archive = archive.open_archive(archive_output, make_dirs, archive.get_output_root(plot_dict_spec))
+            
+            if ("plot_incremental" in pyradmon_config) and (pyradmon_config["plot_incremental"]):
+                warn("Incremental plotting is not supported when writing plots to an archive.")
+                warn("All plots will be regenerated.")
+                pyradmon_config["plot_incremental"] = False
+        
+        plot_in_memory = (plot_archive != None) or in_memory
+        
+        if in_memory and ("plot_incremental" in pyradmon_config) and (pyradmon_config["plot_incremental"]):
+            warn("Incremental plotting is not supported when returning rendered plots.")
+            warn("All plots will be regenerated.")
+            pyradmon_config["plot_incremental"] = False
+        
+        # Check if we're plotting incrementally. If so, load our state
+        # and fingerprint our input files!
+        if ("plot_incremental" in pyradmon_config) and (pyradmon_config["plot_incremental"]):
+            plot_incremental = True
+            
+            if "plot_incremental_state" in pyradmon_config:
+                incremental_state_file = pyradmon_config["plot_incremental_state"]
+            else:
+                incremental_state_file = incremental.INCREMENTAL_STATE_FILE
+            
+            info(" ** Incremental plotting enabled, using state file %s..." % incremental_state_file)
+            
+            incremental_state = incremental.load_state(incremental_state_file)
+            input_fp = incremental.input_fingerprint(en)
+            
+            # Fingerprints of plots that are still running, indexed by
+            # internal process ID
+            pending_fingerprints = {}
         else:
-            # Disable deepcopy - we'll handle it ourselves!
-            dummymp.set_args_deepcopy(False)
-            if "mp_priority_mode" in pyradmon_config:
-                if pyradmon_config["mp_priority_mode"] == "GENEROUS":
-                    info("Multiprocessing (mp) priority mode set to GENEROUS.")
-                    dummymp.set_priority_mode(dummymp.DUMMYMP_GENEROUS)
-                elif pyradmon_config["mp_priority_mode"] == "NORMAL":
-                    info("Multiprocessing (mp) priority mode set to NORMAL.")
-                    dummymp.set_priority_mode(dummymp.DUMMYMP_NORMAL)
-                elif pyradmon_config["mp_priority_mode"] == "AGGRESSIVE":
-                    info("Multiprocessing (mp) priority mode set to AGGRESSIVE.")
-                    dummymp.set_priority_mode(dummymp.DUMMYMP_AGGRESSIVE)
-                elif pyradmon_config["mp_priority_mode"] == "EXTREME":
-                    info("Multiprocessing (mp) priority mode set to EXTREME.")
-                    dummymp.set_priority_mode(dummymp.DUMMYMP_EXTREME)
-                elif pyradmon_config["mp_priority_mode"] == "NUCLEAR":
-                    info("Multiprocessing (mp) priority mode set to NUCLEAR.")
-                    dummymp.set_priority_mode(dummymp.DUMMYMP_NUCLEAR)
+            plot_incremental = False
+        
+        # Open the plot journal, if requested! Each completed plot task
+        # is recorded in the journal, so that a failed run can be 
+        # resumed without redoing everything.
+        plot_resume = ("plot_resume" in pyradmon_config) and (pyradmon_config["plot_resume"])
+        plot_journal = False
+        
+        if isset("plot_journal", pyradmon_config) or plot_resume:
+            if plot_in_memory:
+                warn("Plot journals are not supported when rendering plots into memory (for an archive, or to return them).")
+                warn("All plots will be regenerated.")
+                plot_resume = False
+            else:
+                if isset("plot_journal", pyradmon_config):
+                    journal_file = title_output_replace(pyradmon_config["plot_journal"], enum_opts_dict, None, rel_channels_dict, False, custom_vars)
                 else:
-                    die("ERROR: Invalid multiprocesing (mp) priority mode detected - this may be a bug!")
+                    journal_file = PLOT_JOURNAL_FILE
                 
-            if "mp_cpu_limit" in pyradmon_config:
-                info("Multiprocessing (mp) maximum CPU limit set to %i CPUs." % pyradmon_config["mp_cpu_limit"])
-                if pyradmon_config["mp_cpu_limit"] == 1:
-                    info("(We noticed that you limited it to 1 CPU... we recommend")
-                    info("using --mp-disable or 'mp_disable: true' instead.)")
-                dummymp.set_max_processes(pyradmon_config["mp_cpu_limit"])
+                check_output_path(journal_file, make_dirs)
+                
+                num_journaled = dummymp.open_journal(journal_file, plot_resume)
+                plot_journal = True
+                
+                if plot_resume:
+                    info(" ** Resuming from journal %s (%i plot tasks already done)..." % (journal_file, num_journaled))
+                else:
+                    info(" ** Recording completed plot tasks in journal %s..." % journal_file)
         
-        # Make relative channel mapping!
-        rel_channels_dict = rel_channels(list(gen_channel_list(chans)))
+        # Check if we're moving the plot data into shared memory! Only
+        # the plot tasks use the shared data - everything else uses the
+        # original data.
+        plot_shared = (not (("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"]))) and \
+            ("mp_shared_memory" in pyradmon_config) and (pyradmon_config["mp_shared_memory"])
+        
+        # Figure out the plot layout!
+        if "plot_layout" in pyradmon_config:
+            plot_layout = pyradmon_config["plot_layout"]
+        else:
+            plot_layout = "single"
+        
+        if "plot_sheet_channels" in pyradmon_config:
+            sheet_channels = pyradmon_config["plot_sheet_channels"]
+        else:
+            sheet_channels = 4
+        
+        # Start the worker pool and connect to the remote agents, if
+        # enabled. (For batches, this is only done once, for all jobs.)
+        if not shared_mp:
+            start_mp_workers(pyradmon_config)
+        
+        # Plot task descriptions, indexed by internal process ID, for
+        # reporting the slowest tasks
+        task_descs = {}
         
-        for channel in gen_channel_list(chans):
-            info(" ** Plotting data for channel %i..." % channel)
+        # Plot outputs (or rendered plots) to return
+        plot_results = []
+        
+        # The time axis is made from the first channel data we get
+        time_axis = None
+        time_axis_timestamps = None
+        time_axis_ready = False
+        
+        # Valid point counts for each channel's data series, for
+        # estimating plot costs
+        valid_counts = {}
+        
+        # Plot the data, one channel group at a time. Without 
+        # pipelining, every channel has already been read, so there's
+        # only one group. With pipelining, the channel groups are read
+        # in parallel, and each group is plotted as soon as it's read,
+        # while the other groups are still being read.
+        if plot_pipeline:
+            # Don't split sheets across channel groups!
+            if plot_layout == "sheet":
+                read_groups = split_channel_groups(pipeline_channels, pyradmon_config["plot_pipeline"], sheet_channels)
+            else:
+                read_groups = split_channel_groups(pipeline_channels, pyradmon_config["plot_pipeline"])
             
-            enum_opts_dict["channel"] = channel
+            # Make sure that every channel is read exactly once!
+            if sorted(sum(read_groups, [])) != sorted(pipeline_channels):
+                critical("Channel groups %s don't match the channels to plot (%s)!" % (", ".join([ channel_range(g) for g in read_groups ]), channel_range(pipeline_channels)))
+                critical("Exiting.")
+                sys.exit(1)
             
-            # HACK - see above for multichannel/single channel hack
-            if type(dat.keys()[0]) == int:
-                # Multichanel mode
-                try:
-                    plot_dict_subs = subst_data(plot_dict, dat[channel])
-                    if ("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"]):
-                        plot(plot_dict_subs, dat[channel], enum_opts_dict, rel_channels_dict, custom_vars, make_dirs)
-                    else:
-                        dummymp.run(plot, copy.deepcopy(plot_dict_subs), dat[channel], copy.deepcopy(enum_opts_dict), rel_channels_dict, custom_vars, make_dirs)
-                        dummymp.process_process()
-                    del plot_dict_subs
-                except:
-                    critical("An error occurred! Error follows:")
-                    critical(traceback.format_exc())
-                    #print "Dumping data_dict:"
-                    #pprint.pprint(dat)
-                    critical("Exiting.")
-                    sys.exit(1)
+            info(" ** Pipelined plotting enabled, reading data in %i channel groups..." % len(read_groups))
+            channel_data_groups = read_channel_groups(en, data_var_list, read_groups, enum_opts_dict["data_path_format"], data_assim_only, data_suppress_warnings)
+        else:
+            channel_data_groups = [ channel_data_dict ]
+        
+        for channel_data_dict in channel_data_groups:
+            # Skip channel groups without any data (e.g. if none of
+            # the channels were assimilated)
+            if len(channel_data_dict) == 0:
+                continue
+            
+            # Precompute the time axis! Channels (almost always) share
+            # the same timestamps, so we only need to do this once.
+            if not time_axis_ready:
+                timestamp_dat = channel_data_dict.values()[0]
+                
+                if isset("timestamp", timestamp_dat) and (len(timestamp_dat["timestamp"]) > 0):
+                    time_axis_timestamps = timestamp_dat["timestamp"]
+                    time_axis = make_time_axis(time_axis_timestamps)
+                    
+                    if plot_shared:
+                        time_axis = dummymp.share_array(time_axis)
+                
+                time_axis_ready = True
+            
+            # Move the plot data into shared memory, if requested!
+            if plot_shared:
+                plot_data_dict = {}
+                for channel in channel_data_dict:
+                    plot_data_dict[channel] = share_data(channel_data_dict[channel])
+            else:
+                plot_data_dict = channel_data_dict
+            
+            # Build the list of plotting tasks. Each task is a list of:
+            #   [ description, plot function, plot dictionary, data,
+            #     metadata, fingerprint metadata, plot outputs, channels ]
+            # The plot outputs are indexed by plot ID.
+            plot_tasks = []
+            
+            if plot_layout == "single":
+                # One image per channel
+                for channel in [ channel for channel in gen_channel_list(chans) if channel in channel_data_dict ]:
+                    # Make a small per-channel metadata binding
+                    channel_opts_dict = dict(enum_opts_dict)
+                    channel_opts_dict["channel"] = channel
+                    
+                    channel_dat = plot_data_dict[channel]
+                    
+                    plot_outputs = {}
+                    for plot_id in plot_dict_spec:
+                        plot_outputs[plot_id] = get_plot_output(plot_dict_spec[plot_id], channel_opts_dict, channel_dat, rel_channels_dict, custom_vars)
+                    
+                    plot_tasks.append([ "channel %i" % channel, plot, plot_dict_spec, channel_dat, channel_opts_dict, channel_opts_dict, plot_outputs, [ channel ] ])
             else:
+                # Multiple channels per file - figure out the channel groups!
+                channel_list = sorted(channel_data_dict.keys())
+                
+                if plot_layout == "pdf":
+                    # One PDF (with all channels) per plot
+                    group_size = len(channel_list)
+                    group_plot_func = plot_pdf
+                    group_output_ext = ".pdf"
+                else:
+                    # Tiled sheets, with N channels per sheet
+                    group_size = sheet_channels
+                    group_plot_func = plot_sheet
+                    group_output_ext = None
+                
+                for group_idx in xrange(0, len(channel_list), group_size):
+                    group_channels = channel_list[group_idx:group_idx + group_size]
+                    
+                    group_dat = {}
+                    for channel in group_channels:
+                        group_dat[channel] = plot_data_dict[channel]
+                    
+                    # Fingerprint metadata - include the grouping, since
+                    # changing it changes the output!
+                    group_fp_opts_dict = dict(enum_opts_dict)
+                    group_fp_opts_dict["channels"] = group_channels
+                    group_fp_opts_dict["layout"] = plot_layout
+                    
+                    # Split the group by plot, so that each plot can be
+                    # written in parallel.
+                    for plot_id in plot_dict_spec:
+                        plot_outputs = { plot_id : get_group_output(plot_dict_spec[plot_id], enum_opts_dict, group_channels, rel_channels_dict, custom_vars, group_output_ext) }
+                        
+                        plot_tasks.append([ "channels %s (%s)" % (channel_range(group_channels), plot_id), group_plot_func, { plot_id : plot_dict_spec[plot_id] }, group_dat, enum_opts_dict, group_fp_opts_dict, plot_outputs, group_channels ])
+            
+            
+            for (task_desc, task_plot_func, task_plot_dict, task_dat, task_opts_dict, task_fp_opts_dict, task_outputs, task_channels) in plot_tasks:
+                # If we're keeping a journal, describe the task for it. If
+                # we're resuming, skip the task if it was already done!
+                if plot_journal:
+                    task_journal = { "task" : task_desc, "outputs" : dict([ (plot_id, task_outputs[plot_id]) for plot_id in task_plot_dict ]) }
+                    
+                    if plot_resume and dummymp.journal_done(task_journal) and \
+                        (len([ o for o in task_journal["outputs"].values() if not os.path.isfile(o) ]) == 0):
+                        info(" ** Plots for %s were already done, skipping." % task_desc)
+                        continue
+                else:
+                    task_journal = None
+                
+                # If we're plotting incrementally, only select the plots
+                # that are out of date!
+                if plot_incremental:
+                    task_fingerprints = {}
+                    task_pending_dict = {}
+                    
+                    for plot_id in task_plot_dict:
+                        plot_fp = incremental.plot_fingerprint(input_fp, task_plot_dict[plot_id], task_fp_opts_dict, custom_vars)
+                        
+                        if incremental.is_up_to_date(incremental_state, task_outputs[plot_id], plot_fp):
+                            debug("Plot %s is up to date, skipping." % task_outputs[plot_id])
+                            continue
+                        
+                        task_pending_dict[plot_id] = task_plot_dict[plot_id]
+                        task_fingerprints[task_outputs[plot_id]] = plot_fp
+                    
+                    if len(task_pending_dict) == 0:
+                        info(" ** Plots for %s are up to date, skipping." % task_desc)
+                        continue
+                    
+                    task_plot_dict = task_pending_dict
+                
+                info(" ** Plotting data for %s..." % task_desc)
+                
+                # Only use the time axis for the task if its channels
+                # have the same timestamps that it was made from - e.g.
+                # a channel may be missing cycles. (Comparing the
+                # timestamps is much cheaper than converting them!)
+                if len([ channel for channel in task_channels if channel_data_dict[channel].get("timestamp", None) != time_axis_timestamps ]) == 0:
+                    task_time_axis = time_axis
+                else:
+                    task_time_axis = None
+                
                 try:
-                    plot_dict_subs = subst_data(plot_dict, dat)
                     if ("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"]):
-                        plot(plot_dict_subs, dat, enum_opts_dict, rel_channels_dict, custom_vars, make_dirs)
+                        plot_outputs = task_plot_func(task_plot_dict, task_dat, task_opts_dict, rel_channels_dict, custom_vars, make_dirs, task_time_axis, plot_in_memory)
+                        
+                        if plot_archive:
+                            for (member_name, member_data) in plot_outputs:
+                                archive.add_to_archive(plot_archive, member_name, member_data)
+                        else:
+                            plot_results.extend(plot_outputs or [])
+                        
+                        if plot_incremental:
+                            incremental.update_state(incremental_state, task_fingerprints, plot_outputs)
+                        
+                        if plot_journal:
+                            dummymp.journal_record(task_journal)
                     else:
-                        dummymp.run(plot, copy.deepcopy(plot_dict_subs), dat, copy.deepcopy(enum_opts_dict), rel_channels_dict, custom_vars, make_dirs)
+                        # Make the most expensive plots first, so that we
+                        # aren't stuck waiting on a big plot at the end!
+                        int_pid = dummymp.run(task_plot_func, task_plot_dict, task_dat, task_opts_dict, rel_channels_dict, custom_vars, make_dirs, task_time_axis, plot_in_memory, dummymp_cost = plot_cost(task_plot_dict, channel_data_dict, task_channels, valid_counts), dummymp_journal = task_journal)
+                        task_descs[int_pid] = task_desc
+                        
+                        if plot_archive:
+                            archive_pids.append(int_pid)
+                        
+                        if plot_incremental:
+                            pending_fingerprints[int_pid] = task_fingerprints
+                        
                         dummymp.process_process()
-                    del plot_dict_subs
                 except:
                     critical("An error occurred! Error follows:")
                     critical(traceback.format_exc())
@@ -378,9 +931,10 @@ def main():
                     #pprint.pprint(dat)
                     critical("Exiting.")
                     sys.exit(1)
+            
         
         if not (("mp_disable" in pyradmon_config) and (pyradmon_config["mp_disable"])):
-            dummymp.set_end_callback(report_status)
+            dummymp.set_end_callback(report_status, True)
             ncpus = dummymp.getCPUAvail()
             
             if ncpus == 0:
@@ -389,8 +943,200 @@ def main():
             
             info(" ** Detected %i or more CPUs available..." % ncpus)
             dummymp.process_until_done()
+            
+            # Show which plots took the longest
+            report_slow_tasks(task_descs)
+            
+            # Find the plot tasks that failed - they never returned
+            # anything. (Archived plots are popped from the returns as
+            # they arrive, so only check the ones still pending.)
+            plot_rets = dummymp.get_returns()
+            failed_tasks = [ task_descs[int_pid] for int_pid in sorted(task_descs.keys()) \
+                if (not int_pid in plot_rets) and ((not plot_archive) or (int_pid in archive_pids)) ]
+            
+            if len(failed_tasks) > 0:
+                warn("%i plot task(s) failed: %s" % (len(failed_tasks), ", ".join(failed_tasks)))
+            
+            # Stop the worker pool and disconnect from the remote agents,
+            # if any. (For batches, they're kept for the next job.)
+            if not shared_mp:
+                dummymp.stop_pool()
+                dummymp.disconnect_agents()
+            
+            # Release the shared plot data, if any
+            dummymp.release_shared()
+            
+            # Record the plots that were actually generated
+            if plot_incremental:
+                plot_rets = dummymp.get_returns()
+                for int_pid in pending_fingerprints:
+                    if int_pid in plot_rets:
+                        incremental.update_state(incremental_state, pending_fingerprints[int_pid], plot_rets[int_pid])
+            
+            # Collect the plot outputs (unless they went into the
+            # archive)
+            if not plot_archive:
+                plot_rets = dummymp.get_returns()
+                for int_pid in sorted(task_descs.keys()):
+                    plot_results.extend(plot_rets.get(int_pid, None) or [])
+        
+        if plot_incremental:
+            incremental.save_state(incremental_state_file, incremental_state)
+        
+        if plot_journal:
+            dummymp.close_journal()
+        
+        # Finish up the plot archive!
+        if plot_archive:
+            archive_returns()
+            
+            if len(archive_pids) > 0:
+                warn("%i plot task(s) did not return any rendered plots! The archive may be incomplete." % len(archive_pids))
+            
+            info(" ** Wrote %i plots to archive %s." % (archive.close_archive(plot_archive), plot_archive["output"]))
         
         info("Done!")
+        
+        return plot_results
+
+def run_batch(manifest_file, cli_config, fail_fast = False):
+    # Run every job in a batch manifest, one after another, in this
+    # process. Config templates are expanded in memory, enumeration
+    # results are reused across jobs, and the multiprocessing (mp)
+    # settings, worker pool, and remote agents are set up once and
+    # shared by all jobs. Returns the number of jobs that failed.
+    (manifest_config, jobs) = batch.load_manifest(manifest_file)
+    
+    # The mp settings are shared by all jobs, so they can only be set
+    # in the manifest's config (or on the command line), and override
+    # any mp settings in the config templates.
+    mp_config = dict([ (config_var, manifest_config[config_var]) for config_var in manifest_config if config_var.startswith("mp_") ])
+    mp_config.update([ (config_var, cli_config[config_var]) for config_var in cli_config if config_var.startswith("mp_") ])
+    config.validate_config(mp_config)
+    
+    mp_enabled = not (("mp_disable" in mp_config) and (mp_config["mp_disable"]))
+    
+    info(" ** Running %i batch jobs from %s..." % (len(jobs), manifest_file))
+    
+    if mp_enabled:
+        setup_mp(mp_config)
+        start_mp_workers(mp_config)
+    
+    enum_cache = {}
+    template_cache = {}
+    failed_jobs = []
+    
+    for job_idx in xrange(0, len(jobs)):
+        job = jobs[job_idx]
+        
+        info(" ** [Job %i/%i] Plotting %s..." % (job_idx + 1, len(jobs), batch.job_desc(job)))
+        
+        try:
+            (job_config, job_plot_dict) = batch.make_job_config(job, template_cache)
+            
+            # Command line settings override the job's settings, and
+            # the shared mp settings replace any in the template.
+            job_config.update(cli_config)
+            use_shared_mp_config(job_config, mp_config)
+            
+            config.validate(job_config, job_plot_dict)
+            
+            run_verb("plot", job_config, job_plot_dict, enum_cache, True)
+            job_ok = True
+        except SystemExit, e:
+            job_ok = e.code in [ None, 0 ]
+        except:
+            critical("An error occurred while plotting %s! Error follows:" % batch.job_desc(job))
+            critical(traceback.format_exc())
+            job_ok = False
+        
+        if job_ok:
+            continue
+        
+        critical("Job %s failed!" % batch.job_desc(job))
+        failed_jobs.append(job)
+        
+        # Stop anything the failed job left running, and start over
+        # with fresh workers for the next job.
+        if mp_enabled:
+            dummymp.killall()
+            dummymp.release_shared()
+        dummymp.close_journal()
+        
+        if fail_fast:
+            critical("Fail fast mode enabled, skipping the remaining jobs.")
+            break
+        
+        if mp_enabled:
+            start_mp_workers(mp_config)
+    
+    if mp_enabled:
+        dummymp.stop_pool()
+        dummymp.disconnect_agents()
+    
+    if len(failed_jobs) > 0:
+        critical(" ** %i of %i batch jobs failed:" % (len(failed_jobs), len(jobs)))
+        for job in failed_jobs:
+            critical("    %s" % batch.job_desc(job))
+    else:
+        info(" ** All %i batch jobs completed." % len(jobs))
+    
+    return len(failed_jobs)
+
+def main():
+    parser = args.make_argparser()
+    parse = parser.parse_args()
+    (pyradmon_config, plot_dict, parse_data) = args.parse_to_config(parse)
+    
+    if not pyradmon_config:
+        sys.exit(1)
+    
+    ###################################################################
+    ## VERB ACTION CODE
+    ###################################################################
+    
+    ## Config verb + Config args, part 2
+    if parse.verb == "config":
+        if isset_obj("config_display", parse) and parse.config_display:
+            # Print configuration
+            config_printer.display(pyradmon_config, plot_dict)
+        if isset_obj("config_save", parse):
+            # Print configuration
+            config.save(parse.config_save, pyradmon_config, plot_dict)
+        # That's it! Exit...
+        sys.exit(0)
+    
+    ## Batch verb
+    if parse.verb == "batch":
+        if len(plot_dict) > 0:
+            warn("Plots defined in the configuration file are ignored for batches - each job uses its config template.")
+        
+        # Don't override the manifest's priority mode with the default!
+        if not isset_obj("mp_priority_mode", parse):
+            pyradmon_config.pop("mp_priority_mode", None)
+        
+        if run_batch(parse.batch_manifest, pyradmon_config, isset_obj("batch_fail_fast", parse) and parse.batch_fail_fast) > 0:
+            sys.exit(1)
+        sys.exit(0)
+    
+    ## Serve verb
+    if parse.verb == "serve":
+        # Imported here, since the server builds on this module
+        import server
+        
+        # Don't override the requests' priority mode with the default!
+        if not isset_obj("mp_priority_mode", parse):
+            pyradmon_config.pop("mp_priority_mode", None)
+        
+        if isset_obj("serve_cache_ttl", parse):
+            serve_cache_ttl = int(parse.serve_cache_ttl)
+        else:
+            serve_cache_ttl = server.SERVE_CACHE_TTL
+        
+        server.serve(pyradmon_config, plot_dict, parse.serve_socket, parse.serve_address, serve_cache_ttl, parse.serve_config_dir)
+        sys.exit(0)
+    
+    run_verb(parse.verb, pyradmon_config, plot_dict)
 
 if __name__ == "__main__":
     main()
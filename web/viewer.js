@@ -0,0 +1,370 @@
+// PyRadmon - Python Radiance Monitoring Tool
+// Copyright 2014 Albert Huang.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//   http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+// implied. See the License for the specific language governing
+// permissions and limitations under the License.
+//
+// Data Bundle Viewer -
+//   renders PyRadmon data bundles (from plot --plot-bundle) on demand
+//   in the browser, mimicking the layout of the PNG plots.
+//
+
+(function () {
+    "use strict";
+
+    var MONTHS = [ "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                   "Jul", "Aug", "Sep", "Oct", "Nov", "Dec" ];
+
+    var bundle = null;
+
+    function $(id) {
+        return document.getElementById(id);
+    }
+
+    function setStatus(msg) {
+        $("status").textContent = msg || "";
+    }
+
+    // Fetch and decode a bundle. Bundles are gzip compressed JSON - if
+    // the server already decompressed it (Content-Encoding: gzip), the
+    // gzip magic bytes won't be present, and we just parse the JSON.
+    function loadBundle(url) {
+        return fetch(url).then(function (resp) {
+            if (!resp.ok) {
+                throw new Error("Could not fetch " + url + " (HTTP " + resp.status + ")");
+            }
+            return resp.arrayBuffer();
+        }).then(function (buf) {
+            var bytes = new Uint8Array(buf);
+            if (bytes.length > 2 && bytes[0] === 0x1f && bytes[1] === 0x8b) {
+                if (typeof DecompressionStream === "undefined") {
+                    throw new Error("This browser can't decompress gzip data bundles.");
+                }
+                var stream = new Blob([ buf ]).stream().pipeThrough(new DecompressionStream("gzip"));
+                return new Response(stream).text();
+            }
+            return new TextDecoder("utf-8").decode(bytes);
+        }).then(function (text) {
+            return JSON.parse(text);
+        });
+    }
+
+    // Compute mean and (population) standard deviation, ignoring
+    // missing values - this matches the %AVERAGE% and %STDDEV% values
+    // in the PNG plots.
+    function stats(vals) {
+        var n = 0, sum = 0, sumsq = 0, i, mean;
+        for (i = 0; i < vals.length; i++) {
+            if (vals[i] !== null) {
+                n++;
+                sum += vals[i];
+            }
+        }
+        if (n === 0) {
+            return null;
+        }
+        mean = sum / n;
+        for (i = 0; i < vals.length; i++) {
+            if (vals[i] !== null) {
+                sumsq += (vals[i] - mean) * (vals[i] - mean);
+            }
+        }
+        return { mean: mean, std: Math.sqrt(sumsq / n) };
+    }
+
+    // Pick "nice" tick values between lo and hi.
+    function niceTicks(lo, hi, count) {
+        var span = hi - lo, step, mag, norm, ticks = [], t;
+        if (span <= 0) {
+            return [ lo ];
+        }
+        step = span / Math.max(count - 1, 1);
+        mag = Math.pow(10, Math.floor(Math.log(step) / Math.LN10));
+        norm = step / mag;
+        step = (norm < 1.5 ? 1 : norm < 3 ? 2 : norm < 7 ? 5 : 10) * mag;
+        for (t = Math.ceil(lo / step) * step; t <= hi + step * 1e-9; t += step) {
+            ticks.push(Math.abs(t) < step * 1e-9 ? 0 : t);
+        }
+        return ticks;
+    }
+
+    function formatTick(val) {
+        return String(parseFloat(val.toPrecision(6)));
+    }
+
+    function replaceChannelVars(str, chan) {
+        return str.replace(/%CHANNEL%/g, String(chan.channel))
+                  .replace(/%RELCHANNEL%/g, String(chan.rel_channel))
+                  .replace(/%FREQUENCY%/g, chan.frequency);
+    }
+
+    // Determine assimilation status from the last iuse value, like the
+    // PNG plots do.
+    function assimStatus(chan) {
+        var prefix, iuse, state = null;
+        for (prefix in chan.iuse) {
+            iuse = chan.iuse[prefix];
+            if (iuse.length > 0) {
+                if (iuse[iuse.length - 1] === -1) {
+                    state = -1;
+                } else if (state === null) {
+                    state = iuse[iuse.length - 1];
+                }
+            }
+        }
+        if (state === null) {
+            return { text: "Unknown (??)", color: "orange" };
+        }
+        if (state === -1) {
+            return { text: "Not Assimilated", color: "red" };
+        }
+        return { text: "Assimilated", color: "green" };
+    }
+
+    function drawSubplot(ctx, box, subplot, chan, time) {
+        var series = [], ymin = Infinity, ymax = -Infinity;
+        var i, j, s, vals, st, label, x, y, started, yticks, xticks, tmin, tmax;
+        var hasIuse = Object.keys(chan.iuse).length > 0;
+
+        // Gather series
+        for (i = 0; i < subplot.y.length; i++) {
+            vals = chan.series[subplot.y[i]] || [];
+            st = stats(vals);
+            label = subplot.labels[i] !== undefined ? subplot.labels[i] : "";
+            label = label.replace(/%COLOR%/g, "").replace(/%ENDCOLOR%/g, "");
+            label = label.replace(/%AVERAGE%/g, st ? String(Math.round(st.mean * 1000) / 1000) : "N/A")
+                         .replace(/%STDDEV%/g, st ? String(st.std) : "N/A");
+            series.push({ vals: vals, stats: st, label: label,
+                          color: subplot.colors[i] || "black" });
+            if (st || !hasIuse) {
+                for (j = 0; j < vals.length; j++) {
+                    if (vals[j] !== null) {
+                        ymin = Math.min(ymin, vals[j]);
+                        ymax = Math.max(ymax, vals[j]);
+                    }
+                }
+            }
+        }
+
+        // Axes box
+        ctx.strokeStyle = "black";
+        ctx.lineWidth = 1;
+        ctx.strokeRect(box.x, box.y, box.w, box.h);
+
+        ctx.fillStyle = "black";
+        ctx.textAlign = "center";
+        ctx.textBaseline = "bottom";
+        ctx.font = "14px sans-serif";
+        ctx.fillText(subplot.title, box.x + box.w / 2, box.y - 4);
+
+        // Legend (left of the plot, like the PNGs)
+        if (subplot.legend !== null) {
+            ctx.textAlign = "left";
+            ctx.textBaseline = "middle";
+            ctx.font = "12px sans-serif";
+            var ly = box.y + box.h / 2 - (series.length * 14) / 2;
+            if (subplot.legend) {
+                ctx.fillStyle = "black";
+                ctx.fillText(subplot.legend, 4, ly - 14);
+            }
+            for (i = 0; i < series.length; i++) {
+                ctx.fillStyle = series[i].color;
+                ctx.fillText(series[i].label, 4, ly + i * 14);
+            }
+        }
+
+        if (ymin === Infinity || time.length === 0) {
+            ctx.fillStyle = "black";
+            ctx.textAlign = "center";
+            ctx.textBaseline = "middle";
+            ctx.font = "24px sans-serif";
+            ctx.fillText("Data not available", box.x + box.w / 2, box.y + box.h / 2);
+            return;
+        }
+
+        if (ymin === ymax) {
+            ymin -= 0.5;
+            ymax += 0.5;
+        }
+        tmin = time[0];
+        tmax = time[time.length - 1] === tmin ? tmin + 1 : time[time.length - 1];
+
+        function px(t) { return box.x + (t - tmin) / (tmax - tmin) * box.w; }
+        function py(v) { return box.y + box.h - (v - ymin) / (ymax - ymin) * box.h; }
+
+        // Y ticks
+        ctx.font = "11px sans-serif";
+        ctx.fillStyle = "black";
+        ctx.textAlign = "right";
+        ctx.textBaseline = "middle";
+        yticks = niceTicks(ymin, ymax, subplot.y_ticks || 5);
+        for (i = 0; i < yticks.length; i++) {
+            y = py(yticks[i]);
+            ctx.beginPath();
+            ctx.moveTo(box.x - 4, y);
+            ctx.lineTo(box.x, y);
+            ctx.stroke();
+            ctx.fillText(formatTick(yticks[i]), box.x - 6, y);
+        }
+        if (subplot.y_label) {
+            ctx.save();
+            ctx.translate(box.x - 48, box.y + box.h / 2);
+            ctx.rotate(-Math.PI / 2);
+            ctx.textAlign = "center";
+            ctx.fillText(subplot.y_label, 0, 0);
+            ctx.restore();
+        }
+
+        // X (date) ticks - one tick per day, thinned to fit
+        ctx.textAlign = "center";
+        ctx.textBaseline = "top";
+        xticks = [];
+        var day = 86400, stepDays = Math.max(1, Math.ceil((tmax - tmin) / day / 6));
+        for (x = Math.ceil(tmin / day) * day; x <= tmax; x += stepDays * day) {
+            xticks.push(x);
+        }
+        for (i = 0; i < xticks.length; i++) {
+            var d = new Date(xticks[i] * 1000);
+            x = px(xticks[i]);
+            ctx.beginPath();
+            ctx.moveTo(x, box.y + box.h);
+            ctx.lineTo(x, box.y + box.h + 4);
+            ctx.stroke();
+            ctx.fillText(("0" + d.getUTCDate()).slice(-2) + MONTHS[d.getUTCMonth()], x, box.y + box.h + 6);
+            ctx.fillText(String(d.getUTCFullYear()), x, box.y + box.h + 18);
+        }
+        if (subplot.x_label) {
+            ctx.fillText(subplot.x_label, box.x + box.w / 2, box.y + box.h + 30);
+        }
+
+        // Data lines, with gaps at missing values
+        ctx.save();
+        ctx.beginPath();
+        ctx.rect(box.x, box.y, box.w, box.h);
+        ctx.clip();
+        for (s = 0; s < series.length; s++) {
+            if (hasIuse && !series[s].stats) {
+                continue;
+            }
+            ctx.strokeStyle = series[s].color;
+            ctx.lineWidth = 1;
+            ctx.beginPath();
+            started = false;
+            for (i = 0; i < series[s].vals.length && i < time.length; i++) {
+                if (series[s].vals[i] === null) {
+                    started = false;
+                    continue;
+                }
+                x = px(time[i]);
+                y = py(series[s].vals[i]);
+                if (started) {
+                    ctx.lineTo(x, y);
+                } else {
+                    ctx.moveTo(x, y);
+                    started = true;
+                }
+            }
+            ctx.stroke();
+        }
+        ctx.restore();
+    }
+
+    function render() {
+        var plot = bundle.plots[$("plot").value];
+        var chan = bundle.channels[parseInt($("channel").value, 10)];
+        var canvas = $("canvas"), ctx = canvas.getContext("2d");
+        var time = chan.time || bundle.time;
+        var i, n = plot.subplots.length, top = 90, gap = 70, status;
+        var h;
+
+        canvas.width = plot.target_size[0];
+        canvas.height = plot.target_size[1];
+        ctx.fillStyle = "white";
+        ctx.fillRect(0, 0, canvas.width, canvas.height);
+
+        // Title
+        ctx.fillStyle = "black";
+        ctx.textAlign = "center";
+        ctx.textBaseline = "top";
+        ctx.font = "18px sans-serif";
+        replaceChannelVars(plot.title, chan).split("\n").forEach(function (line, idx) {
+            ctx.fillText(line, canvas.width / 2, 8 + idx * 22);
+        });
+
+        if (plot.assim_status) {
+            status = assimStatus(chan);
+            ctx.fillStyle = status.color;
+            ctx.textBaseline = "bottom";
+            ctx.font = "bold 16px sans-serif";
+            ctx.fillText(status.text, canvas.width * 0.67, canvas.height * 0.052 + 16);
+        }
+
+        // Subplots, stacked vertically
+        h = (canvas.height - top - gap * n) / n;
+        for (i = 0; i < n; i++) {
+            drawSubplot(ctx, {
+                x: canvas.width * 0.3,
+                y: top + i * (h + gap),
+                w: canvas.width * 0.62,
+                h: h
+            }, plot.subplots[i], chan, time);
+        }
+    }
+
+    function populate() {
+        var plotSel = $("plot"), chanSel = $("channel");
+        plotSel.innerHTML = "";
+        chanSel.innerHTML = "";
+        Object.keys(bundle.plots).sort().forEach(function (id) {
+            plotSel.add(new Option(id, id));
+        });
+        bundle.channels.forEach(function (chan, idx) {
+            chanSel.add(new Option(chan.channel + " (" + chan.frequency + ")", String(idx)));
+        });
+        render();
+    }
+
+    function step(delta) {
+        var sel = $("channel");
+        if (!bundle) {
+            return;
+        }
+        sel.selectedIndex = (sel.selectedIndex + delta + sel.options.length) % sel.options.length;
+        render();
+    }
+
+    function load() {
+        var url = $("bundle").value;
+        setStatus("Loading " + url + "...");
+        loadBundle(url).then(function (b) {
+            bundle = b;
+            setStatus("");
+            document.title = "Radiance Monitoring - " + b.experiment_id + " " +
+                b.instrument_sat + " (" + b.start_date + "-" + b.end_date + ")";
+            populate();
+        }).catch(function (err) {
+            setStatus("Error: " + err.message);
+        });
+    }
+
+    $("load").addEventListener("click", load);
+    $("plot").addEventListener("change", render);
+    $("channel").addEventListener("change", render);
+    $("prev").addEventListener("click", function () { step(-1); });
+    $("next").addEventListener("click", function () { step(1); });
+
+    var param = new URLSearchParams(window.location.search).get("bundle");
+    if (param) {
+        $("bundle").value = param;
+        load();
+    }
+})();